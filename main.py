@@ -9,5 +9,24 @@ if __name__ == "__main__":
     from src.mainWindow import MainWindow
     app = QApplication(sys.argv)
     mainwindow = MainWindow()
+    if "--telemetry" in sys.argv:
+        # Opt-in instrumentation, statistics appended to metrics.jsonl
+        mainwindow.enableTelemetry("metrics.jsonl")
+    if "--record" in sys.argv:
+        # Real Time session log, saved to session.npz on exit
+        mainwindow.enableRecording("session.npz")
+    if "--export" in sys.argv:
+        # Fixed Time runs streamed to disk, in the folder given after the
+        # flag ("results" by default); --displacement also stores the
+        # displacement at the reading position
+        index = sys.argv.index("--export") + 1
+        if index < len(sys.argv) and not sys.argv[index].startswith("--"):
+            exportdir = sys.argv[index]
+        else:
+            exportdir = "results"
+        mainwindow.enableExport(exportdir, "--displacement" in sys.argv)
+    if "--process" in sys.argv:
+        # Normal time Real Time simulation in a child process
+        mainwindow.enableProcess()
     mainwindow.show()
     sys.exit(app.exec_())
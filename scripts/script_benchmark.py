@@ -0,0 +1,280 @@
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+
+
+"""
+Make sure that you are inside script folder when using the follow commands
+How to use:
+    python script_benchmark.py
+        "runs the benchmark suite and saves the results in
+        ../benchmarks/[git revision].json"
+    python script_benchmark.py --compare ../benchmarks/[old revision].json
+        "runs the suite and reports the cases that got slower than
+        the given results (regressions)"
+    python script_benchmark.py --quick
+        "runs a reduced suite, useful while developing"
+"""
+
+sys.path.append("../src")
+from CantileverBeam import CantileverBeam  # noqa: E402
+from controllers import PID, LQR, FxLMS, ClosedLoop  # noqa: E402
+from reportRender import drawcharts  # noqa: E402
+
+RESULTS_DIR = "../benchmarks/"
+
+# Reference beam (same values used by the GUI)
+WIDTH = 0.05
+THICKNESS = 0.00575
+LENGTH = 0.58
+DENSITY = 7900
+ELASTICMOD = 2e11
+TSAMPLING = 0.004
+DAMP = [0.002, 0.002, 0.001, 0.001, 0.001]
+
+
+def newbeam(npoints=60, nmodes=5):
+    return CantileverBeam(npoints, WIDTH, THICKNESS, LENGTH, DENSITY,
+                          ELASTICMOD, TSAMPLING, nmodes, DAMP, 1, 0)
+
+
+def timeit(func, repeat=5, number=1):
+    """
+    Returns the best time (seconds per call) of 'repeat' measurements.
+    The best time is the least affected by the other processes.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def fixedpulse(beam, nsamples, apos, rpos, force=1.0):
+    """
+    Legacy step loop of the Single Pulse (the original
+    MainWindow.updateFixed), kept as a reference for the stepping engine.
+    """
+    acceleration = np.zeros(nsamples)
+    beam.reset()
+    beam.setforce(apos, force)
+    beam.update()
+    beam.setforce(apos, 0)
+    for k in range(nsamples):
+        acceleration[k] = beam.getaccelms2(rpos)
+        beam.update()
+    return acceleration
+
+
+def fixedharmonic(beam, nsamples, apos, rpos, freq=10.0):
+    """
+    Legacy step loop of the Harmonic Force (the original
+    MainWindow.updateFixed), kept as a reference for the stepping engine.
+    """
+    acceleration = np.zeros(nsamples)
+    t = np.arange(nsamples) * beam.Ts
+    F_disturb = np.sin(2 * np.pi * freq * t)
+    beam.reset()
+    for j in range(nsamples):
+        beam.setforce(apos, F_disturb[j])
+        acceleration[j] = beam.getaccelms2(rpos)
+        beam.update()
+    return acceleration
+
+
+def fixedbatch(beam, nsamples, apos, rpos, force):
+    """
+    Batch path used by MainWindow.updateFixed: modal coordinates of the
+    whole run, then projection at the reading position.
+    """
+    modal = beam.simulatemodal(force, apos)
+    return beam.project(modal, rpos)
+
+
+def bench_construction(quick):
+    results = {}
+    npoints_list = [60, 120, 250] if quick else [60, 120, 250, 500, 1000]
+    for npoints in npoints_list:
+        repeat = 3 if npoints <= 250 else 1
+        results[f"construction[npoints={npoints}]"] = {
+            "seconds": timeit(lambda: newbeam(npoints), repeat=repeat),
+            "unit": "s/beam"}
+    return results
+
+
+def bench_update(quick):
+    results = {}
+    cases = [(60, 5), (60, 10), (250, 5)]
+    if not quick:
+        cases += [(250, 20), (1000, 5)]
+    nsteps = 500
+    for npoints, nmodes in cases:
+        beam = newbeam(npoints, nmodes)
+        beam.setforce(npoints // 2, 1)
+
+        def steps():
+            for _ in range(nsteps):
+                beam.update()
+        seconds = timeit(steps, repeat=3)
+        results[f"update[npoints={npoints},nmodes={nmodes}]"] = {
+            "seconds": seconds / nsteps, "unit": "s/step",
+            "steps_per_second": nsteps / seconds}
+    return results
+
+
+def bench_fixed(quick):
+    results = {}
+    beam = newbeam()
+    nsamples = int(10 / TSAMPLING)  # 10 s of simulation
+    if quick:
+        nsamples //= 5
+    for name, func in (("legacy-pulse", fixedpulse),
+                       ("legacy-harmonic", fixedharmonic)):
+        seconds = timeit(lambda: func(beam, nsamples, 30, 59), repeat=3)
+        results[f"fixed[{name},samples={nsamples}]"] = {
+            "seconds": seconds, "unit": "s/run",
+            "samples_per_second": nsamples / seconds}
+
+    t = np.arange(nsamples) * TSAMPLING
+    pulse = np.zeros(nsamples)
+    pulse[0] = 1
+    forces = {"pulse": pulse, "harmonic": np.sin(2 * np.pi * 10 * t)}
+    for name, force in forces.items():
+        seconds = timeit(lambda: fixedbatch(beam, nsamples, 30, 59, force))
+        results[f"fixed[{name},samples={nsamples}]"] = {
+            "seconds": seconds, "unit": "s/run",
+            "samples_per_second": nsamples / seconds}
+    return results
+
+
+def bench_control(quick):
+    """
+    Closed-loop steps per second and step latency of each controller.
+    """
+    results = {}
+    beam = newbeam(60, None)
+    nsamples = int(10 / TSAMPLING)
+    if quick:
+        nsamples //= 5
+    t = np.arange(nsamples) * TSAMPLING
+    disturbance = np.sin(2 * np.pi * beam.freqsHz[0] * t)
+    # Collocated actuator and sensor at the tip (stable velocity feedback)
+    controllers = {
+        "pid": PID(0, 20, 0, TSAMPLING),
+        "lqr": LQR(beam, 59, q=1, r=1e-4),
+        "fxlms": FxLMS(beam, 59, 59, mu=0.05),
+    }
+    for name, controller in controllers.items():
+        loop = ClosedLoop(beam, controller, 59, 59, dpos=30)
+        run = loop.run(disturbance)
+        results[f"control[{name},samples={nsamples}]"] = {
+            "seconds": run["latency"]["mean"], "unit": "s/step",
+            "p99": run["latency"]["p99"],
+            "overruns": run["latency"]["overruns"],
+            "realtime_factor": run["realtime_factor"]}
+    return results
+
+
+def bench_redraw(quick):
+    """
+    Redraw of the Fixed Time charts as done by MainWindow.drawFixed
+    (reportRender.drawcharts: decimated force and acceleration traces and
+    the acceleration spectrum), using the Agg canvas (same rasterizer used
+    by the Qt canvas, without a window).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    results = {}
+    beam = newbeam(60, None)
+    lengths = [2500] if quick else [2500, 15000, 75000, 900000]
+    for nsamples in lengths:
+        t = np.arange(nsamples) * TSAMPLING
+        force = np.sin(2 * np.pi * 10 * t)
+        acceleration = fixedbatch(beam, nsamples, 30, 59, force)
+        figure = Figure(figsize=(6, 10))
+        FigureCanvasAgg(figure)
+        axes = figure.subplots(3, 1)
+
+        def redraw():
+            drawcharts(axes, t, force, acceleration, beam.Ts, beam.freqsHz)
+            figure.canvas.draw()
+        results[f"redraw[samples={nsamples}]"] = {
+            "seconds": timeit(redraw, repeat=3), "unit": "s/draw"}
+    return results
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, reference, tolerance):
+    """
+    Prints the cases that are slower than the reference results
+    by more than 'tolerance' (relative). Returns the number of regressions.
+    """
+    regressions = 0
+    for name, value in results.items():
+        if name not in reference:
+            continue
+        old = reference[name]["seconds"]
+        ratio = value["seconds"] / old
+        status = "ok"
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+            regressions += 1
+        print(f"{name:45s} {old:10.3e} -> {value['seconds']:10.3e} "
+              f"({ratio:5.2f}x) {status}")
+    return regressions
+
+
+def run(arguments):
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--compare", help="previous results (.json)")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--name", help="results name (default: git rev)")
+    args = parser.parse_args(arguments[1:])
+
+    results = {}
+    for bench in (bench_construction, bench_update, bench_fixed,
+                  bench_control, bench_redraw):
+        print(f"-> {bench.__name__}")
+        results.update(bench(args.quick))
+
+    name = args.name or revision()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, name + ".json")
+    with open(output, "w") as file:
+        json.dump({"revision": name,
+                   "python": platform.python_version(),
+                   "numpy": np.__version__,
+                   "machine": platform.machine(),
+                   "processor": platform.processor(),
+                   "results": results}, file, indent=4)
+
+    for key, value in results.items():
+        print(f"{key:45s} {value['seconds']:10.3e} {value['unit']}")
+    print(f"Results saved in {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            reference = json.load(file)["results"]
+        if compare(results, reference, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    run(sys.argv)
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy import linalg
+from scipy import linalg, signal, interpolate
 
 
 class CantileverBeam:
@@ -10,9 +10,11 @@ class CantileverBeam:
 
     # Parâmetros gerais
     m = 1  # massa: sempre 1 para todas as vigas
+    FIELDS = {"displacement": "x", "velocity": "v", "acceleration": "a"}
 
     def __init__(self, npoints, width, thickness, length, density, elasticmod,
-                 Tsampling, nmodes, damp, forcescaler, noisestd):
+                 Tsampling, nmodes, damp, forcescaler, noisestd,
+                 telemetry=None, fmax=None, dtype=np.float64, modal=None):
         """
         Construtor da classe. Os parâmetros já tem valores padrão relacionados
         com os valores de referência da viga utilizada.
@@ -26,12 +28,25 @@ class CantileverBeam:
             depende do material da viga.
             - Tsampling: período de amostragem utilizado na
             simulação (em segundos)
-            - nmodes: número de modos de vibração simulados;
+            - nmodes: número de modos de vibração simulados. Se for None,
+            são simulados todos os modos com frequência abaixo de fmax;
             - damp: fator de amortecimento para cada modo
-            (tipicamente determinado experimentalmente);
-            - noisestd: desvio padrão do ruído de medição.
+            (tipicamente determinado experimentalmente). Pode ser um valor
+            único, uma lista (modos além do fim da lista usam o último
+            valor) ou uma função das frequências de ressonância em Hz;
+            - noisestd: desvio padrão do ruído de medição;
+            - telemetry: objeto Telemetry opcional que registra o tempo
+            gasto em cada etapa da simulação;
+            - fmax: frequência de corte em Hz da seleção automática de modos
+            (limitada à frequência de Nyquist, que é o padrão);
+            - dtype: tipo usado no estado da viga, em vmod e nas respostas
+            (np.float32 reduz a memória pela metade; os estados dos IIRs e
+            a filtragem continuam em float64 para manter a estabilidade);
+            - modal: (vmod, freqsHz) de uma análise modal já feita, usada
+            no lugar de evaluateModesAndFreqs (ver frommodal).
         """
         self.Ts = Tsampling
+        self.dtype = np.dtype(dtype)
         self.npoints = npoints
         self.nmodes = nmodes
         self.width = width
@@ -43,56 +58,287 @@ class CantileverBeam:
                                         # Newton caso a força seja gerada a partir de uma tensão elétrica
         self.forcescaler1 = forcescaler
         self.magnetdist = 1e-3
-        self.evaluateModesAndFreqs()
-        self.memiir = 3
         self.Fs = 1 / self.Ts 
+        self.automodes = nmodes is None  # modos escolhidos por fmax
+        self.cutoff = fmax
+        self.fmax = self.Fs / 2 if fmax is None else min(fmax, self.Fs / 2)
+        self.damp = damp
+        self.settelemetry(telemetry)
+        if modal is None:
+            self.evaluateModesAndFreqs()
+        else:
+            self.setmodes(*modal)
+        self.memiir = 3
         self.wn = 2 * np.pi * self.freqsHz  # Undamped natural frequency
-        self.zeta = np.array(damp)
-        self.wd = self.wn * np.sqrt(1-self.zeta[:self.nmodes]**2)  # Damped natural frequency
-        self.Aiir = np.zeros((self.nmodes, self.memiir-1))  # Coeficientes dos denominadores dos IIRs de cada modo
-        self.Biir = np.zeros((self.nmodes, self.memiir))  # Coeficientes dos numeradores dos IIRs de cada modo
-
-        # Cálculo dos coeficientes dos filtros IIR
-        for k in range(0, self.nmodes):
-            self.Biir[k, 0] = 0
-            self.Biir[k, 1] = np.exp(-self.zeta[k]*self.wn[k]*self.Ts) * np.sin(self.wd[k]*self.Ts)
-            self.Biir[k, 2] = 0
-            self.Aiir[k, 0] = -2 * np.exp(-self.zeta[k]*self.wn[k]*self.Ts) * np.cos(self.wd[k]*self.Ts)
-            self.Aiir[k, 1] = np.exp(-2*self.zeta[k]*self.wn[k]*self.Ts)
-        
-        self.reset()
+        self.zeta = self.dampingfactors(damp)
+        self.wd = self.wn * np.sqrt(1-self.zeta**2)  # Damped natural frequency
+        self.iircache = {}  # Coeficientes dos IIRs para cada período de amostragem
+        self.outputs = ("acceleration",)  # grandezas calculadas em update
+        self.setsampling(self.Ts)
         self.noisestd = noisestd
         self.setaccelg(False)
 
     def evaluateModesAndFreqs(self):
         """
         Cálculo dos modos de vibração e das frequências de ressonância.
+        Apenas os modos simulados são calculados: os nmodes primeiros ou,
+        se nmodes for None, os modos com frequência abaixo de fmax.
         """
         I = (self.width * self.thickness**3) / 12  # Inertial moment
         beam_mass = self.density * self.width * self.thickness * self.length
-        # Mass matrix
-        M = np.matrix(np.eye(self.npoints) * (beam_mass/self.npoints))
-        M[0, 0] = M[0, 0] / 2
+        # Massas concentradas nos nós (matriz de massa diagonal)
+        mass = np.full(self.npoints, beam_mass/self.npoints)
+        mass[0] = mass[0] / 2
         deltax = self.length / self.npoints
-        A = np.zeros((self.npoints, self.npoints))
-        for r in range(self.npoints):
-            for c in range(r+1):
-                k = self.npoints - r
-                l = self.npoints - c
-                A[r, c] = ((deltax**3)/(6*self.elasticmod*I)) * (3 * k**2 * l - k**3)
-                A[c, r] = A[r, c]
-        K = linalg.inv(A)
-        L = linalg.cholesky(M)
-        Kt = linalg.inv(L.T) @ K @ linalg.inv(L)
-        ww, P = linalg.eig(Kt)
-        ww = np.real(ww)
-        sidxs = np.argsort(ww) 
-        U = linalg.inv(L) @ P
-        self.vmod = np.zeros((self.npoints, self.nmodes))
-        self.freqsHz = np.zeros(self.nmodes)
-        for k in range(self.nmodes):
-            self.vmod[:, k] = U[::-1, sidxs[k]]
-            self.freqsHz[k] = np.sqrt(ww[sidxs[k]])/2/np.pi
+        # Matriz de flexibilidade: A[r, c] = deltax^3/(6EI) * (3k^2 l - k^3),
+        # com k = npoints - max(r, c) e l = npoints - min(r, c)
+        index = np.arange(self.npoints)
+        k = (self.npoints - np.maximum.outer(index, index)).astype(float)
+        l = (self.npoints - np.minimum.outer(index, index)).astype(float)
+        A = ((deltax**3)/(6*self.elasticmod*I)) * (3 * k**2 * l - k**3)
+        # Kt = M^-1/2 K M^-1/2 = (M^1/2 A M^1/2)^-1: os menores autovalores
+        # de Kt são os inversos dos maiores de At, sem inverter A e M.
+        # At é simétrica: eigh calcula só os autovalores pedidos (crescentes)
+        sqrtmass = np.sqrt(mass)
+        At = sqrtmass[:, None] * A * sqrtmass[None, :]
+        n = self.npoints
+        if self.nmodes is None:
+            lam, P = linalg.eigh(At, subset_by_value=[1/(2*np.pi*self.fmax)**2, np.inf])
+            if len(lam) == 0:
+                lam, P = linalg.eigh(At, subset_by_index=[n-1, n-1])
+            self.nmodes = len(lam)
+        else:
+            lam, P = linalg.eigh(At, subset_by_index=[n-self.nmodes, n-1])
+        ww = 1 / lam[::-1]
+        U = P[:, ::-1] / sqrtmass[:, None]
+        self.setmodes(U[::-1, :], np.sqrt(ww)/2/np.pi)
+
+    def setmodes(self, vmod, freqsHz):
+        """
+        Define os modos simulados (vmod: npoints x nmodes) e as suas
+        frequências de ressonância em Hz. vmod em float64 é usado sem cópia
+        (ex. um bloco de memória compartilhada).
+        """
+        self.vmod64 = np.asarray(vmod, dtype=np.float64)  # modos em float64
+        self.vmod = self.vmod64.astype(self.dtype, copy=False)
+        self.shapecache = {}  # modos interpolados em cada posição (m)
+        self.freqsHz = np.asarray(freqsHz, dtype=np.float64)
+        self.nmodes = len(self.freqsHz)
+
+    @classmethod
+    def frommodal(cls, vmod, freqsHz, damp, Tsampling, forcescaler=1,
+                  noisestd=0, telemetry=None, dtype=np.float64, **geometry):
+        """
+        Constrói a viga a partir de uma análise modal já feita (vmod e
+        freqsHz), sem refazer a análise. damp é o fator de amortecimento
+        de cada modo, como no construtor. geometry: width, thickness,
+        length, density e elasticmod (length é usado nas posições em
+        metros; os demais apenas descrevem a viga).
+        """
+        geometry = {"width": None, "thickness": None, "length": 1.0,
+                    "density": None, "elasticmod": None, **geometry}
+        return cls(len(vmod), geometry["width"], geometry["thickness"],
+                   geometry["length"], geometry["density"],
+                   geometry["elasticmod"], Tsampling, len(freqsHz), damp,
+                   forcescaler, noisestd, telemetry, dtype=dtype,
+                   modal=(vmod, freqsHz))
+
+    def withsampling(self, Ts, telemetry=None):
+        """
+        Retorna uma viga para o período de amostragem Ts, sem alterar esta.
+        Os modos são escolhidos para o novo período como na construção:
+        com nmodes=None, os modos abaixo de min(fmax, Nyquist); com nmodes
+        dado, os mesmos modos sem os que ficam acima da nova frequência de
+        Nyquist (que seriam rebatidos). Se os modos necessários já foram
+        calculados, a nova viga usa esta análise modal (frommodal); senão
+        a análise é refeita com mais modos.
+        """
+        nyquist = 1 / Ts / 2
+        fmax = nyquist if self.cutoff is None else min(self.cutoff, nyquist)
+        if self.automodes and fmax > self.fmax and self.nmodes < self.npoints:
+            beam = CantileverBeam(self.npoints, self.width, self.thickness,
+                                  self.length, self.density, self.elasticmod,
+                                  Ts, None, self.damp, self.forcescaler1,
+                                  self.noisestd, telemetry, self.cutoff,
+                                  self.dtype)
+        else:
+            keep = self.freqsHz <= fmax if self.automodes \
+                else self.freqsHz < nyquist
+            keep[0] = True  # ao menos o primeiro modo, como na construção
+            beam = CantileverBeam.frommodal(
+                self.vmod64[:, keep], self.freqsHz[keep], self.zeta[keep], Ts,
+                self.forcescaler1, self.noisestd, telemetry, self.dtype,
+                width=self.width, thickness=self.thickness,
+                length=self.length, density=self.density,
+                elasticmod=self.elasticmod)
+            beam.automodes, beam.cutoff, beam.fmax, beam.damp = \
+                self.automodes, self.cutoff, fmax, self.damp
+        beam.forcescaler, beam.forcescaler1, beam.magnetdist = \
+            self.forcescaler, self.forcescaler1, self.magnetdist
+        return beam
+
+    @staticmethod
+    def modalfilters(sigma, wd, Ts, m=1):
+        """
+        Discretização de cada modo m*x'' + 2*m*s*x' + m*wn^2*x = u, com
+        s = sigma = zeta*wn, por segurador de ordem zero (ZOH): a força
+        modal é constante em cada período e o estado (x, v) é exato nos
+        instantes de amostragem. Com Ad = e^(A*T) e Bd = A^-1 (Ad - I) B:
+            - deslocamento: x[n] = [1, 0] s[n];
+            - velocidade: v[n] = [0, 1] s[n];
+            - aceleração: a[n] = u[n]/m - 2*s*v[n] - wn^2*x[n],
+        todas da mesma discretização, então a aceleração é a do estado
+        simulado (a mesma equação do modo, sem diferenças finitas).
+        Retorna os denominadores Aiir (n x 2, [a1, a2] de
+        1 + a1 z^-1 + a2 z^-2, comuns às três grandezas) e os numeradores
+        (n x 3) de cada grandeza. sigma e wd podem ser complexos (usado
+        nas derivadas por passo complexo de identification).
+        """
+        r = np.exp(-sigma*Ts)
+        c = np.cos(wd*Ts)
+        sn = np.sin(wd*Ts) / wd
+        wn2 = sigma**2 + wd**2
+        ad11 = r * (c + sigma*sn)
+        ad12 = r * sn
+        ad21 = -wn2 * ad12
+        ad22 = r * (c - sigma*sn)
+        bx = (1 - ad11) / (m*wn2)
+        bv = ad12 / m
+        a1 = -(ad11 + ad22)
+        a2 = ad11*ad22 - ad12*ad21
+        Aiir = np.stack([a1, a2], axis=-1)
+        one = np.ones_like(a1)
+
+        def numerator(cx, cv, d):
+            # C (zI - Ad)^-1 Bd + D, em potências de z^-1
+            return np.stack([d*one,
+                             cx*bx + cv*bv + d*a1,
+                             cx*(ad12*bv - ad22*bx) + cv*(ad21*bx - ad11*bv)
+                             + d*a2], axis=-1)
+
+        outputs = {"displacement": numerator(1, 0, 0),
+                   "velocity": numerator(0, 1, 0),
+                   "acceleration": numerator(-wn2, -2*sigma, 1/m)}
+        return Aiir, outputs
+
+    @staticmethod
+    def stepform(N, Aiir):
+        """
+        Escreve uma grandeza de numerador N como n0*u[n] + c1*w[n] +
+        c2*w[n-1], onde w é a saída do IIR de numerador unitário
+        (z^-1/A(z)) e u a força modal. Retorna (n0, c1, c2).
+        """
+        n0 = N[..., 0]
+        return n0, N[..., 1] - n0*Aiir[..., 0], N[..., 2] - n0*Aiir[..., 1]
+
+    def filters(self, Ts):
+        """
+        Denominadores, numeradores e coeficientes de passo (stepform) de
+        cada grandeza para o período de amostragem Ts (ver modalfilters).
+        Dependem apenas de wn, wd e zeta, então são calculados sem refazer
+        a análise modal e guardados em cache.
+        """
+        key = float(Ts)
+        if key not in self.iircache:
+            Aiir, outputs = self.modalfilters(self.zeta*self.wn, self.wd, Ts,
+                                              self.m)
+            steps = {quantity: self.stepform(N, Aiir)
+                     for quantity, N in outputs.items()}
+            self.iircache[key] = (Aiir, outputs, steps)
+        return self.iircache[key]
+
+    def iircoefficients(self, Ts):
+        """
+        Retorna os numeradores (Biir, deslocamento modal) e os
+        denominadores (Aiir) dos IIRs de cada modo para o período de
+        amostragem Ts.
+        """
+        Aiir, outputs, _ = self.filters(Ts)
+        return outputs["displacement"], Aiir
+
+    def outputcoefficients(self, Ts):
+        """
+        Retorna os numeradores (nmodes x 3) que, com os denominadores de
+        iircoefficients, levam a força modal ao deslocamento, à velocidade
+        ou à aceleração modal de cada modo (ver modalfilters).
+        """
+        return self.filters(Ts)[1]
+
+    def updatecoefficients(self, Ts):
+        """
+        Retorna (n0, c1, c2) de cada grandeza (ver stepform), usados em
+        update e nas malhas fechadas passo a passo.
+        """
+        return self.filters(Ts)[2]
+
+    def setsampling(self, Ts):
+        """
+        Altera o período de amostragem da simulação sem recalcular os modos
+        e reseta a viga. Os modos simulados continuam sendo os escolhidos
+        na construção: modos acima da nova frequência de Nyquist não são
+        incluídos automaticamente (withsampling escolhe os modos do novo
+        período em outra viga).
+        """
+        self.Ts = Ts
+        self.Fs = 1 / Ts
+        self.Biir, self.Aiir = self.iircoefficients(Ts)
+        # Cada grandeza em update é n0*u[n] + c1*w[n] + c2*w[n-1] (stepform)
+        self.stepcoefficients = self.updatecoefficients(Ts)
+        if self.telemetry is not None:
+            self.telemetry.setdeadline("stepping", Ts)
+        self.reset()
+
+    def setdamping(self, damp):
+        """
+        Altera os fatores de amortecimento (valor único, lista ou função,
+        como no construtor) sem refazer a análise modal, e reseta a viga.
+        """
+        self.damp = damp
+        self.zeta = self.dampingfactors(damp)
+        self.wd = self.wn * np.sqrt(1-self.zeta**2)
+        self.iircache = {}
+        self.setsampling(self.Ts)
+
+    def dampingfactors(self, damp):
+        """
+        Retorna o fator de amortecimento de cada modo simulado a partir de
+        um valor único, de uma lista (estendida com o último valor) ou de
+        uma função das frequências de ressonância em Hz.
+        """
+        if callable(damp):
+            return np.asarray(damp(self.freqsHz), dtype=float)
+        damp = np.atleast_1d(np.asarray(damp, dtype=float))
+        if len(damp) < self.nmodes:
+            damp = np.r_[damp, np.full(self.nmodes - len(damp), damp[-1])]
+        return damp[:self.nmodes]
+
+    def settelemetry(self, telemetry):
+        """
+        Ativa (objeto Telemetry) ou desativa (None) a instrumentação.
+        Assim como em setaccelg, os métodos medidos são substituídos por
+        versões cronometradas, sem custo quando a instrumentação está
+        desativada.
+        """
+        self.telemetry = telemetry
+        for name in ("evaluateModesAndFreqs", "update", "noise"):
+            self.__dict__.pop(name, None)
+        if telemetry is not None:
+            telemetry.setdeadline("stepping", self.Ts)
+            self.evaluateModesAndFreqs = telemetry.wrap(
+                "modal analysis", self.evaluateModesAndFreqs)
+            self.update = telemetry.wrap("stepping", self.update)
+            self.noise = telemetry.wrap("noise", self.noise)
+
+    def setdtype(self, dtype):
+        """
+        Altera o tipo usado no estado, em vmod e nas respostas
+        (np.float32 ou np.float64), sem refazer a análise modal,
+        e reseta a viga.
+        """
+        self.dtype = np.dtype(dtype)
+        self.vmod = self.vmod64.astype(self.dtype)
+        self.shapecache = {}
+        self.reset()
 
     def configforcescaler(self, forcescl, magnetdist=1e-3):
         """
@@ -105,18 +351,97 @@ class CantileverBeam:
         self.forcescaler = forcescl / ((magnetdist * 1000) ** 2)
         self.magnetdist = magnetdist
 
+    @staticmethod
+    def inmeters(pos):
+        """
+        Posições float são em metros ao longo de length (0 no engaste);
+        posições int são índices de nós.
+        """
+        return np.asarray(pos).dtype.kind == "f"
+
+    def interpolation(self, x):
+        """
+        Interpolação na posição x (m) entre os nós, guardada em cache:
+        retorna os pesos dos valores nodais (npoints) e as linhas de vmod
+        interpoladas em float64 e no dtype da viga. O nó i fica em
+        x = (i + 1) * length / npoints. A interpolação é por spline
+        cúbica com as condições de contorno da viga em balanço
+        (deslocamento e inclinação nulos no engaste e momento nulo na
+        extremidade livre), linear nos valores nodais, então interpolar
+        os modos e interpolar a resposta nodal são equivalentes. Sobre um
+        nó, os pesos são exatamente os do nó (mesmo resultado do índice).
+        """
+        key = float(x)
+        if key not in self.shapecache:
+            if not 0 <= key <= self.length:
+                raise ValueError(f"position {key} m is outside the beam "
+                                 f"(0 to {self.length} m)")
+            node = key * self.npoints / self.length
+            if abs(node - round(node)) < 1e-9 and round(node) > 0:
+                # Sobre um nó: as linhas do próprio nó (mesmas contas do índice)
+                i = round(node) - 1
+                weights = np.zeros(self.npoints)
+                weights[i] = 1.0
+                self.shapecache[key] = (weights, self.vmod64[i], self.vmod[i])
+            else:
+                nodes = np.arange(self.npoints + 1) * self.length / self.npoints
+                values = np.vstack([np.zeros(self.npoints),
+                                    np.eye(self.npoints)])
+                zeros = np.zeros(self.npoints)
+                spline = interpolate.CubicSpline(
+                    nodes, values, bc_type=((1, zeros), (2, zeros)))
+                weights = spline(key)
+                shape = weights @ self.vmod64
+                self.shapecache[key] = (weights, shape,
+                                        shape.astype(self.dtype))
+        return self.shapecache[key]
+
+    def modeshape(self, pos, exact=False):
+        """
+        Linhas de vmod (vmod64 se exact) em pos: nó (int), lista de nós ou
+        posição(ões) em metros (float), interpoladas entre os nós.
+        """
+        vmod = self.vmod64 if exact else self.vmod
+        if not self.inmeters(pos):
+            return vmod[pos]
+        rows = [self.interpolation(x)[1 if exact else 2] for x in np.ravel(pos)]
+        return rows[0] if np.ndim(pos) == 0 else np.array(rows)
+
+    def pointvalue(self, field, pos):
+        """
+        Valor de uma grandeza nodal (x, v ou a) em pos (nó ou metros).
+        """
+        if self.inmeters(pos):
+            return self.interpolation(pos)[0] @ field
+        return field[pos]
+
+    def applyforce(self, pos, force):
+        """
+        Aplica uma força já escalonada em um nó ou em uma posição em
+        metros (força pontual entre os nós, projetada nos modos
+        interpolados em update).
+        """
+        if self.inmeters(pos):
+            self.interpolation(pos)
+            self.fpos[float(pos)] = force
+        else:
+            self.f[pos] = force
+
     def setforce(self, pos, val):
         """
-        Seta a força aplicada à viga considerando o forcescaler
+        Seta a força aplicada à viga considerando o forcescaler.
+        pos pode ser um nó (int) ou uma posição em metros (float).
         """
-        self.f[pos] = self.forcescaler * val
+        self.applyforce(pos, self.forcescaler * val)
 
     def setforcenl(self, pos, val):
         """
         Tentativa de simular o comportamento não linear na aplicação da força à viga, considerando que a força é
         proporcional ao quadrado da distância entre o atuador e a viga
         """
-        self.f[pos] = self.forcescaler1 * val / (((self.magnetdist + self.x[pos]) * 1000) ** 2)
+        _, c1, c2 = self.stepcoefficients["displacement"]
+        x = self.modeshape(pos) @ (c1*self.w1 + c2*self.w2)
+        self.applyforce(pos, self.forcescaler1 * val / (((self.magnetdist + x) * 1000) ** 2))
     
     def setaccelg(self, val):
         """
@@ -127,42 +452,230 @@ class CantileverBeam:
         else:
             self.getaccel = self.getaccelms2
     
+    def noise(self):
+        """
+        Retorna uma amostra do ruído de medição.
+        """
+        return np.random.randn()*self.noisestd
+
     def getaccelms2(self, pos):
         """
         Retorna o valor da aceleração em m/s^2.
         """
-        return self.a[pos] + np.random.randn()*self.noisestd
+        return self.pointvalue(self.a, pos) + self.noise()
     
     def getaccelg(self, pos):
         """
         Retorna o valor da aceleração em g.
         """
-        return (self.a[pos] + np.random.randn()*self.noisestd)/9.80665
+        return (self.pointvalue(self.a, pos) + self.noise())/9.80665
+
+    def setoutputs(self, *quantities):
+        """
+        Define as grandezas calculadas em update: "displacement" (x),
+        "velocity" (v) e/ou "acceleration" (a, o padrão). As demais
+        ficam em zero, sem custo por passo.
+        """
+        for quantity in quantities:
+            if quantity not in self.FIELDS:
+                raise ValueError(f"quantity must be one of {tuple(self.FIELDS)}")
+        self.outputs = tuple(quantities)
+        self.reset()
 
     def reset(self):
         """
         Reseta a viga para o estado de repouso.
         """
-        self.f = np.zeros(self.npoints)
-        self.x = np.zeros(self.npoints)
-        self.a = np.zeros(self.npoints)
-        self.xiir = np.zeros((self.npoints, self.memiir))
-        self.yiir = np.zeros((self.npoints, self.memiir))
-        self.bufdesloc = np.zeros(self.npoints)
-        self.bufvel = np.zeros((self.npoints, 2))
+        self.f = np.zeros(self.npoints, dtype=self.dtype)
+        self.fpos = {}  # forças (escalonadas) em posições em metros
+        self.x = np.zeros(self.npoints, dtype=self.dtype)
+        self.v = np.zeros(self.npoints, dtype=self.dtype)
+        self.a = np.zeros(self.npoints, dtype=self.dtype)
+        self.u1 = np.zeros(self.nmodes)  # força modal do passo anterior
+        self.w1 = np.zeros(self.nmodes)  # w[n-1]
+        self.w2 = np.zeros(self.nmodes)  # w[n-2]
 
     def update(self):
         """
         Atualiza a viga após a aplicação de uma força, para o próximo passo de tempo.
+        Os estados são modais (nmodes valores); só as grandezas de
+        self.outputs são projetadas nos pontos da viga.
+        """
+        u = self.f @ self.vmod
+        for x, force in self.fpos.items():
+            u = u + force * self.shapecache[x][2]
+        w = self.u1 - self.Aiir[:, 0]*self.w1 - self.Aiir[:, 1]*self.w2
+        self.u1, self.w1, self.w2 = u, w, self.w1
+        for quantity in self.outputs:
+            n0, c1, c2 = self.stepcoefficients[quantity]
+            np.matmul(self.vmod, n0*u + c1*w + c2*self.w2,
+                      out=getattr(self, self.FIELDS[quantity]))
+
+    def simulate(self, force, apos, rpos, Ts=None, quantity="acceleration"):
+        """
+        Simulação em lote: filtra todo o vetor de forças de uma vez com os
+        IIRs de cada modo, partindo da viga em repouso (sem ruído).
+        É equivalente a executar, para cada amostra n,
+        setforce(apos, force[n]), update() e ler a[rpos].
+        apos e rpos podem ser nós (int) ou posições em metros (float).
+        Ts permite simular com outro período de amostragem (o vetor de
+        forças deve estar amostrado com esse período) sem alterar a viga.
+        Retorna o vetor de acelerações em m/s^2 (ou a grandeza pedida em
+        quantity: "displacement", "velocity" ou "acceleration").
+        """
+        return self.filterforce(self.forcescaler * np.asarray(force, dtype=float),
+                                apos, rpos, Ts, quantity)
+
+    def simulatenl(self, command, apos, rpos, Ts=None, quantity="acceleration"):
+        """
+        Simulação em lote com a força não linear do atuador magnético
+        (ver setforcenl). Como a força depende do deslocamento da própria
+        viga no ponto de aplicação, a realimentação é feita amostra a
+        amostra, mas apenas os estados modais e o deslocamento em apos são
+        calculados em cada passo. A aceleração em rpos é obtida depois,
+        filtrando de uma só vez a força efetivamente aplicada.
+        É equivalente a executar, para cada amostra n,
+        setforcenl(apos, command[n]), update() e ler a[rpos].
+        Retorna as acelerações em m/s^2 e a força aplicada em N.
+        """
+        Ts = self.Ts if Ts is None else Ts
+        _, Aiir = self.iircoefficients(Ts)
+        _, c1, c2 = self.updatecoefficients(Ts)["displacement"]
+        command = np.asarray(command, dtype=float)
+        shape = self.modeshape(apos)
+        a1 = Aiir[:, 0]
+        a2 = Aiir[:, 1]
+        # w[n-1], w[n-2] -> deslocamento em apos no passo anterior
+        cx1 = c1 * shape
+        cx2 = c2 * shape
+        forcescaler = self.forcescaler1
+        magnetdist = self.magnetdist
+
+        force = np.zeros(len(command))
+        w1 = np.zeros(self.nmodes)  # w[n-1]
+        w2 = np.zeros(self.nmodes)  # w[n-2]
+        f1 = 0.0  # força do passo anterior
+        for n in range(len(command)):
+            x = cx1 @ w1 + cx2 @ w2
+            f = forcescaler * command[n] / (((magnetdist + x) * 1000) ** 2)
+            w1, w2 = shape*f1 - a1*w1 - a2*w2, w1
+            force[n] = f1 = f
+        return self.filterforce(force, apos, rpos, Ts, quantity), force
+
+    def filterforce(self, force, apos, rpos, Ts=None, quantity="acceleration"):
+        """
+        Filtra com os IIRs de cada modo uma força já escalonada (em N)
+        aplicada em apos e retorna a aceleração em rpos (m/s^2), ou a
+        grandeza pedida em quantity.
+        """
+        return self.project(self.modalcoords(force, apos, Ts, quantity), rpos)
+
+    def stream(self, force_source, apos, rpos, block_size=1024, Ts=None,
+               quantity="acceleration", stats=None):
+        """
+        Simulação em fluxo: consome as forças de um iterador (amostras ou
+        blocos de amostras, como em simulate) e gera as acelerações em rpos
+        (m/s^2), ou a grandeza pedida em quantity, em blocos de block_size
+        amostras, partindo da viga em repouso. Os estados dos IIRs são
+        mantidos entre os blocos, então a memória não depende da duração
+        da simulação (o iterador pode ser infinito). O último bloco pode
+        ser menor. A concatenação dos blocos é igual a simulate.
+        stats: acumulador com push(bloco) (ex. streamStats.StreamingStats)
+        que recebe cada bloco gerado, para estatísticas de execuções longas
+        sem guardar a resposta.
+        """
+        vmod = self.modeshape(rpos)
+        for q in self.streammodal(force_source, apos, block_size, Ts, quantity):
+            output = vmod @ q
+            if stats is not None:
+                stats.push(output)
+            yield output
+
+    def streammodal(self, force_source, apos, block_size=1024, Ts=None,
+                    quantity="acceleration"):
+        """
+        Versão em fluxo de simulatemodal: gera as coordenadas modais
+        (nmodes x n) em blocos de block_size amostras, com os estados dos
+        IIRs mantidos entre os blocos (ver stream). O bloco gerado é
+        reutilizado na iteração seguinte, então deve ser copiado ou
+        projetado antes de pedir o próximo.
+        """
+        Ts = self.Ts if Ts is None else Ts
+        _, Aiir = self.iircoefficients(Ts)
+        numerators = self.outputcoefficients(Ts)[quantity]
+        bf = self.forcescaler * self.modeshape(apos, exact=True)
+        zi = np.zeros((self.nmodes, 2))  # estados do lfilter de cada modo
+        block = np.zeros(block_size)
+        q = np.zeros((self.nmodes, block_size), dtype=self.dtype)
+
+        def compute(n):
+            for k in range(self.nmodes):
+                q[k, :n], zi[k] = signal.lfilter(numerators[k], np.r_[1, Aiir[k, :]],
+                                                 bf[k] * block[:n], zi=zi[k])
+            return q[:, :n]
+
+        filled = 0
+        for values in force_source:
+            values = np.ravel(values)
+            while len(values):
+                n = min(block_size - filled, len(values))
+                block[filled:filled+n] = values[:n]
+                values = values[n:]
+                filled += n
+                if filled == block_size:
+                    filled = 0
+                    yield compute(block_size)
+        if filled:
+            yield compute(filled)
+
+    def simulatemodal(self, force, apos, Ts=None, quantity="acceleration"):
+        """
+        Simulação em lote que guarda apenas as coordenadas modais
+        (nmodes x N) da grandeza pedida, partindo da viga em repouso.
+        A resposta em qualquer ponto, ou na viga inteira, é obtida depois
+        com project, sem simular de novo, usando nmodes/npoints da memória
+        do campo completo.
+        """
+        return self.modalcoords(self.forcescaler * np.asarray(force, dtype=float),
+                                apos, Ts, quantity)
+
+    def modalcoords(self, force, apos, Ts=None, quantity="acceleration"):
+        """
+        Coordenadas modais (nmodes x N) de deslocamento, velocidade ou
+        aceleração para uma força já escalonada (em N) aplicada em apos,
+        obtidas diretamente dos IIRs (ver outputcoefficients). A filtragem
+        é feita em float64 e o resultado é guardado no dtype da viga.
+        """
+        Ts = self.Ts if Ts is None else Ts
+        _, Aiir = self.iircoefficients(Ts)
+        numerators = self.outputcoefficients(Ts)[quantity]
+        force = np.asarray(force, dtype=np.float64)
+        shape = self.modeshape(apos, exact=True)
+        q = np.zeros((self.nmodes, len(force)), dtype=self.dtype)
+        for k in range(self.nmodes):
+            q[k] = signal.lfilter(numerators[k], np.r_[1, Aiir[k, :]],
+                                  shape[k] * force)
+        return q
+
+    def modalfrf(self, freqs, quantity="acceleration", Ts=None):
+        """
+        Resposta em frequência de cada modo (nmodes x len(freqs), complexa)
+        do sistema discreto simulado, para a grandeza pedida. A FRF entre
+        apos e rpos é forcescaler * (vmod[rpos] * vmod[apos]) @ modalfrf(freqs).
+        """
+        Ts = self.Ts if Ts is None else Ts
+        _, Aiir = self.iircoefficients(Ts)
+        N = self.outputcoefficients(Ts)[quantity]
+        z1 = np.exp(-2j * np.pi * np.asarray(freqs, dtype=float) * Ts)  # z^-1
+        z2 = z1**2
+        return (N[:, 0:1] + N[:, 1:2]*z1 + N[:, 2:3]*z2) / \
+            (1 + Aiir[:, 0:1]*z1 + Aiir[:, 1:2]*z2)
+
+    def project(self, q, pos=None):
+        """
+        Reconstrói a resposta física a partir das coordenadas modais q
+        (de qualquer grandeza) em pos: ponto (int), lista de pontos,
+        posição(ões) em metros (float) ou None (viga inteira).
         """
-        self.bufvel[:, 1] = self.bufvel[:, 0]
-        self.bufdesloc[:] = self.x
-        self.x = np.zeros(self.npoints)
-        for k in range(0, self.nmodes):
-            self.xiir[k, 1:self.memiir] = self.xiir[k, 0:self.memiir-1]
-            self.xiir[k, 0] = self.vmod[:, k] @ self.f
-            self.yiir[k, 1:self.memiir] = self.yiir[k, 0:self.memiir-1]
-            self.yiir[k, 0] = (self.Biir[k, :] @ self.xiir[k, :] - self.Aiir[k, :] @ self.yiir[k, 1:self.memiir])
-            self.x = self.x + self.Ts / (self.m*self.wd[k]) * self.yiir[k, 0] * self.vmod[:, k]
-        self.bufvel[:, 0] = (self.x - self.bufdesloc) * self.Fs
-        self.a = (self.bufvel[:, 0] - self.bufvel[:, 1]) * self.Fs
+        vmod = self.vmod if pos is None else self.modeshape(pos)
+        return vmod @ q
@@ -0,0 +1,275 @@
+import time
+import numpy as np
+from scipy import linalg
+
+
+"""
+Active vibration controllers and the closed-loop engine that runs them
+against a CantileverBeam.
+Every controller implements:
+    - reset(): returns the controller to its initial state;
+    - step(measurement, reference, state): receives the sensor readings
+    (m/s^2, one per sensor node), the disturbance reference sample and the
+    modal state of the beam, and returns the actuator commands (one per
+    actuator node, in the same units used by CantileverBeam.setforce);
+    - needsstate: True if step uses the modal state (the closed-loop
+    engine only builds the state for these controllers; controllers
+    without the attribute receive None).
+"""
+
+
+class PID:
+    """
+    Decentralized PID acting on the acceleration of each sensor,
+    with setpoint zero (each sensor drives the actuator of same index).
+    The integral of the acceleration is the velocity, so 'ki' alone gives
+    a direct velocity feedback (active damping).
+    """
+
+    needsstate = False
+
+    def __init__(self, kp, ki, kd, Ts, limit=None):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.Ts = Ts
+        self.limit = limit  # maximum absolute command (saturation)
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous = 0.0
+
+    def step(self, measurement, reference=None, state=None):
+        self.integral = self.integral + measurement * self.Ts
+        derivative = (measurement - self.previous) / self.Ts
+        self.previous = measurement
+        command = -(self.kp * measurement + self.ki * self.integral
+                    + self.kd * derivative)
+        if self.limit is not None:
+            command = np.clip(command, -self.limit, self.limit)
+        return command
+
+
+class LQR:
+    """
+    Linear quadratic regulator on the modal states of the beam.
+    The modal model is the same IIR used by the simulation, written in
+    state space with the states (w[n-1], w[n-2], u[n-1]) of each mode
+    (w is the output of the IIR with unit numerator, see
+    CantileverBeam.stepform). The cost weights the potential energy of
+    the modes (q) against the actuator effort (r).
+    """
+
+    needsstate = True
+
+    def __init__(self, beam, apos, q=1.0, r=1e-6, Ts=None):
+        apos = np.atleast_1d(apos)
+        Ts = beam.Ts if Ts is None else Ts
+        _, Aiir = beam.iircoefficients(Ts)
+        # Modal displacement of the previous step: c1*w[n-1] + c2*w[n-2]
+        _, c1, c2 = beam.updatecoefficients(Ts)["displacement"]
+        nmodes = beam.nmodes
+        nstates = 3 * nmodes
+
+        # States of mode k: 3k -> w[n-1], 3k+1 -> w[n-2], 3k+2 -> u[n-1]
+        A = np.zeros((nstates, nstates))
+        B = np.zeros((nstates, len(apos)))
+        Q = np.zeros((nstates, nstates))
+        for k in range(nmodes):
+            i = 3 * k
+            A[i, i] = -Aiir[k, 0]
+            A[i, i+1] = -Aiir[k, 1]
+            A[i, i+2] = 1
+            A[i+1, i] = 1
+            B[i+2, :] = beam.forcescaler * beam.vmod[apos, k]
+            c = np.array([c1[k], c2[k]])
+            Q[i:i+2, i:i+2] = q * beam.wn[k]**2 * np.outer(c, c)
+        R = r * np.eye(len(apos))
+
+        P = linalg.solve_discrete_are(A, B, Q, R)
+        self.K = linalg.solve(R + B.T @ P @ B, B.T @ P @ A)
+        self.A = A
+        self.B = B
+
+    def reset(self):
+        pass
+
+    def step(self, measurement, reference=None, state=None):
+        return -self.K @ state
+
+
+class FxLMS:
+    """
+    Adaptive filtered-x LMS controller (single sensor and actuator).
+    In feedforward mode the reference is the disturbance signal; in
+    feedback mode the reference is rebuilt from the error and the
+    secondary path model (internal model control).
+    The secondary path (actuator command -> sensor reading) is obtained
+    from the beam model. By default it is long enough for the slowest mode
+    to decay (five time constants), since a truncated path makes the
+    feedback mode unstable.
+    """
+
+    needsstate = False
+
+    def __init__(self, beam, apos, spos, ntaps=64, mu=0.1, pathlen=None,
+                 feedback=False, Ts=None):
+        Ts = beam.Ts if Ts is None else Ts
+        if pathlen is None:
+            pathlen = int(np.ceil(5 / (np.min(beam.zeta * beam.wn) * Ts)))
+        impulse = np.zeros(pathlen)
+        impulse[0] = 1
+        # The sensor is read before each update: one sample of delay
+        path = beam.simulate(impulse, int(np.atleast_1d(apos)[0]),
+                             int(np.atleast_1d(spos)[0]), Ts)
+        self.path = np.r_[0, path[:-1]]
+        self.ntaps = ntaps
+        self.mu = mu
+        self.feedback = feedback
+        self.reset()
+
+    def reset(self):
+        self.w = np.zeros(self.ntaps)
+        self.xbuf = np.zeros(len(self.path))   # reference history
+        self.fxbuf = np.zeros(self.ntaps)      # filtered reference history
+        self.ybuf = np.zeros(len(self.path))   # command history
+        self.command = 0.0
+
+    def step(self, measurement, reference=None, state=None):
+        error = float(np.atleast_1d(measurement)[0])
+
+        if self.feedback:
+            # Disturbance estimate: error minus the controller contribution
+            # (ybuf[i] is the command of i+1 samples ago)
+            x = error - self.path[1:] @ self.ybuf[:-1]
+        else:
+            x = float(reference)
+        self.xbuf = np.roll(self.xbuf, 1)
+        self.xbuf[0] = x
+        self.fxbuf = np.roll(self.fxbuf, 1)
+        self.fxbuf[0] = self.path @ self.xbuf
+
+        # Weights update with the filtered reference (normalized LMS)
+        power = self.fxbuf @ self.fxbuf + 1e-12
+        self.w -= self.mu * error * self.fxbuf / power
+
+        self.command = self.w @ self.xbuf[:self.ntaps]
+        self.ybuf = np.roll(self.ybuf, 1)
+        self.ybuf[0] = self.command
+        return np.array([self.command])
+
+
+class ClosedLoop:
+    """
+    Runs a controller against the beam at the sampling rate, computing only
+    the modal states and the sensor nodes at each step (the full beam field
+    is never built). Each step is equivalent to:
+        measurement = beam.getaccel(spos)
+        command = controller.step(measurement, disturbance, state)
+        beam.setforce(apos, command), beam.setforce(dpos, disturbance)
+        beam.update()
+    The wall time of every step is measured against a latency budget.
+    """
+
+    def __init__(self, beam, controller, apos, spos, dpos=None, Ts=None,
+                 budget=None):
+        """
+        - apos: actuator node (or list of nodes);
+        - spos: sensor node (or list of nodes);
+        - dpos: node where the disturbance force is applied
+        (default: first actuator node);
+        - budget: maximum wall time of one step in seconds (default: Ts).
+        """
+        self.beam = beam
+        self.controller = controller
+        self.apos = np.atleast_1d(apos)
+        self.spos = np.atleast_1d(spos)
+        self.dpos = self.apos[0] if dpos is None else dpos
+        self.Ts = beam.Ts if Ts is None else Ts
+        self.budget = self.Ts if budget is None else budget
+        self.reset()
+
+    def reset(self):
+        nmodes = self.beam.nmodes
+        self.w1 = np.zeros(nmodes)  # w[n-1]
+        self.w2 = np.zeros(nmodes)  # w[n-2]
+        self.u1 = np.zeros(nmodes)  # modal force of the previous step
+        self.accel = np.zeros(len(self.spos))
+        self.controller.reset()
+
+    def state(self):
+        """
+        Modal state (w[n-1], w[n-2], u[n-1]) of each mode, interleaved.
+        """
+        return np.column_stack((self.w1, self.w2, self.u1)).ravel()
+
+    def run(self, disturbance):
+        """
+        Runs the loop over the disturbance force array.
+        Returns a dictionary with the sensor accelerations, the actuator
+        commands and the latency statistics of the steps.
+        """
+        beam = self.beam
+        _, Aiir = beam.iircoefficients(self.Ts)
+        a1 = Aiir[:, 0]
+        a2 = Aiir[:, 1]
+        Bu = beam.forcescaler * beam.vmod[self.apos, :]   # nact x nmodes
+        bd = beam.forcescaler * beam.vmod[self.dpos, :]
+        # Modal acceleration n0*u[n] + c1*w[n] + c2*w[n-1], as in
+        # CantileverBeam.update
+        n0, c1, c2 = beam.updatecoefficients(self.Ts)["acceleration"]
+        Cs = beam.vmod[self.spos, :]
+        noisestd = beam.noisestd
+        usestate = getattr(self.controller, "needsstate", False)
+        step = self.controller.step
+
+        disturbance = np.asarray(disturbance, dtype=float)
+        nsamples = len(disturbance)
+        accel = np.zeros((nsamples, len(self.spos)))
+        commands = np.zeros((nsamples, len(self.apos)))
+        steptime = np.zeros(nsamples)
+        clock = time.perf_counter
+
+        w1, w2, u1 = self.w1, self.w2, self.u1
+        a = self.accel
+        start = clock()
+        for n in range(nsamples):
+            t0 = clock()
+            measurement = a
+            if noisestd:
+                measurement = a + np.random.randn(len(a)) * noisestd
+            state = np.column_stack((w1, w2, u1)).ravel() if usestate \
+                else None
+            command = np.atleast_1d(step(measurement, disturbance[n], state))
+            u = bd * disturbance[n] + command @ Bu
+            w1, w2 = u1 - a1*w1 - a2*w2, w1
+            u1 = u
+            a = Cs @ (n0*u + c1*w1 + c2*w2)
+            accel[n] = measurement
+            commands[n] = command
+            steptime[n] = clock() - t0
+        wall = clock() - start
+
+        self.w1, self.w2, self.u1 = w1, w2, u1
+        self.accel = a
+        return {
+            "acceleration": accel,
+            "command": commands,
+            "steptime": steptime,
+            "latency": latencystats(steptime, self.budget),
+            "realtime_factor": nsamples * self.Ts / wall if wall else np.inf,
+        }
+
+
+def latencystats(steptime, budget):
+    """
+    Summary of the step times (seconds) against the latency budget.
+    """
+    return {
+        "mean": float(np.mean(steptime)),
+        "p99": float(np.percentile(steptime, 99)),
+        "max": float(np.max(steptime)),
+        "budget": budget,
+        "overruns": int(np.sum(steptime > budget)),
+    }
@@ -0,0 +1,336 @@
+import os
+import sys
+import time
+import numpy as np
+from CantileverBeam import CantileverBeam
+from controllers import PID, ClosedLoop
+from simulationService import simulatebatch
+
+
+"""
+Golden-trace equivalence harness.
+The reference recursion (CantileverBeam.update) generates acceleration
+traces over a matrix of beams, excitations and positions. Every
+registered engine is then checked against these traces, reporting its
+error and its speedup over the reference. There is one family of traces
+for each kind of simulation, each with its own stepping reference:
+    - linear: setforce and update;
+    - nonlinear: setforcenl and update (magnet force, commands scaled by
+    NLSCALE so the beam stays far from the magnet);
+    - pid: saturated velocity feedback (PID) with the actuator and the
+    sensor at the read node and the disturbance at the apply node.
+The committed tests/golden_traces.npz is the baseline of the current
+engines: it is only generated again in changes that are meant to change
+the simulated response. The traces are stored in single precision (the
+engines that must match to rounding are checked with rtol 1e-6, well
+above the rounding of float32 relative to the peak of a trace).
+How to use (inside the src folder):
+    python goldenTrace.py generate [file]
+        "creates the golden traces (default: tests/golden_traces.npz)"
+    python goldenTrace.py check [file]
+        "checks all engines against the golden traces"
+"""
+
+# Beams of the matrix: (name, npoints, width, thickness, length,
+# density, elasticmod)
+BEAMS = [
+    ("steel", 60, 0.05, 0.00575, 0.58, 7900, 2e11),
+    ("aluminium-short", 40, 0.03, 0.003, 0.3, 2700, 6.89e10),
+    ("steel-long", 80, 0.05, 0.002, 1.5, 7900, 2e11),
+]
+DAMP = [0.002, 0.002, 0.001, 0.001, 0.001]
+NMODES = 5
+TSAMPLING = 0.004
+NSAMPLES = 1000
+NLSCALE = 1e-3  # commands of the nonlinear family
+PIDGAIN = 0.1   # integral gain of the pid family (velocity feedback)
+PIDLIMIT = 0.1  # saturation of the pid commands (bounded in every case)
+
+# Apply/read positions as fractions of the beam (0 = clamped end)
+POSITIONS = [(1.0, 1.0), (0.25, 0.75)]
+
+# Baseline of the tests
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                      "tests", "golden_traces.npz")
+
+
+def excitations(nsamples, Ts):
+    """
+    Returns the force traces of the matrix.
+    """
+    t = np.arange(nsamples) * Ts
+    pulse = np.zeros(nsamples)
+    pulse[0] = 1
+    rng = np.random.default_rng(1234)
+    return {
+        "pulse": pulse,
+        "harmonic-5Hz": np.sin(2 * np.pi * 5 * t),
+        "harmonic-60Hz": np.sin(2 * np.pi * 60 * t),
+        "chirp": np.sin(2 * np.pi * (1 + 10 * t) * t),
+        "random": rng.standard_normal(nsamples),
+    }
+
+
+def newbeam(spec):
+    _, npoints, width, thickness, length, density, elasticmod = spec
+    return CantileverBeam(npoints, width, thickness, length, density,
+                          elasticmod, TSAMPLING, NMODES, DAMP, 1, 0)
+
+
+def nodes(beam, position):
+    apos = min(int(round(position[0] * beam.npoints)), beam.npoints - 1)
+    rpos = min(int(round(position[1] * beam.npoints)), beam.npoints - 1)
+    return apos, rpos
+
+
+def referenceengine(beam, force, apos, rpos):
+    """
+    Reference recursion: one update() per sample.
+    """
+    beam.reset()
+    acceleration = np.zeros(len(force))
+    for n in range(len(force)):
+        beam.setforce(apos, force[n])
+        beam.update()
+        acceleration[n] = beam.a[rpos]
+    beam.reset()
+    return acceleration
+
+
+def nlreferenceengine(beam, force, apos, rpos):
+    """
+    Reference recursion of the magnet force: one setforcenl() and one
+    update() per sample.
+    """
+    beam.reset()
+    acceleration = np.zeros(len(force))
+    for n in range(len(force)):
+        beam.setforcenl(apos, NLSCALE * force[n])
+        beam.update()
+        acceleration[n] = beam.a[rpos]
+    beam.reset()
+    return acceleration
+
+
+def pidreferenceengine(beam, force, apos, rpos):
+    """
+    Reference recursion of the closed loop: the acceleration at rpos is
+    read before each update() and fed back at rpos (see ClosedLoop).
+    """
+    beam.reset()
+    controller = PID(0, PIDGAIN, 0, beam.Ts, PIDLIMIT)
+    acceleration = np.zeros(len(force))
+    for n in range(len(force)):
+        acceleration[n] = beam.a[rpos]
+        command = controller.step(acceleration[n], force[n])
+        beam.setforce(apos, force[n])
+        beam.setforce(rpos, command + (force[n] if rpos == apos else 0))
+        beam.update()
+    beam.reset()
+    return acceleration
+
+
+def lfilterengine(beam, force, apos, rpos):
+    """
+    Batch filtering of the whole trace (CantileverBeam.simulate).
+    """
+    return beam.simulate(force, apos, rpos)
+
+
+def float32engine(beam, force, apos, rpos):
+    """
+    Batch filtering with single precision storage (vmod and outputs).
+    """
+    beam.setdtype(np.float32)
+    try:
+        return beam.simulate(force, apos, rpos)
+    finally:
+        beam.setdtype(np.float64)
+
+
+def streamengine(beam, force, apos, rpos):
+    """
+    Streaming in blocks (CantileverBeam.stream), one sample at a time.
+    """
+    return np.concatenate(list(beam.stream(iter(force), apos, rpos, 256)))
+
+
+def modalengine(beam, force, apos, rpos):
+    """
+    Modal coordinates of the run projected at rpos (the Fixed Time page).
+    """
+    return beam.project(beam.simulatemodal(force, apos), rpos)
+
+
+def metersengine(beam, force, apos, rpos):
+    """
+    Batch filtering with the positions of the nodes given in meters.
+    """
+    def meters(node):
+        return (node + 1) * beam.length / beam.npoints
+    return beam.simulate(force, meters(apos), meters(rpos))
+
+
+def serviceengine(beam, force, apos, rpos):
+    """
+    Coalesced batch of the simulation service, with a shorter request
+    filtered together (zero padded).
+    """
+    half = len(force) // 2
+    return simulatebatch(beam, [(force[:half], rpos, apos),
+                                (force, apos, rpos)])[1]
+
+
+def simulatenlengine(beam, force, apos, rpos):
+    """
+    Batch engine of the magnet force (CantileverBeam.simulatenl).
+    """
+    return beam.simulatenl(NLSCALE * force, apos, rpos)[0]
+
+
+def closedloopengine(beam, force, apos, rpos):
+    """
+    Closed-loop engine (controllers.ClosedLoop) with the PID.
+    """
+    loop = ClosedLoop(beam, PID(0, PIDGAIN, 0, beam.Ts, PIDLIMIT), rpos,
+                      rpos, dpos=apos)
+    return loop.run(force)["acceleration"][:, 0]
+
+
+# Engines checked by the harness: name -> function(beam, force, apos, rpos)
+ENGINES = {
+    "reference": referenceengine,
+    "lfilter": lfilterengine,
+    "float32": float32engine,
+    "stream": streamengine,
+    "modal": modalengine,
+    "meters": metersengine,
+    "service": serviceengine,
+}
+NLENGINES = {"simulatenl": simulatenlengine}
+PIDENGINES = {"closedloop": closedloopengine}
+
+# Families of traces: name -> (reference engine, engines of the family).
+# The golden traces of a family are saved as "family:case" (only the
+# case name for the linear family).
+FAMILIES = {
+    "linear": (referenceengine, ENGINES),
+    "nonlinear": (nlreferenceengine, NLENGINES),
+    "pid": (pidreferenceengine, PIDENGINES),
+}
+
+# Tolerance of the engines that are not expected to match to rounding
+TOLERANCES = {
+    "float32": 1e-4,
+}
+
+
+def registerengine(name, func, rtol=None, family="linear"):
+    """
+    Adds an engine to a family of the harness.
+    """
+    FAMILIES[family][1][name] = func
+    if rtol is not None:
+        TOLERANCES[name] = rtol
+
+
+def cases():
+    """
+    Iterates over the matrix: (case name, beam, force, apos, rpos).
+    """
+    for spec in BEAMS:
+        beam = newbeam(spec)
+        for excitation, force in excitations(NSAMPLES, beam.Ts).items():
+            for position in POSITIONS:
+                apos, rpos = nodes(beam, position)
+                name = f"{spec[0]}/{excitation}/{apos}->{rpos}"
+                yield name, beam, force, apos, rpos
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def tracekey(family, name):
+    return name if family == "linear" else f"{family}:{name}"
+
+
+def generate(path=GOLDEN):
+    """
+    Generates the golden traces with the reference engine of each family.
+    The time of each reference run is saved to compute the speedups.
+    """
+    traces = {}
+    for family, (reference, _) in FAMILIES.items():
+        for name, beam, force, apos, rpos in cases():
+            key = tracekey(family, name)
+            trace, seconds = timed(reference, beam, force, apos, rpos)
+            traces[key] = trace.astype(np.float32)
+            traces[key + ":seconds"] = np.array(seconds)
+    np.savez_compressed(path, **traces)
+    print(f"{len(traces) // 2} golden traces saved in {path}")
+
+
+def check(path=GOLDEN, engines=None, rtol=1e-6):
+    """
+    Checks the engines against the golden traces of their family.
+    The error of each case is the maximum absolute difference divided by
+    the peak of the golden trace, compared with the engine tolerance in
+    TOLERANCES (default: rtol). 'engines' (name -> function) replaces
+    the registered engines of the linear family. Returns a dictionary
+    engine -> {"max_error", "failures", "speedup"}.
+    """
+    golden = np.load(path)
+    report = {}
+    for family, (_, registered) in FAMILIES.items():
+        if engines is not None:
+            if family != "linear":
+                continue
+            registered = engines
+        for engine, func in registered.items():
+            tolerance = TOLERANCES.get(engine, rtol)
+            errors = []
+            failures = []
+            reftime = 0.0
+            enginetime = 0.0
+            for name, beam, force, apos, rpos in cases():
+                key = tracekey(family, name)
+                trace, seconds = timed(func, beam, force, apos, rpos)
+                expected = golden[key].astype(np.float64)
+                scale = max(np.max(np.abs(expected)), np.finfo(float).tiny)
+                error = np.max(np.abs(trace - expected)) / scale
+                errors.append(error)
+                if not error <= tolerance:
+                    failures.append((key, error))
+                reftime += float(golden[key + ":seconds"])
+                enginetime += seconds
+            report[engine] = {"max_error": max(errors),
+                              "tolerance": tolerance,
+                              "failures": failures,
+                              "speedup": reftime / enginetime}
+    return report
+
+
+def printreport(report):
+    print(f"{'engine':15s} {'max error':>12s} {'speedup':>10s}  status")
+    for engine, result in report.items():
+        status = "ok" if not result["failures"] else \
+            f"{len(result['failures'])} cases above {result['tolerance']:g}"
+        print(f"{engine:15s} {result['max_error']:12.3e} "
+              f"{result['speedup']:9.1f}x  {status}")
+        for name, error in result["failures"][:5]:
+            print(f"    {name}: {error:.3e}")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    path = sys.argv[2] if len(sys.argv) > 2 else GOLDEN
+    if command == "generate":
+        generate(path)
+    else:
+        report = check(path)
+        printreport(report)
+        if any(result["failures"] for result in report.values()):
+            sys.exit(1)
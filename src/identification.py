@@ -0,0 +1,271 @@
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import optimize, signal
+
+
+"""
+Identification of the damping factors (zeta), the elastic modulus and the
+force scaler of a CantileverBeam from measured traces (force applied at
+apos and acceleration read at rpos).
+The mode shapes do not depend on these parameters (the stiffness matrix
+is proportional to elasticmod, so only the frequencies scale with
+sqrt(elasticmod)), so every model evaluation is a modal superposition of
+the IIRs of the modes, without a new modal analysis and without stepping
+the beam. The model uses the discretization of the simulation
+(CantileverBeam.modalfilters). The residuals are vectorized over the
+modes and the Jacobian is exact: the derivatives of each IIR output with
+respect to its coefficients are obtained by filtering the output once
+more, and the derivatives of the coefficients by a complex step through
+modalfilters. The initial
+elastic modulus comes from the peak of the measured FRF and the fit is
+repeated from several starting points in parallel.
+How to use (inside the src folder):
+    python identification.py [--starts n] [--workers n]
+        "identifies a simulated 'measured' beam and prints the result"
+"""
+
+
+def frfpeak(force, acceleration, Ts, fmin, fmax):
+    """
+    Frequency (Hz) of the peak of the FRF estimate acceleration/force
+    between fmin and fmax (full record, zero padded).
+    """
+    n = 4 * len(force)
+    freqs = np.fft.rfftfreq(n, Ts)
+    F = np.fft.rfft(force, n)
+    A = np.fft.rfft(acceleration, n)
+    band = (freqs >= fmin) & (freqs <= fmax) & (np.abs(F) > 1e-12 * np.max(np.abs(F)))
+    if not np.any(band):
+        return None
+    H = np.abs(A[band] / F[band])
+    return freqs[band][np.argmax(H)]
+
+
+class Identification:
+    """
+    Least squares fit of the parameters of a beam to measured records.
+    The parameters are theta = (zeta of each mode, elasticmod/elasticmod
+    of the beam, forcescaler).
+    """
+
+    def __init__(self, beam, records):
+        """
+        - records: list of (force, apos, rpos, acceleration) with the force
+        in the units of setforce and the acceleration in m/s^2, sampled at
+        beam.Ts and starting from rest.
+        """
+        self.beam = beam
+        self.records = [(np.asarray(force, dtype=float), apos, rpos,
+                         np.asarray(acceleration, dtype=float))
+                        for force, apos, rpos, acceleration in records]
+        self.measured = np.concatenate([record[3] for record in self.records])
+        self.nmodes = beam.nmodes
+        self.wn0 = 2 * np.pi * np.asarray(beam.freqsHz, dtype=float)
+        self.vmod = beam.vmod64
+        self.cache = (None, None, None)
+
+    def unpack(self, theta):
+        return theta[:self.nmodes], theta[self.nmodes], theta[self.nmodes+1]
+
+    def evaluate(self, theta):
+        """
+        Returns the model acceleration of all records (concatenated) and
+        its Jacobian (samples x parameters). The last evaluation is cached,
+        since least_squares asks for the residuals and the Jacobian of the
+        same point separately.
+        """
+        if self.cache[0] is not None and np.array_equal(self.cache[0], theta):
+            return self.cache[1], self.cache[2]
+        zeta, scale, forcescaler = self.unpack(theta)
+        Ts = self.beam.Ts
+        m = self.beam.m
+
+        wn = self.wn0 * np.sqrt(scale)
+        sq = np.sqrt(1 - zeta**2)
+        wd = wn * sq
+        sigma = zeta * wn
+
+        def coefficients(sigma, wd):
+            # a1, a2 and the modal acceleration n0*u[n] + c1*w[n] +
+            # c2*w[n-1], w = z^-1/A(z) u (CantileverBeam.stepform)
+            Aiir, outputs = self.beam.modalfilters(sigma, wd, Ts, m)
+            return (Aiir[:, 0], Aiir[:, 1],
+                    *self.beam.stepform(outputs["acceleration"], Aiir))
+
+        a1, a2, n0, c1, c2 = coefficients(sigma, wd)
+        # Derivatives of the coefficients with respect to sigma and wd
+        # (complex step: exact to rounding, no subtraction)
+        h = 1e-30
+        (a1_sigma, a2_sigma, n0_sigma, c1_sigma, c2_sigma) = (
+            value.imag / h for value in coefficients(sigma + 1j*h, wd))
+        (a1_wd, a2_wd, n0_wd, c1_wd, c2_wd) = (
+            value.imag / h for value in coefficients(sigma, wd + 1j*h))
+
+        def delay(x):
+            return np.r_[0, x[:-1]]
+
+        outputs = []
+        jacobians = []
+        for force, apos, rpos, _ in self.records:
+            n = len(force)
+            acc = np.zeros((self.nmodes, n))
+            acc_sigma = np.zeros((self.nmodes, n))
+            acc_wd = np.zeros((self.nmodes, n))
+            for k in range(self.nmodes):
+                den = [1, a1[k], a2[k]]
+                u = forcescaler * self.vmod[apos, k] * force
+                w = signal.lfilter([0, 1], den, u)   # unit numerator
+                w1 = delay(w)
+                v1 = delay(signal.lfilter([1], den, w))  # -dw/da1
+                v2 = delay(v1)                           # -dw/da2
+                w_sigma = -(a1_sigma[k] * v1 + a2_sigma[k] * v2)
+                w_wd = -(a1_wd[k] * v1 + a2_wd[k] * v2)
+                acc[k] = n0[k] * u + c1[k] * w + c2[k] * w1
+                acc_sigma[k] = (n0_sigma[k] * u + c1_sigma[k] * w
+                                + c2_sigma[k] * w1 + c1[k] * w_sigma
+                                + c2[k] * delay(w_sigma))
+                acc_wd[k] = (n0_wd[k] * u + c1_wd[k] * w + c2_wd[k] * w1
+                             + c1[k] * w_wd + c2[k] * delay(w_wd))
+            phi = self.vmod[rpos, :]
+            acceleration = phi @ acc
+            # Chain rule: sigma = zeta*wn, wd = wn*sqrt(1 - zeta^2),
+            # wn = wn0*sqrt(scale)
+            acc_zeta = acc_sigma * wn[:, None] - acc_wd * (wn*zeta/sq)[:, None]
+            acc_wn = acc_sigma * zeta[:, None] + acc_wd * sq[:, None]
+            acc_scale = acc_wn * (wn / (2*scale))[:, None]
+            jacobian = np.empty((n, self.nmodes + 2))
+            jacobian[:, :self.nmodes] = (phi[:, None] * acc_zeta).T
+            jacobian[:, self.nmodes] = phi @ acc_scale
+            jacobian[:, self.nmodes+1] = acceleration / forcescaler
+            outputs.append(acceleration)
+            jacobians.append(jacobian)
+
+        result = np.concatenate(outputs), np.concatenate(jacobians)
+        self.cache = (np.array(theta), *result)
+        return result
+
+    def residuals(self, theta):
+        return self.evaluate(theta)[0] - self.measured
+
+    def jacobian(self, theta):
+        return self.evaluate(theta)[1]
+
+    def initial(self):
+        """
+        Initial parameters: elasticmod ratio from the first resonance of
+        the measured FRF, zeta and forcescaler of the beam.
+        """
+        f1 = self.wn0[0] / (2 * np.pi)
+        peaks = [frfpeak(force, acceleration, self.beam.Ts, f1 / 2, f1 * 2)
+                 for force, _, _, acceleration in self.records]
+        peaks = [peak for peak in peaks if peak]
+        scale = (np.median(peaks) / f1) ** 2 if peaks else 1.0
+        return np.r_[self.beam.zeta, scale, self.beam.forcescaler]
+
+    def starts(self, nstarts, seed=0):
+        """
+        Starting points: the initial guess and random perturbations
+        (zeta log-uniform in [0.2x, 5x], elasticmod ratio within 2%).
+        """
+        rng = np.random.default_rng(seed)
+        theta0 = self.initial()
+        points = [theta0]
+        for _ in range(nstarts - 1):
+            theta = theta0.copy()
+            theta[:self.nmodes] *= np.exp(rng.uniform(np.log(0.2), np.log(5),
+                                                      self.nmodes))
+            theta[self.nmodes] *= rng.uniform(0.98, 1.02)
+            points.append(theta)
+        return points
+
+    def bounds(self):
+        lower = np.r_[np.full(self.nmodes, 1e-6), 0.1, 0]
+        upper = np.r_[np.full(self.nmodes, 0.5), 10, np.inf]
+        return lower, upper
+
+    def solve(self, theta0):
+        """
+        Fit from one starting point (trust region reflective).
+        """
+        lower, upper = self.bounds()
+        theta0 = np.clip(theta0, lower, np.nextafter(upper, 0))
+        return optimize.least_squares(self.residuals, theta0,
+                                      jac=self.jacobian, bounds=(lower, upper),
+                                      x_scale="jac", method="trf")
+
+    def fit(self, nstarts=8, workers=None, seed=0):
+        """
+        Multi-start fit (starting points solved in parallel processes).
+        Returns a dictionary with the best parameters, the normalized RMS
+        error and the cost of every start.
+        """
+        points = self.starts(nstarts, seed)
+        if workers == 1:
+            solutions = [self.solve(theta0) for theta0 in points]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                solutions = list(pool.map(self.solve, points))
+        best = min(solutions, key=lambda solution: solution.cost)
+        zeta, scale, forcescaler = self.unpack(best.x)
+        error = np.sqrt(np.mean(best.fun**2) / np.mean(self.measured**2))
+        return {
+            "zeta": zeta,
+            "elasticmod": scale * self.beam.elasticmod,
+            "forcescaler": forcescaler,
+            "freqsHz": self.wn0 * np.sqrt(scale) / (2 * np.pi),
+            "error": float(error),
+            "costs": [float(solution.cost) for solution in solutions],
+            "nfev": sum(solution.nfev for solution in solutions),
+        }
+
+
+def applyfit(beam, result):
+    """
+    Updates the beam with the identified parameters, without redoing the
+    modal analysis (the mode shapes do not depend on them). The force
+    scaler goes through configforcescaler, so forcescaler1 (used by the
+    magnet force) matches the identified forcescaler.
+    """
+    scale = result["elasticmod"] / beam.elasticmod
+    beam.elasticmod = result["elasticmod"]
+    beam.freqsHz = beam.freqsHz * np.sqrt(scale)
+    beam.wn = 2 * np.pi * beam.freqsHz
+    beam.setdamping(np.asarray(result["zeta"], dtype=float))
+    beam.configforcescaler(
+        result["forcescaler"] * (beam.magnetdist * 1000) ** 2,
+        beam.magnetdist)
+
+
+if __name__ == '__main__':
+    from CantileverBeam import CantileverBeam
+
+    parser = argparse.ArgumentParser(description="Parameter identification")
+    parser.add_argument("--starts", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=0.01)
+    args = parser.parse_args(sys.argv[1:])
+
+    def newbeam(elasticmod, damp, forcescaler):
+        return CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, elasticmod,
+                              0.001, 4, damp, forcescaler, 0)
+
+    true = newbeam(1.9e11, [0.004, 0.003, 0.002, 0.0015, 0.001], 1.3)
+    rng = np.random.default_rng(1)
+    force = rng.standard_normal(5000)
+    measured = true.simulate(force, 30, 59)
+    measured += rng.standard_normal(len(measured)) * args.noise
+
+    beam = newbeam(2e11, [0.002, 0.002, 0.001, 0.001, 0.001], 1)
+    identification = Identification(beam, [(force, 30, 59, measured)])
+    result = identification.fit(args.starts, args.workers)
+    print(f"{'':12s} {'identified':>12s} {'true':>12s}")
+    for k in range(beam.nmodes):
+        print(f"{'zeta ' + str(k):12s} {result['zeta'][k]:12.5f} "
+              f"{true.zeta[k]:12.5f}")
+    print(f"{'elasticmod':12s} {result['elasticmod']:12.4g} "
+          f"{true.elasticmod:12.4g}")
+    print(f"{'forcescaler':12s} {result['forcescaler']:12.4f} "
+          f"{true.forcescaler:12.4f}")
+    print(f"error {result['error']:.3e}, {result['nfev']} evaluations")
@@ -1,11 +1,24 @@
+import os
+import time
+from collections import deque
 import numpy as np
 import pyqtgraph as pg
 from PySide2 import QtCore
-from PySide2.QtWidgets import QMainWindow, QVBoxLayout
+from PySide2.QtWidgets import (QMainWindow, QVBoxLayout, QDoubleSpinBox,
+                               QLabel)
 from src.ui.mainWindow2_ui import Ui_MainWindow
 from matplotlib.backends.backend_qt5agg import FigureCanvas
 from matplotlib.figure import Figure
-from cantileverBeam import CantileverBeam
+from CantileverBeam import CantileverBeam
+from resultExport import ResultWriter, newresultdir, loadresult
+from telemetry import Telemetry
+from playback import Playback
+from sessionLog import SessionLog, PULSE, HARMONIC, NORMAL, SLOWMOTION
+from simProcess import SimulatorProcess
+from spectrum import StreamingSTFT
+from reportRender import drawcharts
+
+FIXEDBLOCK = 4096  # samples of each block of the Fixed Time inputs
 
 
 class MainWindow(QMainWindow):
@@ -18,6 +31,9 @@ class MainWindow(QMainWindow):
         self.ui.gbx_speedsm.setDisabled(True)
         self.ui.dbx_elastic.setMaximum(100000)
         self.ui.sbx_ndiv.setMaximum(1000)
+        self.ui.sbx_ndiv.setToolTip("Number of points of the beam model. "
+                                    "meshConvergence.py finds the smallest "
+                                    "one that meets a frequency tolerance.")
         self.ui.dbx_width.setMaximum(1000)
         self.ui.dbx_length.setMaximum(100000)
         self.ui.dbx_density.setMaximum(1000000)
@@ -31,6 +47,31 @@ class MainWindow(QMainWindow):
         self.ui.hsl_freq.setMaximum(1000)
         self.ui.dbx_elastic.setValue(200)
 
+        # Sampling period of each Fixed Time run (in ms)
+        self.dbx_tsft = QDoubleSpinBox(self.ui.gbx_settings)
+        self.dbx_tsft.setStyleSheet(u"font: 10pt \"MS Shell Dlg 2\";")
+        self.dbx_tsft.setDecimals(3)
+        self.dbx_tsft.setRange(0.01, 100)
+        self.dbx_tsft.setValue(4)
+        lbl_tsft = QLabel("Sampling (ms):", self.ui.gbx_settings)
+        lbl_tsft.setStyleSheet(u"font: 10pt \"MS Shell Dlg 2\";")
+        self.ui.formLayout_3.addRow(lbl_tsft, self.dbx_tsft)
+
+        # Telemetry is disabled by default (see enableTelemetry)
+        self.telemetry = None
+        self.realtelemetry = None
+        self.metricsfile = None
+
+        # Real Time session recording is disabled by default
+        # (see enableRecording)
+        self.sessionlog = None
+        self.logfile = None
+        self.loggedTs = None  # sampling period of the last logged beam
+
+        # Normal time simulation in a child process (see enableProcess)
+        self.simprocess = None
+        self.realsteps = 0  # step of the normal time run (see resetReal)
+
         # Cantilever Beam Initialization
         npoints = 60
         width = 0.05
@@ -38,18 +79,14 @@ class MainWindow(QMainWindow):
         lenght = 0.58
         density = 7900
         elasticmod = 2e11
-        Tsampling = 0.004
-        nmodes = 5
-        damp = [0.002, 0.002, 0.001, 0.001, 0.001]
-        forcescaler = 1
-        noisestd = 0
 
-        self.beam = CantileverBeam(npoints, width, thickness, lenght, density,
-                                   elasticmod, Tsampling, nmodes, damp,
-                                   forcescaler, noisestd)
-        self.beam.reset()
+        self.newBeam(npoints, width, thickness, lenght, density, elasticmod)
         self.prev_material = "Titânio Ti-6A1-4V"
 
+        # Fixed Time results are written to disk when a directory is set
+        self.exportdir = None
+        self.exportdisplacement = False
+
         # Boxes configuration with default number of points
         self.ui.sbx_aposft.setMaximum(self.beam.npoints - 1)
         self.ui.sbx_rposft.setMaximum(self.beam.npoints - 1)
@@ -72,6 +109,14 @@ class MainWindow(QMainWindow):
         self.static_ax2.set_xlabel("Time (s)")
         self.static_ax2.set_ylabel("Acceleration ($m/s^2$)")
 
+        # Fixed Time Initialization - 'Acceleration Spectrum' chart
+        static_canvas3 = FigureCanvas(Figure(figsize=(6, 3)))
+        layout_aft.addWidget(static_canvas3)
+        self.static_ax3 = static_canvas3.figure.subplots()
+        self.static_ax3.set_title("Acceleration Spectrum", fontsize=16)
+        self.static_ax3.set_xlabel("Frequency (Hz)")
+        self.static_ax3.set_ylabel("PSD ($(m/s^2)^2/Hz$)")
+
         # Real Time Charts - Color Setup
         pg.setConfigOption('background', 'w')
         pg.setConfigOption('foreground', 'k')
@@ -94,17 +139,254 @@ class MainWindow(QMainWindow):
         self.dynamic_ax2.setLabel('bottom', "Time (s)")
         self.curve2 = self.dynamic_ax2.plot()
 
+        # Real Time Initialization - 'Spectrogram' chart
+        dynamic_canvas3 = pg.GraphicsWindow()
+        layout_art.addWidget(dynamic_canvas3)
+        self.dynamic_ax3 = dynamic_canvas3.addPlot(title="Spectrogram")
+        self.dynamic_ax3.setLabel('left', "Frequency (Hz)")
+        self.dynamic_ax3.setLabel('bottom', "Time (s)")
+        self.spectrogram = pg.ImageItem()
+        self.dynamic_ax3.addItem(self.spectrogram)
+        self.resonances = []
+
         # Connections
         self.ui.rbt_default.toggled.connect(self.settingsEnable)
         self.ui.cbx_material.currentTextChanged.connect(self.settingsMaterial)
         self.ui.btn_set.clicked.connect(self.settingsUpdate)
         self.ui.rbt_pulseft.toggled.connect(self.enableFixed)
         self.ui.btn_update.clicked.connect(self.updateFixed)
+        self.ui.sbx_rposft.valueChanged.connect(self.reprojectFixed)
         self.ui.hsl_force.valueChanged.connect(self.updateBars)
         self.ui.hsl_freq.valueChanged.connect(self.updateBars)
+        self.ui.hsl_force.valueChanged.connect(
+            lambda value: self.changeBar("force", float(value)))
+        self.ui.hsl_freq.valueChanged.connect(
+            lambda value: self.changeBar("freq", float(value)))
+        self.ui.rbt_pulsert.toggled.connect(
+            lambda checked: self.changeBar("mode",
+                                           PULSE if checked else HARMONIC))
         self.ui.rbt_normalrt.toggled.connect(self.enableSpeed)
         self.ui.rbt_pulsert.toggled.connect(self.enableReal)
-        # self.ui.btn_startrt.clicked.connect(self.updateReal)
+        self.ui.btn_startrt.clicked.connect(self.startReal)
+        self.ui.btn_stoprt.clicked.connect(self.stopReal)
+        self.ui.btn_resetrt.clicked.connect(self.resetReal)
+        for button in (self.ui.rbt_1, self.ui.rbt_01, self.ui.rbt_001,
+                       self.ui.rbt_0001):
+            button.toggled.connect(self.changeSpeed)
+
+        # Real Time Initialization - timer and chart buffers
+        self.playback = None
+        self.ui.rbt_1.setChecked(True)
+        self.frameinterval = 40  # ms between two chart updates
+        self.realspan = 5.0  # seconds shown on the Real Time charts
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.updateReal)
+        self.resetReal()
+
+    def newBeam(self, npoints, width, thickness, length, density,
+                elasticmod):
+        """
+        This function creates the simulated beam. The simulated modes are
+        all the modes below the Nyquist frequency, and the damping list
+        is extended with its last value when there are more modes.
+        """
+
+        Tsampling = 0.004
+        nmodes = None
+        damp = [0.002, 0.002, 0.001, 0.001, 0.001]
+        forcescaler = 1
+        noisestd = 0
+
+        self.beam = CantileverBeam(npoints, width, thickness, length,
+                                   density, elasticmod, Tsampling, nmodes,
+                                   damp, forcescaler, noisestd,
+                                   self.telemetry)
+        if self.realtelemetry is not None:
+            # Stepping of the Real Time page
+            self.beam.settelemetry(self.realtelemetry)
+        self.beam.reset()
+        self.beamconfig = dict(npoints=npoints, width=width,
+                               thickness=thickness, length=length,
+                               density=density, elasticmod=elasticmod,
+                               Tsampling=Tsampling, nmodes=nmodes,
+                               damp=damp, forcescaler=forcescaler,
+                               noisestd=noisestd)
+        step = self.realsteps
+        if self.simprocess is not None:
+            step = self.simprocess.setbeam(self.beamconfig)
+        if self.sessionlog is not None:
+            self.sessionlog.recordbeam(step, **self.beamconfig)
+            self.loggedTs = self.beam.Ts
+        self.fixedmodal = None  # modal coordinates of the last Fixed Time run
+        self.fixedbeams = {}    # Fixed Time model of each sampling period
+        self.fixedbeam = None   # model of the last Fixed Time run
+        self.ui.sbx_aposrt.setMaximum(self.beam.npoints - 1)
+        self.ui.sbx_rposrt.setMaximum(self.beam.npoints - 1)
+
+    def enableTelemetry(self, metricsfile=None):
+        """
+        This function turns on the simulation instrumentation.
+        The statistics of each Fixed Time run and of each Real Time run
+        (from START to STOP or RESET: frame time, steps and frame
+        deadline misses) are shown on the status bar and, if
+        'metricsfile' is given, appended to that file. The beam is built
+        again so that its modal analysis is measured.
+        """
+
+        self.telemetry = Telemetry()
+        self.realtelemetry = Telemetry(trackmemory=False)
+        self.realtelemetry.setdeadline("frame", self.frameinterval / 1000)
+        self.metricsfile = metricsfile
+        config = self.beamconfig
+        self.newBeam(config["npoints"], config["width"], config["thickness"],
+                     config["length"], config["density"], config["elasticmod"])
+        self.resetReal()
+
+    def reportReal(self):
+        """
+        This function ends the telemetry of the current Real Time run
+        and shows (and saves) its statistics.
+        """
+
+        if self.realtelemetry is None or self.realtelemetry.runstart is None:
+            return
+        self.realtelemetry.stop()
+        self.ui.statusbar.showMessage(self.realtelemetry.summary())
+        if self.metricsfile is not None:
+            self.realtelemetry.dump(self.metricsfile, page="real time",
+                                    npoints=self.beam.npoints,
+                                    nmodes=self.beam.nmodes,
+                                    process=self.simprocess is not None)
+
+    def enableExport(self, exportdir, displacement=False):
+        """
+        This function turns on the export of the Fixed Time runs: each
+        run is written to a new folder inside 'exportdir' (see
+        resultExport.loadresult), with its modal coordinates and the
+        displacement at the reading position if 'displacement' is True.
+        """
+
+        self.exportdir = exportdir
+        self.exportdisplacement = displacement
+
+    def enableRecording(self, logfile):
+        """
+        This function turns on the recording of the Real Time session.
+        Every input event is logged with the simulation step where it
+        takes effect and the log is saved to 'logfile' when the window
+        is closed (replay it with sessionLog.replay).
+        """
+
+        self.sessionlog = SessionLog()
+        self.logfile = logfile
+        # The period of the beam itself, which may not be the one it was
+        # built with
+        self.sessionlog.recordbeam(self.realStep(),
+                                   **dict(self.beamconfig,
+                                          Tsampling=self.beam.Ts))
+        self.loggedTs = self.beam.Ts
+        self.recordEvent("force", self.ui.hsl_force.value())
+        self.recordEvent("freq", self.ui.hsl_freq.value())
+        self.recordEvent("mode", PULSE if self.ui.rbt_pulsert.isChecked()
+                         else HARMONIC)
+
+    def realStep(self):
+        """
+        This function returns the current step of the normal time
+        simulation (the step of the child process in process mode).
+        """
+
+        if self.simprocess is not None:
+            return self.simprocess.step()
+        return self.realsteps
+
+    def recordEvent(self, event, value=0.0, step=None):
+        """
+        This function adds an input event to the session log, at 'step'
+        (by default the current step, see realStep). The events sent to
+        the child process are logged with the step it answers, where the
+        event takes effect.
+        """
+
+        if self.sessionlog is not None:
+            if step is None:
+                step = self.realStep()
+            self.sessionlog.record(event, step, value)
+
+    def changeBar(self, event, value):
+        """
+        This function applies a change of the force or frequency bar or
+        of the mode ('event'), in the child process if there is one, and
+        logs it.
+        """
+
+        step = None
+        if self.simprocess is not None:
+            step = self.simprocess.set(event, value)
+        self.recordEvent(event, value, step)
+
+    def recordSampling(self):
+        """
+        This function logs the sampling period of the beam (at rest) when
+        it is not the last one logged, so the replay follows the change.
+        """
+
+        if self.sessionlog is not None and self.beam.Ts != self.loggedTs:
+            self.recordEvent("sampling", self.beam.Ts)
+            self.loggedTs = self.beam.Ts
+
+    def recordHead(self):
+        """
+        This function logs the playback head of a running slow motion
+        simulation (the last sample shown).
+        """
+
+        if self.playback is not None and self.timer.isActive():
+            self.recordEvent("head", int(self.playback.time / self.beam.Ts))
+
+    def saveRecording(self):
+        """
+        This function ends the session log and saves it.
+        """
+
+        if self.sessionlog is None:
+            return
+        self.recordHead()
+        self.recordEvent("end")
+        self.sessionlog.save(self.logfile)
+        self.sessionlog = None
+
+    def enableProcess(self):
+        """
+        This function moves the normal time simulation to a child
+        process: the beam is stepped there and the samples are read from
+        a shared memory ring buffer on each frame, so stepping and drawing
+        do not compete for the GIL. The session log (enableRecording)
+        then uses the steps of the child.
+        """
+
+        self.simprocess = SimulatorProcess(self.beamconfig)
+        self.sendBars()
+        self.resetReal()
+
+    def sendBars(self):
+        """
+        This function sends the current bars and mode to the child
+        process.
+        """
+
+        if self.simprocess is None:
+            return
+        self.simprocess.set("force", float(self.ui.hsl_force.value()))
+        self.simprocess.set("freq", float(self.ui.hsl_freq.value()))
+        self.simprocess.set("mode", PULSE if self.ui.rbt_pulsert.isChecked()
+                            else HARMONIC)
+
+    def closeEvent(self, event):
+        self.saveRecording()
+        if self.simprocess is not None:
+            self.simprocess.close()
+        super().closeEvent(event)
 
     def settingsEnable(self):
         """
@@ -121,17 +403,11 @@ class MainWindow(QMainWindow):
             length = 0.58
             density = 7900
             elasticmod = 2e11
-            Tsampling = 0.004
-            nmodes = 5
-            damp = [0.002, 0.002, 0.001, 0.001, 0.001]
-            forcescaler = 1
-            noisestd = 0
 
             # Creates a new beam with the updated values
-            self.beam = CantileverBeam(npoints, width, thickness, length,
-                                       density, elasticmod, Tsampling,
-                                       nmodes, damp, forcescaler, noisestd)
-            self.beam.reset()
+            self.newBeam(npoints, width, thickness, length, density,
+                         elasticmod)
+            self.resetReal()
 
             self.ui.sbx_aposft.setMaximum(self.beam.npoints - 1)
             self.ui.sbx_rposft.setMaximum(self.beam.npoints - 1)
@@ -203,17 +479,11 @@ class MainWindow(QMainWindow):
             thickness = float(self.ui.dbx_thickn.value())
             length = float(self.ui.dbx_length.value())
             density = float(self.ui.dbx_density.value())
-            Tsampling = 0.004
-            nmodes = 5
-            damp = [0.002, 0.002, 0.001, 0.001, 0.001]
-            forcescaler = 1
-            noisestd = 0
 
             # Creates a new beam with the updated values
-            self.beam = CantileverBeam(npoints, width, thickness, length,
-                                       density, elasticmod, Tsampling,
-                                       nmodes, damp, forcescaler, noisestd)
-            self.beam.reset()
+            self.newBeam(npoints, width, thickness, length, density,
+                         elasticmod)
+            self.resetReal()
 
             self.ui.sbx_aposft.setMaximum(self.beam.npoints - 1)
             self.ui.sbx_rposft.setMaximum(self.beam.npoints - 1)
@@ -276,54 +546,202 @@ class MainWindow(QMainWindow):
         self.ui.lbl_rposft.setText(str(rpos_ft))
         self.ui.lbl_freqft.setText(str(freq_ft))
 
-        # Sets parameters
+        # Sets parameters: model of the run sampling period (the beam of
+        # the Real Time page is not changed)
+        Tsampling = self.dbx_tsft.value() / 1000
+        self.fixedbeam = self.fixedModel(Tsampling)
         seconds = QtCore.QTime(0, 0, 0).secsTo(time_ft)
-        periods = seconds / 0.004  # (Tsampling = 0.004)
-        acceleration = np.zeros(int(periods))
-        t = np.arange(0, seconds, 0.004)
-
-        # Different paths based on the selected type of disturbance
-        # Single Pulse
-        if self.ui.rbt_pulseft.isChecked():
-            self.beam.setforce(apos_ft, force_ft)
-            self.beam.update()
-            self.beam.setforce(apos_ft, 0)
-
-            for k in range(int(periods)):
-                acceleration[k] = self.beam.getaccelms2(rpos_ft)
-                self.beam.update()
+        self.fixedperiods = int(seconds / Tsampling)
+        # Disturbance (single pulse or harmonic force) and seed of the
+        # measurement noise: the inputs are generated block by block
+        self.fixedpulse = self.ui.rbt_pulseft.isChecked()
+        self.fixedamplitude = force_ft
+        self.fixedfreq = freq_ft
+        self.fixedseed = np.random.SeedSequence().entropy
+        if self.telemetry is not None:
+            self.telemetry.start()
+
+        # Batch simulation from rest. Only the modal accelerations are kept,
+        # so the reading position can change without a new simulation.
+        if self.telemetry is not None:
+            with self.telemetry.section("simulation"):
+                self.simulateFixed(apos_ft, rpos_ft, freq_ft)
+            self.telemetry.addsamples(self.fixedperiods)
+        else:
+            self.simulateFixed(apos_ft, rpos_ft, freq_ft)
+
+        # Ploting the charts
+        if self.telemetry is not None:
+            with self.telemetry.section("plotting"):
+                self.drawFixed(self.fixedforce, self.fixedacceleration)
+            self.telemetry.stop()
+            self.ui.statusbar.showMessage(self.telemetry.summary())
+            if self.metricsfile is not None:
+                self.telemetry.dump(self.metricsfile, page="fixed time",
+                                    npoints=self.fixedbeam.npoints,
+                                    nmodes=self.fixedbeam.nmodes)
+        else:
+            self.drawFixed(self.fixedforce, self.fixedacceleration)
+
+    def fixedModel(self, Tsampling):
+        """
+        This function returns the model of the Fixed Time runs with the
+        sampling period 'Tsampling' (built once for each period): the
+        modes below its Nyquist frequency, reusing the modal analysis of
+        the beam when it already has them.
+        """
+
+        if Tsampling == self.beam.Ts:
+            return self.beam
+        if Tsampling not in self.fixedbeams:
+            self.fixedbeams[Tsampling] = self.beam.withsampling(
+                Tsampling, self.telemetry)
+        return self.fixedbeams[Tsampling]
 
-        # Harmonic Force
+    def fixedInputs(self, size):
+        """
+        This function generates the disturbance force and the measurement
+        noise of the last Fixed Time run in blocks of 'size' samples. The
+        noise is drawn from the seed of the run, so the same blocks are
+        generated every time (e.g. for a new reading position).
+        """
+
+        Ts = self.fixedbeam.Ts
+        noisestd = self.fixedbeam.noisestd
+        generator = np.random.default_rng(self.fixedseed)
+        size = max(size, 1)
+        for start in range(0, self.fixedperiods, size):
+            n = min(size, self.fixedperiods - start)
+            if self.fixedpulse:
+                # Single Pulse
+                force = np.zeros(n)
+                if start == 0:
+                    force[0] = self.fixedamplitude
+            else:
+                # Harmonic Force
+                force = np.sin(2 * np.pi * self.fixedfreq
+                               * (start + np.arange(n)) * Ts)
+            yield force, generator.standard_normal(n) * noisestd
+
+    def simulateFixed(self, apos, rpos, freq):
+        """
+        This function simulates the Fixed Time run from rest. When a
+        results directory is set, the run is simulated chunk by chunk and
+        each chunk is written to disk as soon as it is computed: the
+        traces and the modal coordinates are then read back as memory
+        maps, so no full-length array of the run is held in memory.
+        """
+
+        if self.exportdir is None:
+            blocks = list(self.fixedInputs(self.fixedperiods))
+            self.fixedforce = np.concatenate([np.zeros(0)] + [force for
+                                              force, _ in blocks])
+            self.fixednoise = np.concatenate([np.zeros(0)] + [noise for
+                                              _, noise in blocks])
+            self.fixedmodal = self.fixedbeam.simulatemodal(self.fixedforce,
+                                                           apos)
+            self.fixedacceleration = self.fixedAcceleration(rpos)
         else:
-            F_disturb = np.sin(2 * np.pi * freq_ft * t)
-            self.beam.reset()
+            path = self.exportFixed(apos, rpos, freq)
+            _, arrays = loadresult(path)
+            self.fixedforce = arrays["force"]
+            self.fixednoise = None
+            self.fixedmodal = arrays["modal"].T
+            self.fixedacceleration = arrays["acceleration"]
+
+    def fixedAcceleration(self, rpos):
+        """
+        This function rebuilds the acceleration of the last Fixed Time
+        run at the reading position, from the stored modal coordinates.
+        The modal coordinates of an exported run are read from disk
+        block by block, with the noise blocks drawn again from its seed.
+        """
 
-            for j in range(int(periods)):
-                self.beam.setforce(apos_ft, F_disturb[j])
-                acceleration[j] = self.beam.getaccelms2(rpos_ft)
-                self.beam.update()
+        if self.fixednoise is not None:
+            return (self.fixedbeam.project(self.fixedmodal, rpos)
+                    + self.fixednoise)
+        acceleration = np.empty(self.fixedperiods)
+        start = 0
+        for _, noise in self.fixedInputs(FIXEDBLOCK):
+            chunk = slice(start, start + len(noise))
+            acceleration[chunk] = (self.fixedbeam.project(
+                self.fixedmodal[:, chunk], rpos) + noise)
+            start = chunk.stop
+        return acceleration
+
+    def reprojectFixed(self):
+        """
+        This function redraws the Fixed Time charts for a new reading
+        position, without simulating again.
+        """
 
-        # Reseting Charts
-        self.static_ax1.clear()
-        self.static_ax1.set_title("Force", fontsize=16)
-        self.static_ax1.set_xlabel("Time (s)")
-        self.static_ax1.set_ylabel("Force (N)")
-        self.static_ax2.clear()
-        self.static_ax2.set_title("Acceleration", fontsize=16)
-        self.static_ax2.set_xlabel("Time (s)")
-        self.static_ax2.set_ylabel("Acceleration ($m/s^2$)")
+        if self.fixedmodal is None:
+            return
+        rpos_ft = self.ui.sbx_rposft.value()
+        self.ui.lbl_rposft.setText(str(rpos_ft))
+        self.fixedacceleration = self.fixedAcceleration(rpos_ft)
+        self.drawFixed(self.fixedforce, self.fixedacceleration)
+
+    def drawFixed(self, F_disturb, acceleration):
+        """
+        This function draws the 'Force x Time', 'Acceleration x Time'
+        and 'Acceleration Spectrum' charts (the same charts as the
+        offscreen reports of reportRender, with decimated traces; the
+        times of the drawn samples come from the sampling period).
+        """
 
-        # Ploting 'Force x Time' chart
-        if self.ui.rbt_pulseft.isChecked():
-            F_disturb = 0 * t
-            F_disturb[0] = force_ft
+        axes = (self.static_ax1, self.static_ax2, self.static_ax3)
+        drawcharts(axes, self.fixedbeam.Ts, F_disturb, acceleration,
+                   self.fixedbeam.Ts, self.fixedbeam.freqsHz)
+        for ax in axes:
+            ax.figure.canvas.draw()
 
-        self.static_ax1.plot(t, F_disturb)
-        self.static_ax1.figure.canvas.draw()
+    def exportFixed(self, apos, rpos, freq):
+        """
+        This function streams the Fixed Time run to a new folder inside
+        'exportdir' and returns its path: the inputs and the modal
+        coordinates are computed chunk by chunk (the IIR states are kept
+        between chunks) and each chunk of the traces, with the modal
+        coordinates for later reading positions, is written before the
+        next one is generated.
+        """
 
-        # Ploting 'Acceleration x Time' chart
-        self.static_ax2.plot(t, acceleration)
-        self.static_ax2.figure.canvas.draw()
+        channels = ["force", "acceleration", "modal"]
+        if self.exportdisplacement:
+            channels.append("displacement")
+        if self.fixedpulse:
+            disturbance = "pulse"
+        else:
+            disturbance = "harmonic"
+
+        beam = self.fixedbeam
+        path = newresultdir(self.exportdir)
+        with ResultWriter(path, beam, self.fixedperiods, channels,
+                          chunksize=FIXEDBLOCK,
+                          columns={"modal": beam.nmodes}, apos=apos,
+                          rpos=rpos, disturbance=disturbance,
+                          frequency=freq) as writer:
+            pending = deque()   # inputs of the chunks not written yet
+
+            def forces():
+                for force, noise in self.fixedInputs(FIXEDBLOCK):
+                    pending.append((force, noise))
+                    yield force
+
+            streams = [beam.streammodal(forces(), apos, FIXEDBLOCK)]
+            if self.exportdisplacement:
+                streams.append(beam.stream(
+                    (force for force, _ in self.fixedInputs(FIXEDBLOCK)),
+                    apos, rpos, FIXEDBLOCK, quantity="displacement"))
+            for q, *displacement in zip(*streams):
+                force, noise = pending.popleft()
+                blocks = {"force": force,
+                          "acceleration": beam.project(q, rpos) + noise,
+                          "modal": q.T}
+                if displacement:
+                    blocks["displacement"] = displacement[0]
+                writer.write(**blocks)
+        return path
 
     def updateBars(self):
         """
@@ -365,12 +783,201 @@ class MainWindow(QMainWindow):
             self.ui.lbl_11.setDisabled(True)
             self.ui.hsl_force.setDisabled(True)
             self.ui.lbl_forcert.setDisabled(True)
-            self.ui.lbl_12.setDisableded(False)
-            self.ui.hsl_freq.setDisabl(False)
+            self.ui.lbl_12.setDisabled(False)
+            self.ui.hsl_freq.setDisabled(False)
             self.ui.lbl_freqrt.setDisabled(False)
 
+    def realSpeed(self):
+        """
+        This function returns the selected slow motion speed.
+        """
+
+        if self.ui.rbt_01.isChecked():
+            return 0.01
+        if self.ui.rbt_001.isChecked():
+            return 0.001
+        if self.ui.rbt_0001.isChecked():
+            return 0.0001
+        return 0.1
+
+    def realForce(self):
+        """
+        This function returns the force of the Real Time page as a
+        function of the simulation time: a pulse with the force bar value
+        or a 1 N harmonic force with the frequency bar value.
+        """
+
+        Ts = self.beam.Ts
+        if self.ui.rbt_pulsert.isChecked():
+            force = float(self.ui.hsl_force.value())
+            return lambda t: np.where(np.asarray(t) < Ts / 2, force, 0.0)
+        freq = float(self.ui.hsl_freq.value())
+        return lambda t: np.sin(2 * np.pi * freq * np.asarray(t))
+
+    def startReal(self):
+        """
+        This function starts the Real Time simulation. In slow motion the
+        response is precomputed in one batch and played back, so the
+        simulator is not woken up for every frame.
+        """
+
+        if self.timer.isActive():
+            return
+
+        apos = self.ui.sbx_aposrt.value()
+        rpos = self.ui.sbx_rposrt.value()
+        slow = self.ui.rbt_smotionrt.isChecked()
+        step = None
+        if not slow and self.simprocess is not None:
+            step = self.simprocess.start(apos, rpos)
+        self.recordSampling()
+        self.recordEvent("apos", apos, step)
+        self.recordEvent("rpos", rpos, step)
+        self.recordEvent("start", SLOWMOTION if slow else NORMAL, step)
+        if slow:
+            self.playback = Playback(self.beam, apos, rpos, self.realForce(),
+                                     speed=self.realSpeed())
+        else:
+            self.playback = None
+            self.realpos = (apos, rpos)
+        if self.realtelemetry is not None:
+            self.realtelemetry.start()
+        self.lastframe = time.perf_counter()
+        self.timer.start(self.frameinterval)
+
+    def stopReal(self):
+        """
+        This function pauses the Real Time simulation.
+        """
+
+        step = None
+        if self.simprocess is not None:
+            step = self.simprocess.stop()
+        self.recordHead()
+        self.recordEvent("stop", step=step)
+        self.timer.stop()
+        self.reportReal()
+
+    def resetReal(self):
+        """
+        This function stops the simulation, returns the beam to rest
+        and clears the Real Time charts.
+        """
+
+        step = None
+        if self.simprocess is not None:
+            step = self.simprocess.reset()
+        if self.sessionlog is not None:
+            self.recordHead()
+            self.recordEvent("reset", step=step)
+        self.timer.stop()
+        self.reportReal()
+        self.beam.reset()
+        self.playback = None
+        self.realsteps = 0
+        self.recordSampling()
+        self.realremainder = 0.0
+        maxlen = int(self.realspan / self.beam.Ts)
+        self.realt = deque(maxlen=maxlen)
+        self.realf = deque(maxlen=maxlen)
+        self.reala = deque(maxlen=maxlen)
+        self.curve1.setData([], [])
+        self.curve2.setData([], [])
+
+        # Spectrogram and resonance marks of the current beam
+        self.stft = StreamingSTFT(self.beam.Ts)
+        self.stftindex = 0
+        self.spectrogram.clear()
+        for line in self.resonances:
+            self.dynamic_ax3.removeItem(line)
+        self.resonances = []
+        for freq in self.beam.freqsHz:
+            line = pg.InfiniteLine(pos=freq, angle=0,
+                                   pen=pg.mkPen('r', style=QtCore.Qt.DashLine))
+            self.dynamic_ax3.addItem(line)
+            self.resonances.append(line)
+        self.dynamic_ax3.setYRange(0, 0.5 / self.beam.Ts)
+
+    def changeSpeed(self):
+        """
+        This function changes the slow motion speed. The playback
+        continues from the same point, without a new simulation.
+        """
+
+        if self.playback is not None:
+            self.playback.speed = self.realSpeed()
+
     def updateReal(self):
         """
         This function recieves the new values for the Real Time
         simulation and plots the dynamic chart.
         """
+
+        now = time.perf_counter()
+        elapsed = now - self.lastframe
+        self.lastframe = now
+
+        if self.playback is not None:
+            # Slow motion: interpolated playback of the precomputed window
+            self.playback.advance(elapsed)
+            span = max(self.realspan * self.playback.speed,
+                       10 * self.beam.Ts)
+            t, force, acceleration = self.playback.frame(span)
+            index = int(self.playback.time / self.beam.Ts)
+            newsamples = self.playback.a[self.stftindex:index]
+            self.stftindex = max(index, self.stftindex)
+        elif self.simprocess is not None:
+            # Normal time in the child process: new samples of the ring
+            t, force, acceleration = self.simprocess.read()
+            self.realt.extend(t)
+            self.realf.extend(force)
+            self.reala.extend(acceleration)
+            self.realsteps += len(t)
+            if self.realtelemetry is not None:
+                self.realtelemetry.addsamples(len(t))
+            newsamples = acceleration
+            t = np.array(self.realt)
+            force = np.array(self.realf)
+            acceleration = np.array(self.reala)
+        else:
+            # Normal time: steps the beam for the elapsed time,
+            # with the current values of the bars
+            realforce = self.realForce()
+            self.realremainder += elapsed / self.beam.Ts
+            nsteps = int(self.realremainder)
+            self.realremainder -= nsteps
+            apos, rpos = self.realpos
+            for _ in range(nsteps):
+                t = self.realsteps * self.beam.Ts
+                force = float(realforce(t))
+                self.beam.setforce(apos, force)
+                self.realt.append(t)
+                self.realf.append(force)
+                self.reala.append(self.beam.getaccelms2(rpos))
+                self.beam.update()
+                self.realsteps += 1
+            t = np.array(self.realt)
+            force = np.array(self.realf)
+            acceleration = np.array(self.reala)
+            newsamples = acceleration[len(acceleration) - nsteps:]
+
+        self.curve1.setData(t, force)
+        self.curve2.setData(t, acceleration)
+        self.updateSpectrogram(newsamples, t[-1] if len(t) else 0.0)
+        if self.realtelemetry is not None:
+            self.realtelemetry.record("frame", time.perf_counter() - now)
+
+    def updateSpectrogram(self, newsamples, tend):
+        """
+        This function adds the new samples to the streaming spectrogram
+        and redraws it only when new columns were computed.
+        """
+
+        if not self.stft.push(newsamples):
+            return
+        image = self.stft.image()
+        span = self.stft.nframes * self.stft.hop * self.beam.Ts
+        self.spectrogram.setImage(image, autoLevels=False,
+                                  levels=(image.max() - 80, image.max()))
+        self.spectrogram.setRect(QtCore.QRectF(tend - span, 0, span,
+                                               0.5 / self.beam.Ts))
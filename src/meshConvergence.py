@@ -0,0 +1,169 @@
+import sys
+import time
+import argparse
+import numpy as np
+from scipy import optimize
+
+
+"""
+Mesh convergence study of the CantileverBeam.
+Computes freqsHz and the mode shapes for an increasing number of points
+(npoints) and compares them with the analytic Euler-Bernoulli cantilever:
+    f_k = (beta_k L)^2 / (2 pi L^2) * sqrt(E I / (rho A)),
+    1 + cos(beta L) cosh(beta L) = 0,
+    phi_k(x) = cosh(beta x) - cos(beta x)
+               - s_k (sinh(beta x) - sin(beta x)),
+    s_k = (cosh(beta L) + cos(beta L)) / (sinh(beta L) + sin(beta L)).
+The error of each mode is the relative frequency error and the shape
+agreement is the MAC with the analytic shape at the nodes (node i is at
+x = (i + 1) * length / npoints). The smallest mesh that meets a frequency
+tolerance on the selected modes is found by doubling npoints and then
+bisecting (the frequency error of the lumped model decreases
+monotonically, about 1/npoints^2).
+How to use (inside the src folder):
+    python meshConvergence.py [--modes n] [--tolerance t] [--max n]
+"""
+
+DEFAULT_BEAM = {"width": 0.05, "thickness": 0.00575, "length": 0.58,
+                "density": 7900, "elasticmod": 2e11}
+
+
+def betaL(nmodes):
+    """
+    First nmodes roots of 1 + cos(x) cosh(x) = 0.
+    """
+    def characteristic(x):
+        # 1 + cos(x) cosh(x), divided by cosh(x) to avoid the overflow
+        return 1 / np.cosh(x) + np.cos(x)
+
+    roots = []
+    for k in range(1, nmodes + 1):
+        guess = (2 * k - 1) * np.pi / 2
+        roots.append(optimize.brentq(characteristic, guess - 1, guess + 1))
+    return np.array(roots)
+
+
+def analyticfreqs(nmodes, width, thickness, length, density, elasticmod):
+    """
+    Natural frequencies (Hz) of the Euler-Bernoulli cantilever.
+    """
+    I = width * thickness**3 / 12
+    area = width * thickness
+    return betaL(nmodes)**2 / (2 * np.pi * length**2) * \
+        np.sqrt(elasticmod * I / (density * area))
+
+
+def analyticshapes(nmodes, x, length):
+    """
+    Mode shapes (len(x) x nmodes) of the cantilever at the positions x.
+    """
+    beta = betaL(nmodes) / length
+    bx = np.outer(x, beta)
+    bl = beta * length
+    s = (np.cosh(bl) + np.cos(bl)) / (np.sinh(bl) + np.sin(bl))
+    return np.cosh(bx) - np.cos(bx) - s * (np.sinh(bx) - np.sin(bx))
+
+
+def mac(a, b):
+    """
+    Modal assurance criterion of each pair of columns.
+    """
+    return (np.sum(a * b, axis=0)**2 /
+            (np.sum(a * a, axis=0) * np.sum(b * b, axis=0)))
+
+
+def compare(npoints, nmodes, beam=None, Tsampling=None):
+    """
+    Modal analysis with npoints and comparison with the analytic beam.
+    Returns a dictionary with the frequencies, the relative frequency
+    errors, the MAC of each mode and the time of the modal analysis.
+    - Tsampling: sampling period of the model. The modal analysis does
+    not depend on it, but the model also designs the IIRs of the nmodes
+    modes, which must be below Nyquist; by default the period puts the
+    highest analytic frequency at a quarter of the sampling rate (margin
+    for the error of coarse meshes).
+    """
+    from CantileverBeam import CantileverBeam
+
+    beam = {**DEFAULT_BEAM, **(beam or {})}
+    reference = analyticfreqs(nmodes, **beam)
+    if Tsampling is None:
+        Tsampling = 1 / (4 * reference[-1])
+    start = time.perf_counter()
+    model = CantileverBeam(npoints, beam["width"], beam["thickness"],
+                           beam["length"], beam["density"],
+                           beam["elasticmod"], Tsampling, nmodes, [0.001],
+                           1, 0)
+    seconds = time.perf_counter() - start
+    x = (np.arange(npoints) + 1) * beam["length"] / npoints
+    return {
+        "npoints": npoints,
+        "freqsHz": model.freqsHz,
+        "error": model.freqsHz / reference - 1,
+        "mac": mac(model.vmod64, analyticshapes(nmodes, x, beam["length"])),
+        "seconds": seconds,
+    }
+
+
+def study(meshes, nmodes, beam=None, Tsampling=None):
+    """
+    Comparison (see compare) for each number of points in meshes.
+    """
+    return [compare(npoints, nmodes, beam, Tsampling) for npoints in meshes]
+
+
+def smallestmesh(tolerance, nmodes, beam=None, nmax=1000, Tsampling=None):
+    """
+    Smallest npoints whose frequency error is below 'tolerance' for each
+    of the first nmodes modes. 'tolerance' may be a scalar or one value
+    per mode. Returns the npoints (None if nmax is not enough) and the
+    comparison of that mesh.
+    """
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=float), (nmodes,))
+
+    def accurate(npoints):
+        result = compare(npoints, nmodes, beam, Tsampling)
+        return np.all(np.abs(result["error"]) <= tolerance), result
+
+    # Doubling up to the first accurate mesh, then bisection
+    low, high = nmodes - 1, nmodes
+    ok, result = accurate(high)
+    while not ok:
+        if high == nmax:
+            return None, result
+        low, high = high, min(2 * high, nmax)
+        ok, result = accurate(high)
+    best = result
+    while high - low > 1:
+        middle = (low + high) // 2
+        ok, result = accurate(middle)
+        if ok:
+            high, best = middle, result
+        else:
+            low = middle
+    return high, best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesh convergence study")
+    parser.add_argument("--modes", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, nargs="+", default=[0.01])
+    parser.add_argument("--max", type=int, default=1000)
+    parser.add_argument("--meshes", type=int, nargs="+",
+                        default=[10, 20, 40, 60, 100, 200, 500, 1000])
+    args = parser.parse_args(sys.argv[1:])
+
+    print(f"{'npoints':>8s} {'time (s)':>9s}  frequency error (%) / MAC "
+          f"of modes 1..{args.modes}")
+    for result in study([n for n in args.meshes if n >= args.modes],
+                        args.modes):
+        errors = " ".join(f"{100 * e:8.4f}" for e in result["error"])
+        macs = " ".join(f"{m:6.4f}" for m in result["mac"])
+        print(f"{result['npoints']:8d} {result['seconds']:9.4f}  {errors}  "
+              f"/ {macs}")
+    npoints, result = smallestmesh(args.tolerance, args.modes, nmax=args.max)
+    if npoints is None:
+        print(f"no mesh up to {args.max} points meets the tolerance")
+    else:
+        print(f"smallest mesh: npoints = {npoints} (errors "
+              + ", ".join(f"{100 * e:.3f}%" for e in result["error"]) + ")")
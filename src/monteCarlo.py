@@ -0,0 +1,237 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from CantileverBeam import CantileverBeam
+
+
+"""
+Shared-memory Monte Carlo runner.
+The modal model (vmod, freqsHz, zeta), the force, the parameters of every
+run and the result buffers are placed in multiprocessing.shared_memory.
+The workers attach to these blocks by name, simulate disjoint ranges of
+runs and write the accelerations in place, so no large array is pickled
+between the processes and the modal analysis is done only once.
+Parameters that can vary between runs (arrays with one value per run):
+    - "damping": scale factor of the damping factors of every mode;
+    - "forcescaler": force scaler (see CantileverBeam.configforcescaler);
+    - "magnetdist": distance of the magnetic actuator (m);
+    - "seed": seed of the measurement noise.
+How to use (inside the src folder):
+    python monteCarlo.py [--runs n] [--workers n] [--duration s]
+"""
+
+PARAMETERS = ("damping", "forcescaler", "magnetdist", "seed")
+METRICS = ("rms", "peak", "crest")
+
+
+def sharedarray(array, blocks):
+    """
+    Copies the array to a new shared memory block (appended to 'blocks').
+    Returns the description used by the workers to attach to it.
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True,
+                                       size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    blocks.append(block)
+    return block.name, array.shape, array.dtype.str
+
+
+def attach(description, blocks):
+    """
+    Attaches to a shared block created by the parent process (the workers
+    share the resource tracker of the parent, which unlinks the blocks).
+    """
+    name, shape, dtype = description
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def modalbeam(shared, spec):
+    """
+    CantileverBeam built over the shared modal model (CantileverBeam.
+    frommodal), without redoing the modal analysis.
+    """
+    return CantileverBeam.frommodal(shared["vmod"], shared["freqsHz"],
+                                    shared["zeta"], spec["Ts"],
+                                    noisestd=spec["noisestd"],
+                                    **spec["geometry"])
+
+
+def worker(spec, start, stop):
+    """
+    Simulates the runs [start, stop) and writes the accelerations and the
+    metrics of each run in the shared result buffers.
+    """
+    blocks = []
+    try:
+        shared = {key: attach(description, blocks)
+                  for key, description in spec["arrays"].items()}
+        beam = modalbeam(shared, spec)
+        force = shared["force"]
+        params = shared["params"]
+        results = shared["results"]
+        metrics = shared["metrics"]
+        for run in range(start, stop):
+            damping, forcescaler, magnetdist, seed = params[run]
+            beam.setdamping(damping * shared["zeta"])
+            beam.configforcescaler(forcescaler, magnetdist)
+            if spec["nonlinear"]:
+                accel, _ = beam.simulatenl(force, spec["apos"], spec["rpos"])
+            else:
+                accel = beam.simulate(force, spec["apos"], spec["rpos"])
+            if beam.noisestd:
+                rng = np.random.default_rng(int(seed))
+                accel = accel + rng.standard_normal(len(accel)) * beam.noisestd
+            results[run] = accel
+            rms = np.sqrt(np.mean(accel**2))
+            peak = np.max(np.abs(accel))
+            metrics[run] = rms, peak, peak / rms if rms else 0.0
+    finally:
+        for block in blocks:
+            block.close()
+
+
+class MonteCarlo:
+    """
+    Runs the same excitation over many parameter sets of one beam, using
+    every core. Each worker receives a contiguous range of runs and only
+    the names of the shared blocks.
+    """
+
+    def __init__(self, beam, apos, rpos, force, nonlinear=False,
+                 dtype=np.float32):
+        """
+        - force: force (or command, if nonlinear) array applied at apos;
+        - nonlinear: uses simulatenl (magnetic actuator) instead of simulate;
+        - dtype: type of the acceleration buffer (nruns x nsamples).
+        """
+        self.beam = beam
+        self.apos = apos
+        self.rpos = rpos
+        self.force = np.asarray(force, dtype=float)
+        self.nonlinear = nonlinear
+        self.dtype = np.dtype(dtype)
+
+    def parameters(self, nruns, **params):
+        """
+        Parameter table (nruns x 4, columns as in PARAMETERS). Missing
+        parameters use the values of the beam; seeds default to the run
+        index.
+        """
+        table = np.empty((nruns, len(PARAMETERS)))
+        table[:, 0] = params.get("damping", 1.0)
+        table[:, 1] = params.get("forcescaler", self.beam.forcescaler1)
+        table[:, 2] = params.get("magnetdist", self.beam.magnetdist)
+        table[:, 3] = params.get("seed", np.arange(nruns))
+        return table
+
+    def run(self, nruns=None, workers=None, **params):
+        """
+        Simulates the runs and returns a dictionary with the parameter
+        table, the accelerations (nruns x nsamples), the metrics of each
+        run (columns as in METRICS), their aggregate statistics and the
+        wall time.
+        """
+        if nruns is None:
+            nruns = max(len(np.atleast_1d(value)) for value in params.values())
+        workers = multiprocessing.cpu_count() if workers is None else workers
+        workers = max(1, min(workers, nruns))
+        table = self.parameters(nruns, **params)
+
+        blocks = []
+        try:
+            arrays = {
+                "vmod": sharedarray(self.beam.vmod64, blocks),
+                "freqsHz": sharedarray(self.beam.freqsHz, blocks),
+                "zeta": sharedarray(self.beam.zeta, blocks),
+                "force": sharedarray(self.force, blocks),
+                "params": sharedarray(table, blocks),
+                "results": sharedarray(
+                    np.zeros((nruns, len(self.force)), self.dtype), blocks),
+                "metrics": sharedarray(np.zeros((nruns, len(METRICS))),
+                                       blocks),
+            }
+            geometry = {name: getattr(self.beam, name)
+                        for name in ("width", "thickness", "length",
+                                     "density", "elasticmod")}
+            spec = {"arrays": arrays, "Ts": self.beam.Ts,
+                    "geometry": geometry,
+                    "noisestd": self.beam.noisestd, "apos": self.apos,
+                    "rpos": self.rpos, "nonlinear": self.nonlinear}
+            bounds = np.linspace(0, nruns, workers + 1).astype(int)
+            ranges = [(spec, int(start), int(stop))
+                      for start, stop in zip(bounds[:-1], bounds[1:])]
+
+            start = time.perf_counter()
+            if workers == 1:
+                worker(*ranges[0])
+            else:
+                with multiprocessing.Pool(workers) as pool:
+                    pool.starmap(worker, ranges)
+            wall = time.perf_counter() - start
+
+            views = {}
+            for key in ("results", "metrics"):
+                name, shape, dtype = arrays[key]
+                block = next(b for b in blocks if b.name == name)
+                views[key] = np.ndarray(shape, dtype, buffer=block.buf).copy()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        return {
+            "parameters": table,
+            "acceleration": views["results"],
+            "metrics": views["metrics"],
+            "stats": aggregate(views["metrics"]),
+            "workers": workers,
+            "wall": wall,
+            "runs_per_second": nruns / wall if wall else np.inf,
+        }
+
+
+def aggregate(metrics):
+    """
+    Mean, standard deviation and percentiles of each metric over the runs.
+    """
+    stats = {}
+    for i, name in enumerate(METRICS):
+        values = metrics[:, i]
+        stats[name] = {"mean": float(np.mean(values)),
+                       "std": float(np.std(values)),
+                       "p5": float(np.percentile(values, 5)),
+                       "p50": float(np.percentile(values, 50)),
+                       "p95": float(np.percentile(values, 95))}
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo runner")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--nonlinear", action="store_true")
+    args = parser.parse_args(sys.argv[1:])
+
+    beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002, 0.002, 0.001, 0.001, 0.001], 1, 0.01)
+    t = np.arange(int(args.duration / beam.Ts)) * beam.Ts
+    force = np.sin(2 * np.pi * 5 * t)
+    rng = np.random.default_rng(0)
+    montecarlo = MonteCarlo(beam, 30, 59, force, nonlinear=args.nonlinear)
+    result = montecarlo.run(
+        args.runs, args.workers,
+        damping=rng.uniform(0.8, 1.2, args.runs),
+        forcescaler=rng.normal(1.0, 0.05, args.runs),
+        magnetdist=rng.uniform(0.9e-3, 1.1e-3, args.runs))
+    print(f"{args.runs} runs on {result['workers']} workers in "
+          f"{result['wall']:.2f} s ({result['runs_per_second']:.1f} runs/s)")
+    for name, stats in result["stats"].items():
+        print(f"{name:6s} " + "  ".join(f"{key} {value:.4g}"
+                                       for key, value in stats.items()))
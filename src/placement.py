@@ -0,0 +1,118 @@
+import sys
+import argparse
+import numpy as np
+
+
+"""
+Actuator/sensor placement search.
+Scores every (apply node, read node) pair of a CantileverBeam at once from
+the mode shapes (vmod) and the modal FRF of the simulated system:
+    - "h2": H2 norm of the acceleration FRF over a frequency band;
+    - "peak": sum of the resonance peaks of the selected modes;
+    - "minpeak": smallest resonance peak of the selected modes (the pair
+    must control and observe all of them).
+The FRF between apos and rpos is sum_k vmod[apos,k]*vmod[rpos,k]*G_k(f),
+so the H2 norm of all npoints^2 pairs comes from the nmodes x nmodes
+matrix M_kl = sum_f G_k(f) conj(G_l(f)) df and the peaks from G_k at the
+resonances, without simulating any pair.
+How to use (inside the src folder):
+    python placement.py [--metric h2|peak|minpeak] [--top n] [--heatmap file]
+"""
+
+METRICS = ("h2", "peak", "minpeak")
+
+
+def modalpeaks(beam, modes=None):
+    """
+    Peak gain |G_k| of each selected mode at its damped frequency.
+    """
+    modes = np.arange(beam.nmodes) if modes is None else np.asarray(modes)
+    if np.any((modes < 0) | (modes >= beam.nmodes)):
+        raise ValueError(f"the beam simulates {beam.nmodes} modes")
+    G = beam.modalfrf(beam.wd / (2 * np.pi))
+    return np.abs(np.diag(G))[modes], modes
+
+
+def scores(beam, metric="h2", band=None, modes=None, nfreqs=4000):
+    """
+    Score matrix (npoints x npoints, [apos, rpos]) of the metric:
+        - band: (fmin, fmax) in Hz of the H2 norm (default: 0 to Nyquist);
+        - modes: modes of the peak metrics (default: all simulated modes).
+    Returns the scores and, for the peak metrics, the gain of each pair
+    and mode (npoints x npoints x nmodes).
+    """
+    vmod = beam.vmod64
+    scaler = abs(beam.forcescaler)
+    if metric == "h2":
+        fmin, fmax = (0, beam.Fs / 2) if band is None else band
+        freqs = np.linspace(fmin, fmax, nfreqs)
+        G = beam.modalfrf(freqs)
+        M = np.real(G @ G.conj().T) * (freqs[1] - freqs[0])
+        P = vmod[:, :, None] * vmod[:, None, :]   # npoints x nmodes x nmodes
+        h2 = np.einsum("akl,kl,rkl->ar", P, M, P, optimize=True)
+        return scaler * np.sqrt(np.maximum(h2, 0)), None
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+    peaks, modes = modalpeaks(beam, modes)
+    gains = scaler * np.abs(vmod[:, None, modes] * vmod[None, :, modes]) \
+        * peaks
+    if metric == "peak":
+        return gains.sum(axis=-1), gains
+    return gains.min(axis=-1), gains
+
+
+def ranking(score, top=10, exclude=None):
+    """
+    Best pairs as a list of (apos, rpos, score), sorted by decreasing
+    score. 'exclude' is a boolean matrix of pairs left out (e.g. the
+    collocated pairs, np.eye(npoints, dtype=bool)).
+    """
+    score = np.array(score, dtype=float)
+    if exclude is not None:
+        score[exclude] = -np.inf
+    order = np.argsort(score, axis=None)[::-1][:top]
+    apos, rpos = np.unravel_index(order, score.shape)
+    return [(int(a), int(r), float(score[a, r])) for a, r in zip(apos, rpos)]
+
+
+def heatmap(score, ax, title="", db=True):
+    """
+    Draws the score matrix (apply node x read node) on a matplotlib axis.
+    """
+    values = 20 * np.log10(np.maximum(score, 1e-300)) if db else score
+    top = np.max(values)
+    image = ax.imshow(values.T, origin="lower", aspect="auto", cmap="viridis",
+                      vmin=top - 80 if db else None, vmax=top)
+    ax.set_xlabel("Apply node (apos)")
+    ax.set_ylabel("Read node (rpos)")
+    ax.set_title(title)
+    ax.figure.colorbar(image, ax=ax, label="dB" if db else "")
+    return image
+
+
+if __name__ == '__main__':
+    from CantileverBeam import CantileverBeam
+
+    parser = argparse.ArgumentParser(description="Placement search")
+    parser.add_argument("--npoints", type=int, default=60)
+    parser.add_argument("--metric", choices=METRICS, default="h2")
+    parser.add_argument("--band", type=float, nargs=2, default=None)
+    parser.add_argument("--modes", type=int, nargs="+", default=None)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--heatmap", default=None)
+    args = parser.parse_args(sys.argv[1:])
+
+    beam = CantileverBeam(args.npoints, 0.05, 0.00575, 0.58, 7900, 2e11,
+                          0.004, None, [0.002, 0.002, 0.001, 0.001, 0.001],
+                          1, 0)
+    score, _ = scores(beam, args.metric, args.band, args.modes)
+    print(f"{'apos':>6s} {'rpos':>6s} {args.metric:>12s}")
+    for apos, rpos, value in ranking(score, args.top):
+        print(f"{apos:6d} {rpos:6d} {value:12.4g}")
+    if args.heatmap:
+        import matplotlib
+        matplotlib.use("Agg")
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=(6, 5))
+        heatmap(score, figure.subplots(), f"{args.metric} score")
+        figure.savefig(args.heatmap)
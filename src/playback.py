@@ -0,0 +1,57 @@
+import numpy as np
+from scipy import interpolate
+
+
+class Playback:
+    """
+    Slow-motion playback of a precomputed response.
+    The response is simulated in one batch (CantileverBeam.simulate) and
+    then played back at the selected speed, interpolating in time between
+    the samples. Changing the speed only changes how fast the playback
+    head moves, so it never requires a new simulation.
+    """
+
+    def __init__(self, beam, apos, rpos, force, window=10.0, speed=0.1):
+        """
+        - force: function that returns the force (N) for an array of
+        simulation times (s), e.g. lambda t: np.sin(2*np.pi*f*t);
+        - window: simulation time precomputed in the first batch (s).
+        When the playback reaches the end, the window is doubled;
+        - speed: playback speed relative to real time.
+        """
+        self.beam = beam
+        self.apos = apos
+        self.rpos = rpos
+        self.force = force
+        self.speed = speed
+        self.time = 0.0  # simulation time of the playback head
+        self.precompute(window)
+
+    def precompute(self, window):
+        """
+        Simulates the response from rest up to 'window' seconds.
+        """
+        Ts = self.beam.Ts
+        self.t = np.arange(int(np.ceil(window / Ts)) + 1) * Ts
+        self.f = np.asarray(self.force(self.t), dtype=float)
+        self.a = self.beam.simulate(self.f, self.apos, self.rpos)
+        self.spline = interpolate.CubicSpline(self.t, self.a)
+
+    def advance(self, realtime):
+        """
+        Moves the playback head by 'realtime' seconds of real time.
+        """
+        self.time += realtime * self.speed
+        if self.time > self.t[-1]:
+            self.precompute(max(2 * self.t[-1], self.time))
+
+    def frame(self, span, npoints=400):
+        """
+        Returns (t, force, acceleration) of the last 'span' seconds of
+        simulation time before the playback head, on a regular grid of
+        'npoints' (the force is held between samples).
+        """
+        start = max(self.time - span, 0.0)
+        t = np.linspace(start, self.time, npoints)
+        index = np.minimum((t / self.beam.Ts).astype(int), len(self.f) - 1)
+        return t, self.f[index], self.spline(t)
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from spectrum import spectrum
+
+
+"""
+Offscreen rendering of the Fixed Time charts (force, acceleration and
+acceleration spectrum with the resonances) for batches of scenarios.
+The figures are drawn with the non-interactive Agg canvas (no GUI, no
+pyplot state) in a pool of processes, one scenario per task, and saved as
+PNG and/or PDF. The traces are decimated to the minimum and maximum of
+each bucket before plotting, so every figure draws a bounded number of
+points whatever the duration of the run (the peaks are kept), and the
+spectrum averages a bounded number of segments of the full-rate trace
+(decimating before the PSD would fold the resonances). The
+scenarios are result folders written by resultExport.ResultWriter (read
+as memory maps in the workers) or dictionaries with the traces.
+How to use (inside the src folder):
+    python reportRender.py result_dir [result_dir ...] [--out dir]
+        [--format png pdf] [--workers n]
+    python reportRender.py --demo n     "renders n simulated scenarios"
+"""
+
+MAXPOINTS = 4000  # points of each decimated trace
+MAXSEGMENTS = 64  # Welch segments averaged in the spectrum
+
+
+def decimate(t, y, maxpoints=MAXPOINTS):
+    """
+    Min/max decimation: keeps the minimum and the maximum of each of
+    maxpoints/2 buckets, in time order. Returns (t, y) unchanged when
+    the trace is short enough. t is the array of times or, as a number,
+    the sampling period (the times of the kept samples are computed, so
+    no time array of the whole trace is needed).
+    """
+    def times(index):
+        return index * t if np.ndim(t) == 0 else np.asarray(t)[index]
+
+    n = len(y)
+    if n <= maxpoints:
+        return times(np.arange(n)), np.asarray(y)
+    size = -(-n // (maxpoints // 2))   # samples per bucket
+    full = n // size * size
+    buckets = np.asarray(y[:full]).reshape(-1, size)
+    offsets = np.arange(len(buckets)) * size
+    index = np.sort(np.stack([offsets + np.argmin(buckets, axis=1),
+                              offsets + np.argmax(buckets, axis=1)], axis=1),
+                    axis=1).ravel()
+    if full < n:
+        tail = np.asarray(y[full:])
+        index = np.r_[index, np.sort([full + np.argmin(tail),
+                                      full + np.argmax(tail)])]
+    return times(index), np.asarray(y)[index]
+
+
+def drawcharts(axes, t, force, acceleration, Ts, freqsHz,
+               maxpoints=MAXPOINTS):
+    """
+    Draws the Fixed Time charts on three matplotlib axes: force,
+    acceleration and acceleration spectrum (resonances in red).
+    t: times of the samples or the sampling period (see decimate).
+    """
+    ax1, ax2, ax3 = axes
+    for ax, title, ylabel in ((ax1, "Force", "Force (N)"),
+                              (ax2, "Acceleration", "Acceleration ($m/s^2$)")):
+        ax.clear()
+        ax.set_title(title, fontsize=16)
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel(ylabel)
+    ax1.plot(*decimate(t, force, maxpoints))
+    ax2.plot(*decimate(t, acceleration, maxpoints))
+
+    ax3.clear()
+    ax3.set_title("Acceleration Spectrum", fontsize=16)
+    ax3.set_xlabel("Frequency (Hz)")
+    ax3.set_ylabel("PSD ($(m/s^2)^2/Hz$)")
+    if len(acceleration) > 1:
+        freqs, psd = spectrum(acceleration, Ts, maxsegments=MAXSEGMENTS)
+        ax3.semilogy(freqs[1:], psd[1:])
+    for freq in freqsHz:
+        ax3.axvline(freq, color="r", linestyle="--", linewidth=0.8)
+
+
+def loadscenario(scenario):
+    """
+    Returns (name, t, force, acceleration, Ts, freqsHz) of a scenario:
+    a ResultWriter folder or a dictionary with "name", "force",
+    "acceleration", "Ts" and "freqsHz".
+    """
+    if isinstance(scenario, dict):
+        Ts = scenario["Ts"]
+        acceleration = np.asarray(scenario["acceleration"])
+        t = np.arange(len(acceleration)) * Ts
+        return (scenario["name"], t, np.asarray(scenario["force"]),
+                acceleration, Ts, scenario["freqsHz"])
+    from resultExport import loadresult
+
+    metadata, arrays = loadresult(scenario)
+    Ts = metadata["Tsampling"]
+    acceleration = arrays["acceleration"]
+    if acceleration.ndim > 1:
+        acceleration = acceleration[:, 0]   # first sensor
+    t = np.arange(len(acceleration)) * Ts
+    return (os.path.basename(os.path.normpath(scenario)), t,
+            arrays["force"], acceleration, Ts, metadata["freqsHz"])
+
+
+def render(scenario, outdir, formats=("png",), maxpoints=MAXPOINTS, dpi=100):
+    """
+    Renders one scenario (worker task). Returns the files written.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    name, t, force, acceleration, Ts, freqsHz = loadscenario(scenario)
+    figure = Figure(figsize=(8, 10))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(3, 1)
+    drawcharts(axes, t, force, acceleration, Ts, freqsHz, maxpoints)
+    figure.suptitle(name)
+    figure.tight_layout()
+    files = []
+    for extension in formats:
+        path = os.path.join(outdir, f"{name}.{extension}")
+        figure.savefig(path, dpi=dpi)
+        files.append(path)
+    return files
+
+
+def renderreport(scenarios, outdir, formats=("png",), workers=None,
+                 maxpoints=MAXPOINTS):
+    """
+    Renders every scenario in a pool of processes ('workers' processes,
+    all the cores by default; workers=1 renders in this process).
+    Returns the list of files written.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    args = (outdir, tuple(formats), maxpoints)
+    if workers == 1:
+        results = [render(scenario, *args) for scenario in scenarios]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(render, scenarios,
+                                    *[[arg] * len(scenarios) for arg in args]))
+    return [path for files in results for path in files]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fixed Time chart report")
+    parser.add_argument("results", nargs="*")
+    parser.add_argument("--out", default="report")
+    parser.add_argument("--format", nargs="+", default=["png"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--demo", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=600)
+    args = parser.parse_args(sys.argv[1:])
+
+    scenarios = list(args.results)
+    if args.demo:
+        from CantileverBeam import CantileverBeam
+
+        beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004,
+                              None, [0.002, 0.002, 0.001, 0.001, 0.001], 1, 0)
+        t = np.arange(int(args.seconds / beam.Ts)) * beam.Ts
+        for i in range(args.demo):
+            freq = 5 + 95 * i / max(args.demo - 1, 1)
+            force = np.sin(2 * np.pi * freq * t)
+            scenarios.append({"name": f"harmonic_{freq:.1f}Hz", "force": force,
+                              "acceleration": beam.simulate(force, 30, 59),
+                              "Ts": beam.Ts,
+                              "freqsHz": beam.freqsHz.tolist()})
+    start = time.perf_counter()
+    files = renderreport(scenarios, args.out, args.format, args.workers)
+    print(f"{len(files)} files in {time.perf_counter() - start:.1f} s "
+          f"({args.out})")
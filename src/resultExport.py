@@ -0,0 +1,159 @@
+import json
+import os
+import time
+import numpy as np
+
+
+class ResultWriter:
+    """
+    Streams simulation traces to disk while the simulation runs.
+    Each channel (force, acceleration, displacement...) is stored as a
+    separate .npy file opened as a memory map, so the traces never need
+    to fit in RAM. The beam parameters are saved in 'metadata.json'.
+    A folder that already holds a result is never overwritten.
+    """
+
+    def __init__(self, path, beam, nsamples,
+                 channels=("force", "acceleration"), nsensors=1,
+                 chunksize=4096, dtype=np.float64, columns=None, **info):
+        """
+        - path: directory where the result files are created;
+        - beam: CantileverBeam used in the simulation (for the header);
+        - nsamples: number of samples of each trace;
+        - channels: names of the stored traces;
+        - nsensors: number of columns of each trace (multi-sensor runs);
+        - chunksize: samples written between two flushes to disk;
+        - columns: number of columns of some channels, when different
+        from nsensors (e.g. {"modal": nmodes});
+        - info: extra run information saved in the header
+        (positions, force type, frequency...).
+        """
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "metadata.json")):
+            raise FileExistsError(f"{path} already holds a result")
+        self.path = path
+        self.nsamples = int(nsamples)
+        self.chunksize = chunksize
+        self.cursor = 0
+
+        columns = {} if columns is None else columns
+        self.arrays = {}
+        for name in channels:
+            width = columns.get(name, nsensors)
+            shape = (self.nsamples,) if width == 1 else (self.nsamples, width)
+            self.arrays[name] = np.lib.format.open_memmap(
+                os.path.join(path, name + ".npy"), mode="w+",
+                dtype=dtype, shape=shape)
+
+        metadata = beammetadata(beam)
+        metadata.update(info)
+        metadata["nsamples"] = self.nsamples
+        metadata["channels"] = list(channels)
+        metadata["nsensors"] = nsensors
+        metadata["columns"] = {name: columns.get(name, nsensors)
+                               for name in channels}
+        with open(os.path.join(path, "metadata.json"), "w") as file:
+            json.dump(metadata, file, indent=4)
+
+    def append(self, **samples):
+        """
+        Writes one sample of each channel at the current position,
+        e.g. writer.append(force=f, acceleration=a).
+        """
+        for name, value in samples.items():
+            self.arrays[name][self.cursor] = value
+        self.cursor += 1
+        if self.cursor % self.chunksize == 0:
+            self.flush()
+
+    def write(self, **blocks):
+        """
+        Writes a block of samples of each channel at the current position.
+        All the blocks must have the same length (ValueError otherwise,
+        before anything is written).
+        """
+        blocks = {name: np.asarray(block) for name, block in blocks.items()}
+        lengths = {name: len(block) for name, block in blocks.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"blocks of different lengths: {lengths}")
+        n = next(iter(lengths.values()), 0)
+        if self.cursor + n > self.nsamples:
+            raise ValueError(f"{self.cursor + n} samples written, the result "
+                             f"holds {self.nsamples}")
+        for name, block in blocks.items():
+            self.arrays[name][self.cursor:self.cursor + n] = block
+        self.cursor += n
+        self.flush()
+
+    def flush(self):
+        """
+        Forces the written chunks to disk.
+        """
+        for array in self.arrays.values():
+            array.flush()
+
+    def close(self):
+        """
+        Flushes the remaining samples and releases the memory maps.
+        """
+        self.flush()
+        self.arrays = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def newresultdir(directory):
+    """
+    Creates a new empty folder for a result inside 'directory', named
+    after the current time (a suffix _1, _2... is added when another
+    result was created in the same second). Returns its path.
+    """
+    base = os.path.join(directory, time.strftime("%Y%m%d_%H%M%S"))
+    path, suffix = base, 0
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            suffix += 1
+            path = f"{base}_{suffix}"
+
+
+def beammetadata(beam):
+    """
+    Returns a dictionary with the parameters that describe the beam.
+    """
+    return {
+        "npoints": beam.npoints,
+        "width": beam.width,
+        "thickness": beam.thickness,
+        "length": beam.length,
+        "density": beam.density,
+        "elasticmod": beam.elasticmod,
+        "Tsampling": beam.Ts,
+        "nmodes": beam.nmodes,
+        "damp": [float(z) for z in beam.zeta[:beam.nmodes]],
+        "freqsHz": [float(f) for f in beam.freqsHz],
+        "forcescaler": beam.forcescaler1,
+        "magnetdist": beam.magnetdist,
+        "noisestd": beam.noisestd,
+    }
+
+
+def loadresult(path):
+    """
+    Opens a result saved by ResultWriter. Returns the metadata dictionary
+    and a dictionary of read-only memory maps, so slicing a trace only
+    reads the requested samples from disk (zero-copy).
+    """
+    with open(os.path.join(path, "metadata.json")) as file:
+        metadata = json.load(file)
+    arrays = {}
+    for name in metadata["channels"]:
+        arrays[name] = np.load(os.path.join(path, name + ".npy"),
+                               mmap_mode="r")
+    return metadata, arrays
@@ -0,0 +1,256 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+
+"""
+Recording and headless replay of the Real Time sessions.
+Every input event of the Real Time page (force and frequency bars, pulse
+or harmonic mode, START/STOP/RESET, new beam) is stored with the sample
+of the simulation where it takes effect (the normal time step counter of
+the page), so the force applied to the beam at each step, and thus the
+response, can be rebuilt exactly. The log is a compressed .npz with one
+row per event (step, event code, value, wall clock time) and the beam
+configurations in a JSON header.
+The replay filters the rebuilt forces with the batch engine
+(CantileverBeam.modalcoords), far faster than real time:
+    - normal time runs: from each reset (or new beam) to the next one,
+    the force bar pulse (only on the first step) or the 1 N harmonic
+    force is applied at the actuator node of the last START. As in the
+    page, a node that was the actuator of a previous START keeps its last
+    force until the reset, and the acceleration shown for a step is the
+    one read before the beam is updated;
+    - slow motion runs: each START simulates from rest the force of the
+    bars at that moment, up to the playback head of the next stop;
+    - "sampling" events: the beam, at rest, changed its sampling period
+    (value, in seconds); the following runs use the new period.
+How to use (inside the src folder):
+    python sessionLog.py session.npz
+"""
+
+EVENTS = ("force", "freq", "mode", "apos", "rpos", "start", "stop", "reset",
+          "beam", "head", "end", "sampling")
+CODES = {name: code for code, name in enumerate(EVENTS)}
+PULSE, HARMONIC = 0, 1       # values of the "mode" event
+NORMAL, SLOWMOTION = 0, 1    # values of the "start" event
+
+
+class SessionLog:
+    """
+    Compact log of the input events of a Real Time session.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.codes = []
+        self.values = []
+        self.times = []
+        self.beams = []   # CantileverBeam arguments of each "beam" event
+        self.origin = time.perf_counter()
+
+    def __len__(self):
+        return len(self.steps)
+
+    def record(self, event, step, value=0.0):
+        """
+        Adds one event that takes effect on the simulation step 'step'.
+        """
+        self.steps.append(int(step))
+        self.codes.append(CODES[event])
+        self.values.append(float(value))
+        self.times.append(time.perf_counter() - self.origin)
+
+    def recordbeam(self, step, **config):
+        """
+        Adds a new beam, with the arguments of CantileverBeam (without
+        the telemetry).
+        """
+        self.beams.append(config)
+        self.record("beam", step, len(self.beams) - 1)
+
+    def events(self):
+        """
+        Iterates over the events as (step, name, value, time).
+        """
+        for step, code, value, t in zip(self.steps, self.codes, self.values,
+                                        self.times):
+            yield step, EVENTS[code], value, t
+
+    def save(self, path):
+        np.savez_compressed(path, step=np.array(self.steps, dtype=np.int64),
+                            code=np.array(self.codes, dtype=np.uint8),
+                            value=np.array(self.values, dtype=np.float64),
+                            time=np.array(self.times, dtype=np.float64),
+                            beams=json.dumps(self.beams))
+
+    @classmethod
+    def load(cls, path):
+        log = cls()
+        with np.load(path) as data:
+            log.steps = data["step"].tolist()
+            log.codes = data["code"].tolist()
+            log.values = data["value"].tolist()
+            log.times = data["time"].tolist()
+            log.beams = json.loads(str(data["beams"]))
+        return log
+
+
+def holdforces(intervals, nsteps, Ts):
+    """
+    Force of each actuator node (dict node -> array of nsteps) of a normal
+    time run. 'intervals' is a list of (first, last, apos, mode, force,
+    freq): in [first, last) the page applies the bars force at apos; out
+    of its intervals a node keeps the last force it received.
+    """
+    forces = {}
+    for first, last, apos, mode, force, freq in intervals:
+        if last <= first:
+            continue
+        values = forces.setdefault(apos, np.full(nsteps, np.nan))
+        steps = np.arange(first, last)
+        if mode == PULSE:
+            values[first:last] = np.where(steps == 0, force, 0.0)
+        else:
+            values[first:last] = np.sin(2 * np.pi * freq * (steps * Ts))
+    for apos, values in forces.items():
+        # Forward fill of the held forces (zero before the first interval)
+        valid = ~np.isnan(values)
+        index = np.maximum.accumulate(np.where(valid, np.arange(nsteps), -1))
+        forces[apos] = np.where(index >= 0, values[np.maximum(index, 0)], 0.0)
+    return forces
+
+
+def replay(log, beamfactory=None):
+    """
+    Rebuilds the runs of a session with the batch engine. Returns a list
+    of dictionaries with "kind" ("normal" or "slowmotion"), "beam" (index
+    in log.beams), "t", "force" (force at the actuator node of each step)
+    and "acceleration" (m/s^2 at the read node of each step).
+    - beamfactory: function that builds the beam from a configuration
+    (default: CantileverBeam(**config)).
+    """
+    if beamfactory is None:
+        from CantileverBeam import CantileverBeam
+
+        def beamfactory(config):
+            return CantileverBeam(**config)
+
+    runs = []
+    state = {"force": 0.0, "freq": 0.0, "mode": PULSE, "apos": 0, "rpos": 0}
+    beam = None
+    beamindex = -1
+    running = None       # NORMAL, SLOWMOTION or None
+    intervals = []       # (first, last, apos, mode, force, freq)
+    reads = []           # (first, rpos) of the normal time run
+    opened = 0           # first step of the current interval
+    slow = None          # (apos, rpos, mode, force, freq) of the slow run
+
+    def interval(step):
+        nonlocal opened
+        if running == NORMAL and step > opened:
+            intervals.append((opened, step, state["apos"], state["mode"],
+                              state["force"], state["freq"]))
+        opened = step
+
+    def closenormal(step):
+        # Simulates the normal time run from rest up to 'step'
+        nonlocal intervals, reads
+        interval(step)
+        if step > 0 and beam is not None and intervals:
+            runs.append(normalrun(beam, beamindex, intervals, reads, step))
+        intervals, reads = [], []
+
+    def closeslow(head):
+        nonlocal slow
+        if slow is not None and beam is not None:
+            runs.append(slowrun(beam, beamindex, slow, int(head)))
+        slow = None
+
+    for step, event, value, _ in log.events():
+        if event in ("force", "freq", "mode"):
+            interval(step)
+            state[event] = int(value) if event == "mode" else value
+        elif event in ("apos", "rpos"):
+            state[event] = int(value)
+        elif event == "start":
+            if value == SLOWMOTION:
+                running = SLOWMOTION
+                slow = (state["apos"], state["rpos"], state["mode"],
+                        state["force"], state["freq"])
+            else:
+                interval(step)
+                running = NORMAL
+                opened = step
+                reads.append((step, state["rpos"]))
+        elif event == "stop":
+            interval(step)
+            running = None
+        elif event == "head":
+            closeslow(value)
+        elif event in ("reset", "beam", "end", "sampling"):
+            closenormal(step)
+            running = None
+            opened = 0
+            if event == "sampling" and beam is not None:
+                beam.setsampling(value)
+            elif event == "beam":
+                beamindex = int(value)
+                beam = beamfactory(log.beams[beamindex])
+    return runs
+
+
+def normalrun(beam, beamindex, intervals, reads, nsteps):
+    """
+    Response of a normal time run, by superposition of the modal
+    responses to the force of each actuator node.
+    """
+    forces = holdforces(intervals, nsteps, beam.Ts)
+    q = sum(beam.modalcoords(beam.forcescaler * force, apos)
+            for apos, force in forces.items())
+    # The page reads the acceleration before updating the beam
+    q = np.concatenate([np.zeros((beam.nmodes, 1), dtype=q.dtype),
+                        q[:, :-1]], axis=1)
+    acceleration = np.zeros(nsteps)
+    bounds = [first for first, _ in reads[1:]] + [nsteps]
+    for (first, rpos), last in zip(reads, bounds):
+        acceleration[first:last] = beam.project(q[:, first:last], rpos)
+    applied = np.zeros(nsteps)
+    for first, last, apos, *_ in intervals:
+        applied[first:last] = forces[apos][first:last]
+    return {"kind": "normal", "beam": beamindex,
+            "t": np.arange(nsteps) * beam.Ts, "force": applied,
+            "acceleration": acceleration}
+
+
+def slowrun(beam, beamindex, slow, head):
+    """
+    Response of a slow motion run up to the playback head sample.
+    """
+    apos, rpos, mode, force, freq = slow
+    t = np.arange(head + 1) * beam.Ts
+    if mode == PULSE:
+        f = np.where(t < beam.Ts / 2, force, 0.0)
+    else:
+        f = np.sin(2 * np.pi * freq * t)
+    return {"kind": "slowmotion", "beam": beamindex, "t": t, "force": f,
+            "acceleration": beam.simulate(f, apos, rpos)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Real Time session replay")
+    parser.add_argument("log")
+    args = parser.parse_args(sys.argv[1:])
+
+    log = SessionLog.load(args.log)
+    start = time.perf_counter()
+    runs = replay(log)
+    wall = time.perf_counter() - start
+    simulated = sum(run["t"][-1] for run in runs if len(run["t"]))
+    print(f"{len(log)} events, {len(runs)} runs, {simulated:.1f} s of "
+          f"simulation replayed in {wall:.3f} s")
+    for i, run in enumerate(runs):
+        print(f"{i:4d} {run['kind']:10s} beam {run['beam']:2d} "
+              f"{len(run['t']):9d} samples, peak "
+              f"{np.max(np.abs(run['acceleration'])):.4g} m/s^2")
@@ -0,0 +1,297 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from sessionLog import PULSE, HARMONIC
+
+
+"""
+Real Time simulation in a child process.
+The child steps the beam in real time (like the normal time mode of the
+Real Time page) and writes the samples (t, force, acceleration) to a ring
+buffer in shared memory; the GUI sends the commands (bars, mode, START,
+STOP, RESET, new beam) through a pipe and reads the new samples on each
+frame. Stepping and drawing run on different cores, without sharing the
+GIL.
+The commands that change the input of the simulation are answered with
+the step of the child where they take effect, so the session log
+(sessionLog) is stamped with the steps of the child, not with the samples
+the GUI happened to have read.
+The ring buffer has a single writer and a single reader (a sequence
+lock): before storing a block the writer announces the number of samples
+there will be after it (begin counter), and after storing it publishes
+that number. The reader copies the samples up to the published number
+and then reads the begin counter: the samples before begin - capacity
+may have been overwritten during the copy and are discarded (the writer
+never waits for a slow reader, the oldest samples are lost). Neither
+NumPy nor the GIL orders the stores seen by another process, so every
+access to the counters is made holding a shared lock: acquiring and
+releasing it are full memory barriers (POSIX semaphores), which keep the
+samples between the two counters on every platform. The lock is held
+only for the counters, never during the copy of the samples.
+How to use (inside the src folder):
+    python simProcess.py [--seconds s]
+        "runs the child for a few seconds and reports the samples read"
+"""
+
+CHANNELS = ("t", "force", "acceleration")
+
+
+class RingBuffer:
+    """
+    Single writer/single reader ring buffer of the samples, over a
+    shared memory block (header: begin counter and number of samples
+    written), with the counters accessed under a lock (see the module
+    documentation).
+    """
+
+    def __init__(self, capacity, name=None, lock=None):
+        """
+        - capacity: number of samples kept;
+        - name: shared memory block of the writer (None creates it);
+        - lock: lock of the counters, shared by the writer and the reader
+        (None creates one: the reader must receive the lock of the writer,
+        created by the multiprocessing context of the other process).
+        """
+        size = 16 + 8 * len(CHANNELS) * capacity
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner,
+                                              size=size)
+        self.name = self.shm.name
+        self.lock = multiprocessing.Lock() if lock is None else lock
+        self.capacity = capacity
+        # header[0]: samples written when the current write ends (begin),
+        # header[1]: samples written (published)
+        self.header = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((len(CHANNELS), capacity), dtype=np.float64,
+                               buffer=self.shm.buf, offset=16)
+        if self.owner:
+            self.header[:] = 0
+        self.cursor = 0   # next sample of the reader
+
+    def written(self):
+        with self.lock:
+            return int(self.header[1])
+
+    def begun(self):
+        with self.lock:
+            return int(self.header[0])
+
+    def write(self, block):
+        """
+        Writer: appends a block of samples (channels x n).
+        """
+        n = block.shape[1]
+        if n == 0:
+            return
+        count = self.written()
+        if n > self.capacity:
+            block = block[:, -self.capacity:]
+            count += n - self.capacity
+            n = self.capacity
+        index = (count + np.arange(n)) % self.capacity
+        with self.lock:
+            self.header[0] = count + n   # announced before the samples
+        self.data[:, index] = block
+        with self.lock:
+            self.header[1] = count + n   # published after the samples
+
+    def read(self):
+        """
+        Reader: returns the samples written since the last read
+        (channels x n), without the samples that were overwritten.
+        """
+        count = self.written()
+        first = max(self.cursor, count - self.capacity)
+        index = np.arange(first, count) % self.capacity
+        block = self.data[:, index]
+        # Samples that a write begun meanwhile may have overwritten are
+        # discarded
+        lost = min(max(self.begun() - self.capacity - first, 0),
+                   count - first)
+        self.cursor = count
+        return block[:, lost:]
+
+    def skip(self, count):
+        """
+        Reader: moves the cursor to the sample 'count' (e.g. after a reset).
+        """
+        self.cursor = count
+
+    def close(self):
+        del self.header, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def simulator(config, name, capacity, connection, lock, maxsteps=10000):
+    """
+    Loop of the child process. The commands are tuples (name, *args):
+        - ("set", key, value): key is "force", "freq" or "mode";
+        - ("start", apos, rpos), ("stop",);
+        - ("step",): only answered;
+        - ("reset",) and ("beam", config): answered with the number of
+        samples written, where the new run starts, and the step where
+        the previous run ended;
+        - ("quit",).
+    The commands other than "reset", "beam" and "quit" are answered with
+    the step where they take effect (the next step of the run).
+    """
+    from CantileverBeam import CantileverBeam
+
+    ring = RingBuffer(capacity, name, lock)
+    beam = CantileverBeam(**config)
+    bars = {"force": 0.0, "freq": 0.0, "mode": PULSE}
+    apos = rpos = 0
+    running = False
+    steps = 0
+    remainder = 0.0
+    last = time.perf_counter()
+    try:
+        while True:
+            # Commands (waits for them while stopped)
+            while connection.poll(beam.Ts if running else None):
+                command, *args = connection.recv()
+                answer = steps
+                if command == "set":
+                    bars[args[0]] = args[1]
+                elif command == "start":
+                    apos, rpos = args
+                    running = True
+                    last = time.perf_counter()
+                elif command == "stop":
+                    running = False
+                elif command in ("reset", "beam"):
+                    if command == "beam":
+                        beam = CantileverBeam(**args[0])
+                    beam.reset()
+                    running = False
+                    answer = (ring.written(), steps)
+                    steps = 0
+                    remainder = 0.0
+                elif command == "quit":
+                    return
+                connection.send(answer)
+                if not connection.poll():
+                    break
+            if not running:
+                continue
+
+            now = time.perf_counter()
+            remainder += (now - last) / beam.Ts
+            last = now
+            nsteps = min(int(remainder), maxsteps)
+            remainder -= int(remainder)
+            block = np.empty((len(CHANNELS), nsteps))
+            for i in range(nsteps):
+                t = steps * beam.Ts
+                if bars["mode"] == PULSE:
+                    force = bars["force"] if t < beam.Ts / 2 else 0.0
+                else:
+                    force = np.sin(2 * np.pi * bars["freq"] * t)
+                beam.setforce(apos, force)
+                block[:, i] = t, force, beam.getaccelms2(rpos)
+                beam.update()
+                steps += 1
+            ring.write(block)
+    finally:
+        ring.close()
+
+
+class SimulatorProcess:
+    """
+    Parent side: starts the child process and owns the ring buffer.
+    """
+
+    def __init__(self, config, capacity=2**16):
+        """
+        - config: arguments of CantileverBeam (without the telemetry);
+        - capacity: samples kept in the ring buffer (the GUI must read
+        them before they are overwritten).
+        """
+        context = multiprocessing.get_context("spawn")
+        self.ring = RingBuffer(capacity, lock=context.Lock())
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=simulator, args=(config, self.ring.name, capacity, child,
+                                    self.ring.lock),
+            daemon=True)
+        self.process.start()
+
+    def send(self, command, *args):
+        """
+        Sends a command and returns the answer of the child.
+        """
+        self.connection.send((command, *args))
+        return self.connection.recv()
+
+    def set(self, key, value):
+        """
+        Returns the step of the child where the new value takes effect
+        (as start, stop and step).
+        """
+        return self.send("set", key, value)
+
+    def start(self, apos, rpos):
+        return self.send("start", apos, rpos)
+
+    def stop(self):
+        return self.send("stop")
+
+    def step(self):
+        return self.send("step")
+
+    def reset(self):
+        """
+        Returns the beam to rest; the samples of the previous run still
+        in the ring buffer are skipped. Returns the step where the
+        previous run ended.
+        """
+        written, steps = self.send("reset")
+        self.ring.skip(written)
+        return steps
+
+    def setbeam(self, config):
+        written, steps = self.send("beam", config)
+        self.ring.skip(written)
+        return steps
+
+    def read(self):
+        """
+        New samples as (t, force, acceleration).
+        """
+        return tuple(self.ring.read())
+
+    def close(self):
+        if self.process.is_alive():
+            self.connection.send(("quit",))
+            self.process.join(5)
+        self.ring.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulator process")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args(sys.argv[1:])
+
+    config = dict(npoints=60, width=0.05, thickness=0.00575, length=0.58,
+                  density=7900, elasticmod=2e11, Tsampling=0.004,
+                  nmodes=None, damp=[0.002, 0.002, 0.001, 0.001, 0.001],
+                  forcescaler=1, noisestd=0)
+    process = SimulatorProcess(config)
+    process.set("mode", HARMONIC)
+    process.set("freq", 15.0)
+    process.reset()
+    process.start(30, 59)
+    nsamples = 0
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        time.sleep(0.04)   # one GUI frame
+        t, force, acceleration = process.read()
+        nsamples += len(t)
+    process.close()
+    print(f"{nsamples} samples in {args.seconds:g} s "
+          f"({nsamples * config['Tsampling'] / args.seconds:.2f}x real time)")
@@ -0,0 +1,248 @@
+import sys
+import json
+import socket
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy import signal
+from CantileverBeam import CantileverBeam
+
+
+"""
+Local simulation service: answers beam response queries over a Unix
+socket (or TCP on localhost), one JSON object per line.
+    request: {"beam": {...}, "force": [...], "apos": n, "rpos": n or [n]}
+    response: {"acceleration": [...]} or {"error": "message"}
+The positions are nodes (JSON integers) or positions in meters along
+the beam (JSON numbers with a decimal point, e.g. 0.29 or 58.0), as in
+CantileverBeam.
+The "beam" object has the arguments of CantileverBeam (missing ones use
+DEFAULT_BEAM). The modal model of each configuration is built once and
+kept in a cache; the requests for the same beam that arrive within the
+coalescing window are filtered together, in one lfilter per mode over
+all the forces. The CPU work runs in an executor pool, so the event loop
+keeps accepting requests.
+How to use (inside the src folder):
+    python simulationService.py [--socket path | --port n]
+"""
+
+SOCKET_PATH = "/tmp/cantilever.sock"
+LINE_LIMIT = 2**26  # maximum size of one request (bytes)
+
+DEFAULT_BEAM = {
+    "npoints": 60, "width": 0.05, "thickness": 0.00575, "length": 0.58,
+    "density": 7900, "elasticmod": 2e11, "Tsampling": 0.004, "nmodes": None,
+    "damp": [0.002, 0.002, 0.001, 0.001, 0.001], "forcescaler": 1,
+}
+
+
+def beamkey(config):
+    """
+    Normalized beam configuration (the key of the model cache).
+    """
+    config = {**DEFAULT_BEAM, **config}
+    unknown = set(config) - set(DEFAULT_BEAM)
+    if unknown:
+        raise ValueError(f"unknown beam parameters: {sorted(unknown)}")
+    return json.dumps(config, sort_keys=True)
+
+
+def newbeam(key):
+    config = json.loads(key)
+    return CantileverBeam(config["npoints"], config["width"],
+                          config["thickness"], config["length"],
+                          config["density"], config["elasticmod"],
+                          config["Tsampling"], config["nmodes"],
+                          config["damp"], config["forcescaler"], 0)
+
+
+def validpositions(beam, pos):
+    """
+    True if pos (a position or a list) is on the beam: nodes (integers)
+    in [0, npoints) or positions in meters (floats) in [0, length].
+    """
+    pos = np.asarray(pos)
+    if pos.size == 0:
+        return False
+    if beam.inmeters(pos):
+        return bool(np.all((0 <= pos) & (pos <= beam.length)))
+    if pos.dtype.kind in "iu":
+        return bool(np.all((0 <= pos) & (pos < beam.npoints)))
+    return False
+
+
+def simulatebatch(beam, requests):
+    """
+    Acceleration of several requests (force, apos, rpos) on the same beam.
+    The forces are zero padded to the longest one and filtered together
+    (the filters are causal, so the padding does not change the samples
+    of the shorter forces). Equivalent to beam.simulate for each request.
+    """
+    _, Aiir = beam.iircoefficients(beam.Ts)
+    numerators = beam.outputcoefficients(beam.Ts)["acceleration"]
+    lengths = [len(force) for force, _, _ in requests]
+    forces = np.zeros((len(requests), max(lengths)))
+    for i, (force, _, _) in enumerate(requests):
+        forces[i, :len(force)] = force
+    forces *= beam.forcescaler
+    shapes = np.array([beam.modeshape(apos, exact=True)
+                       for _, apos, _ in requests])   # requests x nmodes
+    q = np.zeros((beam.nmodes, len(requests), forces.shape[1]))
+    for k in range(beam.nmodes):
+        q[k] = signal.lfilter(numerators[k], np.r_[1, Aiir[k, :]],
+                              shapes[:, k][:, None] * forces, axis=-1)
+    return [beam.project(q[:, i, :n], rpos)
+            for i, ((_, _, rpos), n) in enumerate(zip(requests, lengths))]
+
+
+class SimulationService:
+    """
+    Asyncio server with the model cache and the request coalescing.
+    """
+
+    def __init__(self, executor=None, window=0.002, cachesize=16):
+        """
+        - executor: pool where the modal analyses and the batches run
+        (default: ThreadPoolExecutor; numpy and scipy release the GIL in
+        the heavy loops);
+        - window: time (s) that the first request of a batch waits for
+        other requests of the same beam;
+        - cachesize: maximum number of modal models kept.
+        """
+        self.executor = ThreadPoolExecutor() if executor is None else executor
+        self.window = window
+        self.cachesize = cachesize
+        self.models = OrderedDict()  # key -> future of the CantileverBeam
+        self.pending = {}            # key -> [(request, future)]
+        self.stats = {"requests": 0, "batches": 0, "models": 0}
+
+    async def model(self, key):
+        """
+        Returns the beam of the configuration, building it in the executor
+        on the first use (concurrent requests wait for the same build).
+        """
+        loop = asyncio.get_running_loop()
+        if key not in self.models:
+            self.models[key] = loop.run_in_executor(self.executor,
+                                                    newbeam, key)
+            self.stats["models"] += 1
+            if len(self.models) > self.cachesize:
+                self.models.popitem(last=False)
+        self.models.move_to_end(key)
+        try:
+            return await self.models[key]
+        except Exception:
+            self.models.pop(key, None)  # invalid configuration: not cached
+            raise
+
+    async def simulate(self, config, force, apos, rpos):
+        """
+        Queues the request in the batch of its beam and waits the result.
+        """
+        key = beamkey(config)
+        beam = await self.model(key)
+        if np.ndim(apos) != 0 or not validpositions(beam, apos) or \
+                not validpositions(beam, rpos):
+            raise ValueError("apos and rpos must be nodes (integers) or "
+                             "positions in meters (floats) on the beam")
+        self.stats["requests"] += 1
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.setdefault(key, [])
+        batch.append(((np.asarray(force, dtype=float), apos, rpos), future))
+        if len(batch) == 1:
+            asyncio.get_running_loop().call_later(
+                self.window, lambda: asyncio.ensure_future(
+                    self.flush(key, beam)))
+        return await future
+
+    async def flush(self, key, beam):
+        """
+        Simulates every request queued for the beam in one batch. The
+        requests cancelled by their clients are skipped.
+        """
+        batch = [(request, future)
+                 for request, future in self.pending.pop(key, [])
+                 if not future.cancelled()]
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        requests = [request for request, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, simulatebatch,
+                                                 beam, requests)
+        except Exception as error:
+            for _, future in batch:
+                if not future.cancelled():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.cancelled():
+                future.set_result(result)
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection: one JSON request per line.
+        """
+        try:
+            while line := await reader.readline():
+                try:
+                    query = json.loads(line)
+                    acceleration = await self.simulate(
+                        query.get("beam", {}), query["force"],
+                        query["apos"], query["rpos"])
+                    response = {"acceleration": acceleration.tolist()}
+                except Exception as error:
+                    response = {"error": f"{type(error).__name__}: {error}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path=SOCKET_PATH, port=None):
+        if port is None:
+            server = await asyncio.start_unix_server(
+                self.handle, path, limit=LINE_LIMIT, backlog=1024)
+        else:
+            server = await asyncio.start_server(
+                self.handle, "127.0.0.1", port, limit=LINE_LIMIT,
+                backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+
+def query(force, apos, rpos, beam=None, path=SOCKET_PATH, port=None):
+    """
+    Blocking client: sends one request and returns the acceleration.
+    """
+    if port is None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection(("127.0.0.1", port))
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(json.dumps({"beam": beam or {}, "force": list(force),
+                                 "apos": apos, "rpos": rpos}).encode() + b"\n")
+        stream.flush()
+        response = json.loads(stream.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return np.array(response["acceleration"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulation service")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--window", type=float, default=0.002)
+    args = parser.parse_args(sys.argv[1:])
+
+    service = SimulationService(window=args.window)
+    where = args.socket if args.port is None else f"127.0.0.1:{args.port}"
+    print(f"Simulation service on {where}")
+    try:
+        asyncio.run(service.serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        print(service.stats)
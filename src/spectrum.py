@@ -0,0 +1,113 @@
+import numpy as np
+from scipy import signal
+
+
+def spectrum(acceleration, Ts, method="welch", nperseg=1024,
+             maxsegments=None):
+    """
+    Spectrum of an acceleration trace.
+        - method "welch": power spectral density ((m/s^2)^2/Hz) averaged
+        over Hann windowed segments of 'nperseg' samples;
+        - method "rfft": amplitude spectrum (m/s^2) of the whole trace.
+    With 'maxsegments', the Welch average uses at most that many segments
+    spread evenly over the trace (see welchsegments), so the cost does
+    not depend on its duration.
+    Returns the frequencies (Hz) and the spectrum.
+    """
+    if method == "welch" and maxsegments is not None:
+        return welchsegments(acceleration, Ts, nperseg, maxsegments)
+    acceleration = np.asarray(acceleration, dtype=float)
+    if method == "welch":
+        return signal.welch(acceleration, fs=1 / Ts,
+                            nperseg=min(nperseg, len(acceleration)))
+    n = len(acceleration)
+    freqs = np.fft.rfftfreq(n, Ts)
+    amplitude = np.abs(np.fft.rfft(acceleration)) * 2 / n
+    return freqs, amplitude
+
+
+def welchsegments(acceleration, Ts, nperseg=1024, maxsegments=64):
+    """
+    Welch power spectral density computed segment by segment: only the
+    segments used are read (the trace can be a memory map), and at most
+    'maxsegments' of the half-overlapping Hann segments are averaged,
+    chosen evenly over the trace. With fewer segments it is the same as
+    scipy.signal.welch. Returns the frequencies (Hz) and the PSD.
+    """
+    n = len(acceleration)
+    nperseg = min(nperseg, n)
+    step = nperseg - nperseg // 2   # overlap of nperseg // 2 samples
+    starts = step * np.arange((n - nperseg) // step + 1)
+    if len(starts) > maxsegments:
+        starts = starts[np.linspace(0, len(starts) - 1,
+                                    maxsegments).round().astype(int)]
+    window = signal.get_window("hann", nperseg)
+    psd = np.zeros(nperseg // 2 + 1)
+    for start in starts:
+        segment = np.asarray(acceleration[start:start + nperseg], dtype=float)
+        segment = segment - segment.mean()
+        psd += np.abs(np.fft.rfft(segment * window)) ** 2
+    psd *= Ts / (np.sum(window ** 2) * len(starts))
+    # One-sided density (the Nyquist bin of an even length is not doubled)
+    psd[1:len(psd) - (1 - nperseg % 2)] *= 2
+    return np.fft.rfftfreq(nperseg, Ts), psd
+
+
+class StreamingSTFT:
+    """
+    Spectrogram updated incrementally from blocks of samples.
+    The samples are kept in a sliding window of 'nfft' samples and a new
+    column is computed every 'hop' samples, so each block only costs the
+    FFTs of the columns it completes (the history is never recomputed).
+    The last 'nframes' columns are kept in a circular buffer.
+    """
+
+    def __init__(self, Ts, nfft=256, hop=32, nframes=200, floor=-120):
+        self.Ts = Ts
+        self.nfft = nfft
+        self.hop = hop
+        self.nframes = nframes
+        self.floor = floor  # minimum value in dB
+        self.window = signal.get_window("hann", nfft)
+        self.scale = 2 / np.sum(self.window)
+        self.freqs = np.fft.rfftfreq(nfft, Ts)
+        self.reset()
+
+    def reset(self):
+        self.buffer = np.zeros(self.nfft)
+        self.pending = 0  # samples received since the last column
+        self.frames = np.full((self.nframes, len(self.freqs)),
+                              float(self.floor))
+        self.head = 0  # position of the next column in 'frames'
+        self.count = 0  # total number of columns computed
+
+    def push(self, block):
+        """
+        Adds a block of samples, computing the columns it completes.
+        Returns the number of new columns.
+        """
+        block = np.asarray(block, dtype=float)
+        new = 0
+        while len(block):
+            n = min(self.hop - self.pending, len(block))
+            self.buffer = np.roll(self.buffer, -n)
+            self.buffer[-n:] = block[:n]
+            block = block[n:]
+            self.pending += n
+            if self.pending == self.hop:
+                self.pending = 0
+                amplitude = np.abs(np.fft.rfft(self.buffer * self.window))
+                amplitude *= self.scale
+                self.frames[self.head] = np.maximum(
+                    20 * np.log10(amplitude + 1e-300), self.floor)
+                self.head = (self.head + 1) % self.nframes
+                self.count += 1
+                new += 1
+        return new
+
+    def image(self):
+        """
+        Returns the columns (nframes x frequencies, in dB) ordered from
+        the oldest to the newest.
+        """
+        return np.roll(self.frames, -self.head, axis=0)
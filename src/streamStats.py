@@ -0,0 +1,189 @@
+import sys
+import argparse
+import numpy as np
+from scipy import signal
+
+
+"""
+Online statistics of a simulated signal (e.g. the acceleration at the read
+node), updated block by block with constant memory, so long or unbounded
+runs need no stored trace and no post-processing pass:
+    - RMS, mean and standard deviation (running mean and sum of squared
+    deviations merged per block, Chan et al., numerically stable);
+    - peak, time of the peak and crest factor;
+    - settling time: time after which |x| stays below the settling band
+    (a fraction of the peak, or an absolute threshold);
+    - energy in frequency bands (band-pass IIR with its state kept
+    between blocks);
+    - windowed variants: exponentially weighted RMS (time constant 'tau')
+    and RMS/peak/crest of the last 'window' seconds (ring buffer).
+Usage with the streaming simulation (the blocks are discarded):
+    stats = StreamingStats(beam.Ts, bands=[(10, 20)], window=10)
+    for _ in beam.stream(source, apos, rpos, stats=stats):
+        pass
+    stats.summary()
+How to use (inside the src folder):
+    python streamStats.py [--hours h]
+"""
+
+
+class StreamingStats:
+    """
+    Accumulator of the statistics of one signal.
+    """
+
+    def __init__(self, Ts, bands=(), window=None, tau=None, settling=0.05,
+                 threshold=None, order=4):
+        """
+        - Ts: sampling period (s);
+        - bands: list of (fmin, fmax) in Hz of the band energies;
+        - window: length (s) of the sliding window statistics;
+        - tau: time constant (s) of the exponentially weighted RMS;
+        - settling: settling band as a fraction of the peak;
+        - threshold: absolute settling band (replaces 'settling');
+        - order: order of the band-pass filters.
+        """
+        self.Ts = Ts
+        self.bands = [tuple(band) for band in bands]
+        self.filters = [signal.butter(order, band, btype="bandpass",
+                                      fs=1 / Ts, output="sos")
+                        for band in self.bands]
+        self.window = None if window is None else max(int(round(window / Ts)), 1)
+        self.tau = tau
+        self.settling = settling
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0       # sum of the squared deviations from the mean
+        self.peak = 0.0
+        self.peakindex = -1
+        self.lastexceed = -1  # last sample outside the settling band
+        self.zi = [np.zeros((sos.shape[0], 2)) for sos in self.filters]
+        self.energies = np.zeros(len(self.filters))
+        self.ewma = 0.0      # exponentially weighted mean square
+        if self.window is not None:
+            self.ring = np.zeros(self.window)
+            self.head = 0    # position of the next sample in the ring
+            self.filled = 0
+
+    def push(self, block):
+        """
+        Adds a block of samples (or a single sample).
+        """
+        block = np.atleast_1d(np.asarray(block, dtype=float)).ravel()
+        n = len(block)
+        if n == 0:
+            return
+
+        # Mean and squared deviations (merge of the block statistics)
+        mean = block.mean()
+        m2 = np.sum((block - mean)**2)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.count * n / total
+
+        # Peak and settling time. When the peak grows, the new peak is the
+        # latest sample outside the band so far, so the last exceedance
+        # only depends on the samples of this block.
+        magnitude = np.abs(block)
+        index = int(np.argmax(magnitude))
+        if magnitude[index] > self.peak:
+            self.peak = float(magnitude[index])
+            self.peakindex = self.count + index
+        band = self.threshold if self.threshold is not None \
+            else self.settling * self.peak
+        outside = np.flatnonzero(magnitude > band)
+        if len(outside):
+            self.lastexceed = self.count + int(outside[-1])
+        self.count = total
+
+        for i, sos in enumerate(self.filters):
+            y, self.zi[i] = signal.sosfilt(sos, block, zi=self.zi[i])
+            self.energies[i] += (y @ y) * self.Ts
+
+        if self.tau is not None:
+            alpha = 1 - np.exp(-self.Ts / self.tau)
+            y, _ = signal.lfilter([alpha], [1, alpha - 1], block**2,
+                                  zi=[(1 - alpha) * self.ewma])
+            self.ewma = float(y[-1])
+
+        if self.window is not None:
+            block = block[-self.window:]
+            first = min(len(block), self.window - self.head)
+            self.ring[self.head:self.head+first] = block[:first]
+            self.ring[:len(block)-first] = block[first:]
+            self.head = (self.head + len(block)) % self.window
+            self.filled = min(self.filled + len(block), self.window)
+
+    def rms(self):
+        if self.count == 0:
+            return 0.0
+        return float(np.sqrt(self.m2 / self.count + self.mean**2))
+
+    def windowed(self):
+        """
+        RMS, peak and crest factor of the last 'window' seconds.
+        """
+        if self.window is None or self.filled == 0:
+            return None
+        values = self.ring[:self.filled] if self.filled < self.window \
+            else self.ring
+        rms = float(np.sqrt(np.mean(values**2)))
+        peak = float(np.max(np.abs(values)))
+        return {"rms": rms, "peak": peak, "crest": peak / rms if rms else 0.0}
+
+    def summary(self):
+        rms = self.rms()
+        result = {
+            "samples": self.count,
+            "duration": self.count * self.Ts,
+            "mean": float(self.mean),
+            "std": float(np.sqrt(self.m2 / self.count)) if self.count else 0.0,
+            "rms": rms,
+            "peak": self.peak,
+            "peak_time": self.peakindex * self.Ts,
+            "crest": self.peak / rms if rms else 0.0,
+            "settling_time": (self.lastexceed + 1) * self.Ts,
+            "energy": rms**2 * self.count * self.Ts,
+            "band_energy": {f"{fmin:g}-{fmax:g}Hz": float(energy)
+                            for (fmin, fmax), energy in
+                            zip(self.bands, self.energies)},
+        }
+        if self.tau is not None:
+            result["ewma_rms"] = float(np.sqrt(self.ewma))
+        if self.window is not None:
+            result["window"] = self.windowed()
+        return result
+
+
+if __name__ == '__main__':
+    import time
+    from CantileverBeam import CantileverBeam
+
+    parser = argparse.ArgumentParser(description="Streaming statistics")
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--block", type=int, default=4096)
+    args = parser.parse_args(sys.argv[1:])
+
+    beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002, 0.002, 0.001, 0.001, 0.001], 1, 0)
+    nblocks = int(args.hours * 3600 / beam.Ts / args.block)
+
+    def source():
+        rng = np.random.default_rng(0)
+        for _ in range(nblocks):
+            yield rng.standard_normal(args.block)
+
+    stats = StreamingStats(beam.Ts, bands=[(10, 20), (80, 95)], window=10,
+                           tau=1.0)
+    start = time.perf_counter()
+    for _ in beam.stream(source(), 30, 59, args.block, stats=stats):
+        pass
+    wall = time.perf_counter() - start
+    print(f"{args.hours:g} h simulated in {wall:.1f} s")
+    for key, value in stats.summary().items():
+        print(f"{key:14s} {value}")
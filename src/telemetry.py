@@ -0,0 +1,181 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Telemetry:
+    """
+    Opt-in instrumentation of the simulation runs.
+    Records the time spent in each named section (modal analysis,
+    stepping, noise generation, plotting...), the number of calls,
+    the real-time deadline misses and the peak memory of each run.
+    The setup sections (the modal analysis of the beam construction) are
+    kept across runs, since the beam is built once for many runs.
+    """
+
+    SETUP = ("modal analysis",)
+
+    def __init__(self, trackmemory=True):
+        """
+        - trackmemory: measures the peak memory of each run with
+        tracemalloc (slows down the allocations while a run is active).
+        """
+        self.trackmemory = trackmemory
+        self.sections = {}
+        self.setup = {}
+        self.deadlines = {}
+        self.samples = 0
+        self.runstart = None
+        self.runtime = 0
+        self.peakmemory = 0
+        self.startedtracing = False
+
+    def setdeadline(self, name, seconds):
+        """
+        Sets the maximum duration of one call to the section 'name'.
+        Slower calls are counted as deadline misses.
+        """
+        self.deadlines[name] = seconds
+
+    def record(self, name, seconds):
+        """
+        Adds one call of 'seconds' to the section 'name'.
+        """
+        store = self.setup if name in self.SETUP else self.sections
+        section = store.get(name)
+        if section is None:
+            section = {"calls": 0, "total": 0.0, "max": 0.0, "last": 0.0,
+                       "misses": 0}
+            store[name] = section
+        section["calls"] += 1
+        section["total"] += seconds
+        section["last"] = seconds
+        if seconds > section["max"]:
+            section["max"] = seconds
+        deadline = self.deadlines.get(name)
+        if deadline is not None and seconds > deadline:
+            section["misses"] += 1
+
+    def addsamples(self, count):
+        """
+        Adds 'count' simulated samples to the current run. The batch
+        engines do not call update, so they report their samples here.
+        """
+        self.samples += count
+
+    @contextmanager
+    def section(self, name):
+        """
+        Context manager that records the time spent inside the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, name, func):
+        """
+        Returns a version of 'func' whose calls are recorded in 'name'.
+        """
+        perf_counter = time.perf_counter
+        record = self.record
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            result = func(*args, **kwargs)
+            record(name, perf_counter() - start)
+            return result
+        return timed
+
+    def start(self):
+        """
+        Starts a new run, clearing the statistics of the previous one
+        (the setup sections are kept).
+        """
+        self.sections = {}
+        self.samples = 0
+        self.peakmemory = 0
+        if self.trackmemory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.startedtracing = True
+            tracemalloc.reset_peak()
+        self.runstart = time.perf_counter()
+
+    def stop(self):
+        """
+        Ends the current run.
+        """
+        if self.runstart is not None:
+            self.runtime = time.perf_counter() - self.runstart
+            self.runstart = None
+        if self.trackmemory and tracemalloc.is_tracing():
+            self.peakmemory = tracemalloc.get_traced_memory()[1]
+            if self.startedtracing:
+                tracemalloc.stop()
+                self.startedtracing = False
+
+    def stats(self):
+        """
+        Returns a dictionary with the statistics of the last run. The
+        throughput is the number of samples over the time of the
+        "simulation" section (over the run time if there is none): the
+        steps of update plus the samples of addsamples.
+        """
+        def withmean(store):
+            return {name: dict(section, mean=section["total"] / section["calls"])
+                    for name, section in store.items()}
+
+        sections = withmean(self.sections)
+        steps = self.sections.get("stepping", {}).get("calls", 0)
+        runtime = self.runtime
+        if self.runstart is not None:
+            runtime = time.perf_counter() - self.runstart
+        samples = steps + self.samples
+        busy = sections["simulation"]["total"] if "simulation" in sections \
+            else runtime
+        return {
+            "sections": sections,
+            "setup": withmean(self.setup),
+            "steps": steps,
+            "steps_per_second": steps / runtime if runtime > 0 else 0.0,
+            "samples": samples,
+            "samples_per_second": samples / busy if busy > 0 else 0.0,
+            "deadline_misses": sum(s["misses"] for s in sections.values()),
+            "runtime": runtime,
+            "peak_memory": self.peakmemory,
+        }
+
+    def summary(self):
+        """
+        Returns a one line summary of the last run (for the status bar).
+        The deadline misses are shown when a section with a deadline ran.
+        """
+        stats = self.stats()
+        text = [f"{stats['runtime']:.3f} s"]
+        for name, section in stats["setup"].items():
+            text.append(f"{name}: {section['last']:.3f} s")
+        for name, section in stats["sections"].items():
+            text.append(f"{name}: {section['total']:.3f} s")
+        if stats["steps"]:
+            text.append(f"{stats['steps_per_second']:.0f} steps/s")
+        if stats["samples"]:
+            text.append(f"{stats['samples_per_second']:.0f} samples/s")
+        if any(name in self.deadlines for name in stats["sections"]):
+            text.append(f"misses: {stats['deadline_misses']}")
+        if self.trackmemory:
+            text.append(f"peak: {stats['peak_memory'] / 2**20:.1f} MiB")
+        return " | ".join(text)
+
+    def dump(self, path, **info):
+        """
+        Appends the statistics of the last run to a local metrics file
+        (one JSON object per line).
+        """
+        record = self.stats()
+        record["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        record.update(info)
+        with open(path, "a") as file:
+            file.write(json.dumps(record) + "\n")
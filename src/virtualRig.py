@@ -0,0 +1,305 @@
+import sys
+import math
+import time
+import socket
+import struct
+import argparse
+import numpy as np
+
+
+"""
+Virtual rig: runs a CantileverBeam at a fixed sampling period and exposes
+it as a sensor/actuator device over UDP on localhost, so the embedded
+control code can be tested without the physical rig.
+
+Every packet is a header followed by float32 values (little endian):
+    magic (uint16), type (uint16), seq (uint32), simtime (float64),
+    walltime (float64), ack (uint32)
+    - FORCE (client -> rig): one force per actuator node. 'walltime' is the
+    client send time (time.monotonic) and is echoed back in the samples.
+    - SAMPLE (rig -> client): one acceleration (m/s^2) per sensor node.
+    'simtime' is the simulation time, 'ack' is the seq of the last force
+    packet applied and 'walltime' is its echoed send time.
+    - RESET (client -> rig): no values, returns the beam to rest.
+How to use (inside the src folder):
+    python virtualRig.py [--speed x] [--duration s]
+"""
+
+MAGIC = 0xBEA0
+FORCE = 1
+SAMPLE = 2
+RESET = 3
+HEADER = struct.Struct("<HHIddI")
+
+RIG_ADDRESS = ("127.0.0.1", 5005)
+CLIENT_ADDRESS = ("127.0.0.1", 5006)
+
+
+def packet(kind, seq, simtime, walltime, ack, values=()):
+    """
+    Builds a packet with the header and the float32 values.
+    """
+    payload = np.asarray(values, dtype="<f4").tobytes()
+    return HEADER.pack(MAGIC, kind, seq, simtime, walltime, ack) + payload
+
+
+def unpack(data):
+    """
+    Returns (type, seq, simtime, walltime, ack, values) of a packet,
+    or None if it is not a valid packet.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, kind, seq, simtime, walltime, ack = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        return None
+    values = np.frombuffer(data, dtype="<f4", offset=HEADER.size)
+    return kind, seq, simtime, walltime, ack, values
+
+
+class VirtualRig:
+    """
+    UDP service that steps the beam every Ts (or Ts/speed in accelerated
+    mode), applies the most recent force packet and publishes the sensor
+    accelerations. Sleeping is used until shortly before each deadline
+    and the remaining time is spent polling, which keeps the tick jitter
+    bounded without relying on the resolution of time.sleep.
+    """
+
+    def __init__(self, beam, apos, spos, address=RIG_ADDRESS,
+                 client=CLIENT_ADDRESS, speed=1.0, spin=1e-3):
+        """
+        - apos: actuator node (or list of nodes);
+        - spos: sensor node (or list of nodes);
+        - address: UDP address where the force packets are received;
+        - client: UDP address where the samples are published;
+        - speed: simulation speed relative to real time
+        (np.inf runs as fast as possible);
+        - spin: time before each deadline spent polling instead of sleeping.
+        """
+        self.beam = beam
+        self.apos = np.atleast_1d(apos)
+        self.spos = np.atleast_1d(spos)
+        self.client = client
+        self.speed = speed
+        self.spin = spin
+        self.running = False
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+        self.resetstats()
+
+    def resetstats(self):
+        self.seq = 0
+        self.ack = 0
+        self.echo = 0.0
+        self.lateness = TimeStats()   # tick time - scheduled time
+        self.latency = TimeStats()    # force packet sent -> applied at a tick
+        self.received = 0
+        self.dropped = 0     # force packets replaced before being applied
+
+    def receive(self):
+        """
+        Reads all the pending packets. Only the most recent force of each
+        tick is applied (the others are counted as dropped).
+        """
+        forces = None
+        while True:
+            try:
+                data = self.socket.recv(4096)
+            except BlockingIOError:
+                break
+            message = unpack(data)
+            if message is None:
+                continue
+            kind, seq, _, walltime, _, values = message
+            if kind == FORCE:
+                self.received += 1
+                if forces is not None:
+                    self.dropped += 1
+                forces = values
+                self.ack = seq
+                self.echo = walltime
+            elif kind == RESET:
+                self.beam.reset()
+        return forces
+
+    def tick(self):
+        """
+        One sampling period: applies the last force, steps the beam and
+        publishes the sensor samples.
+        """
+        forces = self.receive()
+        if forces is not None:
+            for pos, value in zip(self.apos, forces):
+                self.beam.setforce(pos, float(value))
+            self.latency.add(time.monotonic() - self.echo)
+        self.beam.update()
+        samples = [self.beam.getaccel(pos) for pos in self.spos]
+        self.seq += 1
+        self.socket.sendto(packet(SAMPLE, self.seq, self.seq * self.beam.Ts,
+                                  self.echo, self.ack, samples), self.client)
+
+    def run(self, duration=None):
+        """
+        Runs the service for 'duration' seconds of simulation time
+        (or until stop() is called).
+        """
+        period = self.beam.Ts / self.speed
+        nticks = None if duration is None else int(duration / self.beam.Ts)
+        self.running = True
+        start = time.monotonic()
+        n = 0
+        while self.running and (nticks is None or n < nticks):
+            deadline = start + n * period
+            if np.isfinite(period):
+                remaining = deadline - time.monotonic()
+                if remaining > self.spin:
+                    time.sleep(remaining - self.spin)
+                while time.monotonic() < deadline:
+                    pass
+                self.lateness.add(time.monotonic() - deadline)
+            self.tick()
+            n += 1
+        self.running = False
+        return self.stats()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.socket.close()
+
+    def stats(self):
+        """
+        Jitter (tick lateness) and latency (force sent -> applied)
+        statistics in seconds.
+        """
+        return {
+            "ticks": self.seq,
+            "received": self.received,
+            "dropped": self.dropped,
+            "jitter": self.lateness.summary(),
+            "latency": self.latency.summary(),
+        }
+
+
+class RigClient:
+    """
+    Client of the virtual rig: sends forces and receives the samples.
+    Measures the round-trip latency with the echoed timestamps.
+    """
+
+    def __init__(self, address=CLIENT_ADDRESS, rig=RIG_ADDRESS):
+        self.rig = rig
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.seq = 0
+        self.roundtrip = TimeStats()
+        self.lastsample = 0
+        self.lost = 0
+
+    def sendforce(self, values):
+        self.seq += 1
+        self.socket.sendto(packet(FORCE, self.seq, 0.0, time.monotonic(), 0,
+                                  np.atleast_1d(values)), self.rig)
+
+    def reset(self):
+        self.socket.sendto(packet(RESET, 0, 0.0, time.monotonic(), 0),
+                           self.rig)
+
+    def receive(self, timeout=1.0):
+        """
+        Waits for the next sample packet. Returns (seq, simtime, values).
+        """
+        self.socket.settimeout(timeout)
+        while True:
+            message = unpack(self.socket.recv(4096))
+            if message is None or message[0] != SAMPLE:
+                continue
+            _, seq, simtime, walltime, ack, values = message
+            if self.lastsample and seq != self.lastsample + 1:
+                self.lost += seq - self.lastsample - 1
+            self.lastsample = seq
+            if ack and walltime:
+                self.roundtrip.add(time.monotonic() - walltime)
+            return seq, simtime, values
+
+    def close(self):
+        self.socket.close()
+
+
+class TimeStats:
+    """
+    Online statistics of a stream of durations (s) with constant memory,
+    for services that run indefinitely: count, mean and variance
+    (Welford), maximum and a histogram with logarithmic bins for the
+    percentiles (BINS per decade from 10^LOW s, so a percentile is given
+    within one bin, about 5 %).
+    """
+
+    LOW = -7      # first bin edge: 100 ns
+    DECADES = 8   # up to 10 s (longer durations go to the last bin)
+    BINS = 50     # bins per decade
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0   # sum of the squared deviations from the mean
+        self.max = -np.inf
+        self.histogram = np.zeros(self.DECADES * self.BINS, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value > self.max:
+            self.max = value
+        index = int((math.log10(value) - self.LOW) * self.BINS) \
+            if value > 0 else 0
+        self.histogram[min(max(index, 0), len(self.histogram) - 1)] += 1
+
+    def percentile(self, q):
+        """
+        Upper edge of the bin of the q-th percentile (at most the maximum).
+        """
+        if self.count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.histogram),
+                                    q / 100 * self.count))
+        return float(min(10 ** (self.LOW + (index + 1) / self.BINS),
+                         self.max))
+
+    def summary(self):
+        if self.count == 0:
+            return {"mean": 0.0, "std": 0.0, "p99": 0.0, "max": 0.0}
+        return {"mean": float(self.mean),
+                "std": float(np.sqrt(self.m2 / self.count)),
+                "p99": self.percentile(99), "max": float(self.max)}
+
+
+if __name__ == '__main__':
+    from CantileverBeam import CantileverBeam
+
+    parser = argparse.ArgumentParser(description="Virtual rig (UDP)")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=None)
+    parser.add_argument("--apos", type=int, default=30)
+    parser.add_argument("--spos", type=int, default=59)
+    args = parser.parse_args(sys.argv[1:])
+
+    beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002, 0.002, 0.001, 0.001, 0.001], 1, 0)
+    rig = VirtualRig(beam, args.apos, args.spos, speed=args.speed)
+    print(f"Virtual rig on {rig.address}, publishing to {rig.client}")
+    try:
+        print(rig.run(args.duration))
+    except KeyboardInterrupt:
+        print(rig.stats())
+    finally:
+        rig.close()
@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+
+# The modules of the simulator are imported as in the scripts of src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture
+def beam():
+    """
+    Reference steel beam of the GUI (60 points, 4 ms, modes below Nyquist).
+    """
+    from CantileverBeam import CantileverBeam
+
+    return CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002, 0.002, 0.001, 0.001, 0.001], 1, 0)
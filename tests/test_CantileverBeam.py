@@ -0,0 +1,221 @@
+import itertools
+import numpy as np
+from CantileverBeam import CantileverBeam
+
+DAMP = [0.002, 0.002, 0.001, 0.001, 0.001]
+
+
+def steel(Ts, **kwargs):
+    return CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, Ts, None,
+                          DAMP, 1, 0, **kwargs)
+
+
+def test_withsampling_leaves_beam_alone(beam):
+    freqs = beam.freqsHz.copy()
+    other = beam.withsampling(0.001)
+    assert beam.Ts == 0.004 and np.array_equal(beam.freqsHz, freqs)
+    assert other.Ts == 0.001
+
+
+def test_withsampling_matches_new_beam():
+    beam = steel(0.004)
+    force = np.random.default_rng(0).standard_normal(3000)
+    for Ts in (0.02, 0.001):   # fewer modes (subset) and more (rebuild)
+        derived, built = beam.withsampling(Ts), steel(Ts)
+        assert np.all(derived.freqsHz < 0.5 / Ts)
+        np.testing.assert_allclose(derived.freqsHz, built.freqsHz)
+        np.testing.assert_allclose(derived.simulate(force, 30, 59),
+                                   built.simulate(force, 30, 59), atol=1e-12)
+
+
+def test_frommodal_runs_normal_initialization(beam):
+    copy = CantileverBeam.frommodal(beam.vmod64, beam.freqsHz, beam.zeta,
+                                    beam.Ts, length=beam.length)
+    force = np.sin(2 * np.pi * 10 * np.arange(2000) * beam.Ts)
+    np.testing.assert_array_equal(copy.simulate(force, 0.3, 0.58),
+                                  beam.simulate(force, 0.3, 0.58))
+    copy.setforce(0.3, 1.0)
+    copy.update()
+    assert copy.getaccelms2(0.58) != 0
+
+
+def test_simulate_matches_zoh_lsim(beam):
+    from scipy import signal
+
+    apos, rpos = 20, 59
+    force = np.random.default_rng(1).standard_normal(1500)
+    t = np.arange(len(force)) * beam.Ts
+    u = beam.forcescaler * force
+    # Continuous modal model (m x'' + 2 m sigma x' + m wn^2 x = u) with the
+    # force held over each period, as the IIRs of the beam
+    shape = beam.vmod64[rpos, :] * beam.vmod64[apos, :]
+    sigma = beam.zeta * beam.wn
+    for quantity in ("displacement", "velocity", "acceleration"):
+        y = np.zeros(len(t))
+        for k in range(beam.nmodes):
+            A = [[0, 1], [-beam.wn[k]**2, -2 * sigma[k]]]
+            B = [[0], [1 / beam.m]]
+            C, D = {"displacement": ([1, 0], 0), "velocity": ([0, 1], 0),
+                    "acceleration": (A[1], 1 / beam.m)}[quantity]
+            _, yk, _ = signal.lsim((A, B, [C], [[D]]), u, t, interp=False)
+            y += shape[k] * yk
+        np.testing.assert_allclose(beam.simulate(force, apos, rpos,
+                                                 quantity=quantity),
+                                   y, rtol=0, atol=1e-9 * np.max(np.abs(y)))
+
+
+def test_update_matches_simulate(beam):
+    force = np.random.default_rng(2).standard_normal(300)
+    a = beam.simulate(force, 10, 45)
+    for n, f in enumerate(force):
+        beam.setforce(10, f)
+        beam.update()
+        assert np.isclose(beam.getaccelms2(45), a[n], rtol=0,
+                          atol=1e-5 * np.max(np.abs(a)))
+
+
+def test_positions_on_nodes_match_indices(beam):
+    force = np.random.default_rng(3).standard_normal(2000)
+    for apos, rpos in ((0, 59), (29, 10), (59, 59)):
+        xa, xr = [(i + 1) * beam.length / beam.npoints for i in (apos, rpos)]
+        np.testing.assert_array_equal(beam.simulate(force, xa, xr),
+                                      beam.simulate(force, apos, rpos))
+        np.testing.assert_array_equal(beam.modeshape(xr), beam.vmod[rpos])
+    np.testing.assert_array_equal(beam.modeshape(0.0), 0)
+
+
+def test_positions_between_nodes_match_finer_mesh():
+    coarse = CantileverBeam(30, 0.05, 0.00575, 0.58, 7900, 2e11, 0.001, None,
+                            0.002, 1, 0)
+    fine = CantileverBeam(240, 0.05, 0.00575, 0.58, 7900, 2e11, 0.001, None,
+                          0.002, 1, 0)
+    nmodes = 3
+
+    def normalized(beam, shapes):
+        # Mode shapes scaled by their tip value (sign and normalization)
+        return shapes[..., :nmodes] / beam.vmod64[-1, :nmodes]
+
+    # The nodes of the coarse mesh are every 8th node of the fine one
+    shared = 8 * np.arange(1, 31) - 1
+    meshing = np.abs(normalized(coarse, coarse.vmod64)
+                     - normalized(fine, fine.vmod64[shared])).max(axis=0)
+    between = [j for j in range(240) if (j + 1) % 8]
+    positions = (np.array(between) + 1) * 0.58 / 240
+    spline = np.abs(normalized(coarse, coarse.modeshape(positions, True))
+                    - normalized(fine, fine.vmod64[between])).max(axis=0)
+    # Between the nodes the error is that of the mesh itself
+    assert np.all(spline < 1.1 * meshing + 1e-5)
+
+
+def test_modes_selected_below_fmax_and_nyquist():
+    reference = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.0005,
+                               10, DAMP, 1, 0).freqsHz
+    for Ts, fmax in ((0.004, None), (0.001, None), (0.001, 150.0),
+                     (0.004, 1000.0)):
+        beam = steel(Ts, fmax=fmax)
+        cutoff = 0.5 / Ts if fmax is None else min(fmax, 0.5 / Ts)
+        expected = reference[reference < cutoff]
+        assert beam.nmodes == len(expected) > 0
+        np.testing.assert_allclose(beam.freqsHz, expected, rtol=1e-9)
+        assert beam.vmod.shape == (60, beam.nmodes)
+    # The damping list is extended with its last value
+    beam = steel(0.0002)
+    assert beam.nmodes > 5
+    np.testing.assert_array_equal(beam.zeta,
+                                  DAMP + [DAMP[-1]] * (beam.nmodes - 5))
+
+
+def test_iir_cache_reused_and_invalidated(beam):
+    first = beam.filters(0.001)
+    assert beam.filters(0.001) is first
+    beam.setsampling(0.001)
+    assert beam.Aiir is first[0] and beam.Ts == 0.001
+    beam.setsampling(0.004)
+    assert beam.filters(0.001) is first and set(beam.iircache) == {0.004,
+                                                                   0.001}
+    # A period passed to simulate uses the cache without changing the beam
+    force = np.random.default_rng(4).standard_normal(500)
+    other = beam.simulate(force, 30, 59, Ts=0.001)
+    assert beam.Ts == 0.004 and beam.Aiir is beam.filters(0.004)[0]
+    beam.setsampling(0.001)
+    np.testing.assert_array_equal(beam.simulate(force, 30, 59), other)
+    # New damping: the cached coefficients are computed again
+    beam.setdamping(0.01)
+    assert beam.filters(0.001) is not first and set(beam.iircache) == {0.001}
+    assert not np.allclose(beam.filters(0.001)[0], first[0])
+
+
+def test_simulatenl_matches_reference_loop(beam):
+    beam.configforcescaler(1.0, 5e-3)
+    command = np.sin(2 * np.pi * 12 * np.arange(3000) * beam.Ts)
+    acceleration, force = beam.simulatenl(command, 30, 59)
+    beam.reset()
+    applied, expected = [], []
+    for value in command:
+        beam.setforcenl(30, value)
+        applied.append(beam.f[30])
+        beam.update()
+        expected.append(beam.getaccelms2(59))
+    np.testing.assert_allclose(force, applied, rtol=1e-12)
+    np.testing.assert_allclose(acceleration, expected, rtol=0,
+                               atol=1e-10 * np.max(np.abs(expected)))
+    # The force depends on the displacement (not a scaled command)
+    linear = beam.forcescaler * command
+    assert np.max(np.abs(force - linear)) > 1e-3 * np.max(np.abs(linear))
+
+
+def test_modal_reprojection_matches_simulation(beam):
+    force = np.random.default_rng(5).standard_normal(3000)
+    for quantity in ("displacement", "velocity", "acceleration"):
+        q = beam.simulatemodal(force, 30, quantity=quantity)
+        field = beam.project(q)    # whole beam, npoints x N
+        for rpos in (0, 17, 59, 0.3, 0.58):
+            direct = beam.simulate(force, 30, rpos, quantity=quantity)
+            atol = 1e-12 * np.max(np.abs(direct))
+            np.testing.assert_allclose(beam.project(q, rpos), direct,
+                                       rtol=0, atol=atol)
+            if isinstance(rpos, int):
+                np.testing.assert_allclose(field[rpos], direct, rtol=0,
+                                           atol=atol)
+        np.testing.assert_allclose(beam.project(q, [5, 40]), field[[5, 40]])
+
+
+def test_float32_close_to_float64():
+    single, double = steel(0.004, dtype=np.float32), steel(0.004)
+    assert single.vmod.dtype == np.float32 and single.vmod64.dtype == np.float64
+    force = np.random.default_rng(6).standard_normal(3000)
+    reference = double.simulate(force, 30, 59)
+    scale = np.max(np.abs(reference))
+    result = single.simulate(force, 30, 59)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, reference, rtol=0, atol=1e-5 * scale)
+    # Stepping keeps the float32 field and the same tolerance
+    for n, value in enumerate(force[:500]):
+        single.setforce(30, value)
+        single.update()
+        assert single.a.dtype == np.float32
+        assert abs(single.getaccelms2(59) - reference[n]) <= 1e-5 * scale
+
+
+def test_stream_concatenates_to_simulate(beam):
+    force = np.random.default_rng(7).standard_normal(2500)
+    for quantity in ("displacement", "acceleration"):
+        direct = beam.simulate(force, 0.31, 59, quantity=quantity)
+        atol = 1e-12 * np.max(np.abs(direct))
+        # Sample by sample and in uneven blocks, last block shorter
+        for source in (iter(force), np.array_split(force, 9)):
+            blocks = list(beam.stream(source, 0.31, 59, 700,
+                                      quantity=quantity))
+            assert [len(b) for b in blocks] == [700, 700, 700, 400]
+            np.testing.assert_allclose(np.concatenate(blocks), direct,
+                                       rtol=0, atol=atol)
+        q = np.concatenate([block.copy() for block in beam.streammodal(
+            iter(force), 0.31, 700, quantity=quantity)], axis=1)
+        np.testing.assert_allclose(q, beam.simulatemodal(force, 0.31,
+                                                         quantity=quantity),
+                                   rtol=0, atol=atol)
+    # An endless source is consumed lazily
+    endless = beam.stream(itertools.cycle(force), 30, 59, 500)
+    first = [next(endless) for _ in range(5)]
+    np.testing.assert_allclose(np.concatenate(first),
+                               beam.simulate(force, 30, 59), atol=1e-12)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from controllers import PID, LQR, FxLMS, ClosedLoop
+
+
+class Off:
+    """
+    Open loop: the actuator never acts.
+    """
+
+    def reset(self):
+        pass
+
+    def step(self, measurement, reference=None, state=None):
+        return np.zeros(1)
+
+
+class ModalStateGain:
+    """
+    Controller outside the module that uses the modal state.
+    """
+
+    needsstate = True
+
+    def __init__(self, gain):
+        self.gain = gain
+
+    def reset(self):
+        pass
+
+    def step(self, measurement, reference=None, state=None):
+        return -self.gain @ state
+
+
+def test_state_passed_by_attribute(beam):
+    lqr = LQR(beam, 59, q=1, r=1e-4)
+    disturbance = np.sin(2 * np.pi * beam.freqsHz[0]
+                         * np.arange(2000) * beam.Ts)
+    expected = ClosedLoop(beam, lqr, 59, 59, dpos=30).run(disturbance)
+    custom = ModalStateGain(lqr.K)
+    result = ClosedLoop(beam, custom, 59, 59, dpos=30).run(disturbance)
+    np.testing.assert_array_equal(result["acceleration"],
+                                  expected["acceleration"])
+
+
+@pytest.mark.parametrize("name", ["pid", "lqr", "fxlms", "fxlms-feedback"])
+def test_controllers_reduce_vibration(beam, name):
+    controller = {
+        "pid": lambda: PID(0, 1.0, 0, beam.Ts),
+        "lqr": lambda: LQR(beam, 59, q=1, r=1e-4),
+        "fxlms": lambda: FxLMS(beam, 59, 59),
+        "fxlms-feedback": lambda: FxLMS(beam, 59, 59, feedback=True),
+    }[name]()
+    # First mode excited at mid-span, actuator and sensor at the tip
+    disturbance = np.sin(2 * np.pi * beam.freqsHz[0]
+                         * np.arange(4000) * beam.Ts)
+
+    def rms(controller):
+        result = ClosedLoop(beam, controller, 59, 59, dpos=30).run(disturbance)
+        return np.sqrt(np.mean(result["acceleration"][2000:] ** 2))
+
+    assert rms(controller) < 0.5 * rms(Off())
@@ -0,0 +1,10 @@
+import goldenTrace
+
+
+def test_engines_match_golden_traces():
+    report = goldenTrace.check(goldenTrace.GOLDEN)
+    for family in goldenTrace.FAMILIES.values():
+        assert set(family[1]) <= set(report)
+    failures = {engine: result["failures"]
+                for engine, result in report.items() if result["failures"]}
+    assert not failures
@@ -0,0 +1,33 @@
+import numpy as np
+from CantileverBeam import CantileverBeam
+from identification import Identification, applyfit
+
+TRUEDAMP = [0.004, 0.003, 0.002, 0.0015]
+
+
+def newbeam(elasticmod, damp, forcescaler):
+    return CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, elasticmod,
+                          0.001, 4, damp, forcescaler, 0)
+
+
+def test_recovers_known_parameters():
+    true = newbeam(1.9e11, TRUEDAMP, 1.3)
+    rng = np.random.default_rng(1)
+    force = rng.standard_normal(5000)
+    measured = true.simulate(force, 30, 59)
+    measured += rng.standard_normal(len(measured)) * 0.01
+
+    beam = newbeam(2e11, [0.002, 0.002, 0.001, 0.001], 1)
+    result = Identification(beam, [(force, 30, 59, measured)]).fit(
+        nstarts=2, workers=1, seed=0)
+    assert abs(result["elasticmod"] / 1.9e11 - 1) < 1e-3
+    assert abs(result["forcescaler"] / 1.3 - 1) < 1e-2
+    np.testing.assert_allclose(result["zeta"], TRUEDAMP, rtol=0.1)
+
+    applyfit(beam, result)
+    assert beam.forcescaler1 == beam.forcescaler == result["forcescaler"]
+    np.testing.assert_allclose(beam.freqsHz, true.freqsHz, rtol=1e-3)
+    command = np.sin(2 * np.pi * 20 * np.arange(2000) * beam.Ts)
+    nl, _ = beam.simulatenl(command, 30, 59)
+    truenl, _ = true.simulatenl(command, 30, 59)
+    assert np.max(np.abs(nl - truenl)) < 0.05 * np.max(np.abs(truenl))
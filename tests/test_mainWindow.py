@@ -0,0 +1,52 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip("PySide2")
+pytest.importorskip("pyqtgraph")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# The window imports its form as src.ui, as in main.py
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_window_builds():
+    from PySide2.QtWidgets import QApplication
+    from mainWindow import MainWindow
+
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    assert window.realsteps == 0
+    assert window.simprocess is None and window.sessionlog is None
+    assert window.beam.npoints == 60
+    window.close()
+    app.processEvents()
+
+
+def test_fixed_export_matches_memory(tmp_path):
+    import numpy as np
+    from PySide2 import QtCore
+    from PySide2.QtWidgets import QApplication
+    from mainWindow import MainWindow
+
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    window.ui.box_time.setTime(QtCore.QTime(0, 1, 0))
+    window.updateFixed()
+    force = np.array(window.fixedforce)
+    acceleration = window.fixedAcceleration(40)
+    seed = window.fixedseed
+
+    # Same run streamed to disk block by block
+    window.enableExport(str(tmp_path))
+    window.fixedseed = seed
+    window.simulateFixed(window.ui.sbx_aposft.value(),
+                         window.ui.sbx_rposft.value(), window.fixedfreq)
+    assert len(os.listdir(tmp_path)) == 1
+    np.testing.assert_array_equal(window.fixedforce, force)
+    np.testing.assert_allclose(window.fixedAcceleration(40), acceleration,
+                               atol=1e-12)
+    window.simulateFixed(window.ui.sbx_aposft.value(),
+                         window.ui.sbx_rposft.value(), window.fixedfreq)
+    assert len(os.listdir(tmp_path)) == 2   # a new folder for each run
+    window.close()
+    app.processEvents()
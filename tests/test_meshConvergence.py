@@ -0,0 +1,26 @@
+import numpy as np
+from meshConvergence import betaL, compare, smallestmesh
+
+
+def test_betaL_roots():
+    # Tabulated roots of 1 + cos(x) cosh(x) = 0
+    np.testing.assert_allclose(betaL(5), [1.8751040687, 4.6940911330,
+                                          7.8547574382, 10.9955407349,
+                                          14.1371683910], rtol=1e-9)
+
+
+def test_fine_mesh_matches_analytic_beam():
+    result = compare(200, 5)
+    assert np.all(np.abs(result["error"]) < 1e-3)
+    np.testing.assert_allclose(result["mac"], 1, atol=1e-4)
+
+
+def test_smallestmesh_is_minimal():
+    tolerance = [0.01, 0.02, 0.05]
+    npoints, result = smallestmesh(tolerance, 3)
+    # Linear search of the first mesh within the tolerance of every mode
+    first = next(n for n in range(3, 100)
+                 if np.all(np.abs(compare(n, 3)["error"]) <= tolerance))
+    assert npoints == first == 9
+    assert np.all(np.abs(result["error"]) <= tolerance)
+    assert smallestmesh(0.01, 3, nmax=8)[0] is None
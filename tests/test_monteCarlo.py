@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from monteCarlo import MonteCarlo
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_meter_positions(beam, workers):
+    apos, rpos = 0.29, 0.575   # between the nodes, in meters
+    t = np.arange(2000) * beam.Ts
+    force = np.sin(2 * np.pi * 5 * t)
+    damping = np.array([0.8, 1.0, 1.25])
+    result = MonteCarlo(beam, apos, rpos, force, dtype=np.float64).run(
+        workers=workers, damping=damping, forcescaler=[1.0, 2.0, 1.0])
+
+    for run, (scale, forcescaler) in enumerate(zip(damping, [1.0, 2.0, 1.0])):
+        beam.setdamping(scale * np.array([0.002, 0.002, 0.001, 0.001,
+                                          0.001])[:beam.nmodes])
+        beam.configforcescaler(forcescaler)
+        np.testing.assert_allclose(result["acceleration"][run],
+                                   beam.simulate(force, apos, rpos),
+                                   rtol=1e-10, atol=1e-12)
@@ -0,0 +1,22 @@
+import numpy as np
+from placement import scores, ranking
+
+
+def test_scores_match_simulated_frf(beam):
+    # FRF of the simulated pair: FFT of its impulse response (decayed)
+    impulse = np.zeros(2**16)
+    impulse[0] = 1
+    h2, _ = scores(beam, "h2")
+    peak, gains = scores(beam, "peak")
+    pairs = [ranking(h2, top=1)[0][:2], ranking(peak, top=1)[0][:2], (20, 59)]
+    for apos, rpos in pairs:
+        response = beam.simulate(impulse, apos, rpos)
+        H = np.abs(np.fft.rfft(response))
+        freqs = np.fft.rfftfreq(len(response), beam.Ts)
+        norm = np.sqrt(np.sum(H**2) * freqs[1])
+        np.testing.assert_allclose(h2[apos, rpos], norm, rtol=1e-3)
+        # Resonance peaks of the FFT around each mode
+        peaks = [H[np.abs(freqs - f) < 0.02 * f].max()
+                 for f in beam.wd / (2 * np.pi)]
+        np.testing.assert_allclose(gains[apos, rpos], peaks, rtol=0.02)
+        np.testing.assert_allclose(peak[apos, rpos], sum(peaks), rtol=0.02)
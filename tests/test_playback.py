@@ -0,0 +1,27 @@
+import numpy as np
+from scipy import interpolate
+from playback import Playback
+
+
+def test_playback_matches_simulate(beam):
+    force = lambda t: np.sin(2 * np.pi * 12 * np.asarray(t))
+    playback = Playback(beam, 30, 59, force, window=1.0, speed=0.1)
+    playback.advance(2.0)
+    assert np.isclose(playback.time, 0.2) and playback.t[-1] < 1.5
+    playback.speed = 1.0
+    for _ in range(5):
+        playback.advance(0.5)    # past the first window: precomputed again
+    assert np.isclose(playback.time, 2.7) and playback.t[-1] >= 2.7
+
+    t = np.arange(len(playback.t)) * beam.Ts
+    expected = beam.simulate(force(t), 30, 59)
+    np.testing.assert_array_equal(playback.a, expected)
+    # The interpolation passes through the simulated samples
+    np.testing.assert_allclose(playback.spline(t), expected, rtol=0,
+                               atol=1e-9 * np.max(np.abs(expected)))
+    frame_t, frame_force, frame_a = playback.frame(0.5, npoints=300)
+    assert np.isclose(frame_t[0], 2.2) and frame_t[-1] == playback.time
+    index = (frame_t / beam.Ts).astype(int)
+    np.testing.assert_array_equal(frame_force, force(t)[index])
+    np.testing.assert_allclose(frame_a,
+                               interpolate.CubicSpline(t, expected)(frame_t))
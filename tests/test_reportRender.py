@@ -0,0 +1,29 @@
+import numpy as np
+from reportRender import decimate, renderreport
+
+
+def test_decimate_keeps_peaks():
+    Ts = 0.004
+    y = np.random.default_rng(0).standard_normal(100003)
+    y[12345], y[99999] = 50.0, -60.0
+    t = np.arange(len(y)) * Ts
+    td, yd = decimate(t, y, maxpoints=400)
+    assert len(yd) <= 402
+    assert yd.max() == y.max() and yd.min() == y.min()
+    assert np.all(np.diff(td) > 0)
+    np.testing.assert_array_equal(td, decimate(Ts, y, maxpoints=400)[0])
+    # Short traces are unchanged
+    td, yd = decimate(Ts, y[:300], maxpoints=400)
+    np.testing.assert_array_equal(yd, y[:300])
+    np.testing.assert_allclose(td, t[:300])
+
+
+def test_renderreport_png(tmp_path, beam):
+    force = np.sin(2 * np.pi * 12 * np.arange(20000) * beam.Ts)
+    scenario = {"name": "harmonic", "force": force,
+                "acceleration": beam.simulate(force, 30, 59), "Ts": beam.Ts,
+                "freqsHz": beam.freqsHz.tolist()}
+    files = renderreport([scenario], str(tmp_path), workers=1)
+    assert files == [str(tmp_path / "harmonic.png")]
+    with open(files[0], "rb") as file:
+        assert file.read(8) == b"\x89PNG\r\n\x1a\n"
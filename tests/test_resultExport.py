@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pytest
+from resultExport import ResultWriter, loadresult, newresultdir
+
+
+def test_roundtrip(tmp_path, beam):
+    force = np.sin(2 * np.pi * 12 * np.arange(10000) * beam.Ts)
+    acceleration = beam.simulate(force, 30, 59)
+    path = str(tmp_path / "run")
+    with ResultWriter(path, beam, len(force), chunksize=1000, apos=30,
+                      rpos=59, disturbance="harmonic") as writer:
+        for start in range(0, len(force), 3000):
+            writer.write(force=force[start:start + 3000],
+                         acceleration=acceleration[start:start + 3000])
+
+    metadata, arrays = loadresult(path)
+    assert metadata["nsamples"] == len(force)
+    assert metadata["Tsampling"] == beam.Ts
+    assert metadata["freqsHz"] == list(beam.freqsHz)
+    assert metadata["apos"] == 30 and metadata["disturbance"] == "harmonic"
+    np.testing.assert_array_equal(arrays["force"], force)
+    np.testing.assert_array_equal(arrays["acceleration"], acceleration)
+
+
+def test_append_multisensor(tmp_path, beam):
+    path = str(tmp_path / "run")
+    values = np.arange(12.0).reshape(4, 3)
+    with ResultWriter(path, beam, 4, ("acceleration",), nsensors=3,
+                      chunksize=2) as writer:
+        for row in values:
+            writer.append(acceleration=row)
+    metadata, arrays = loadresult(path)
+    assert metadata["nsensors"] == 3
+    np.testing.assert_array_equal(arrays["acceleration"], values)
+
+
+def test_streammodal_matches_batch(beam):
+    force = np.random.default_rng(0).standard_normal(5000)
+    blocks = [q.copy() for q in beam.streammodal(np.array_split(force, 7),
+                                                 30, 1024)]
+    np.testing.assert_allclose(np.concatenate(blocks, axis=1),
+                               beam.simulatemodal(force, 30), atol=1e-12)
+
+
+def test_write_checks_blocks(tmp_path, beam):
+    path = str(tmp_path / "run")
+    with ResultWriter(path, beam, 10, ("force", "acceleration", "modal"),
+                      columns={"modal": 3}) as writer:
+        with pytest.raises(ValueError):
+            writer.write(force=np.zeros(4), acceleration=np.zeros(3),
+                         modal=np.zeros((4, 3)))
+        assert writer.cursor == 0
+        writer.write(force=np.ones(4), acceleration=np.ones(4),
+                     modal=np.ones((4, 3)))
+        with pytest.raises(ValueError):   # past the end of the result
+            writer.write(force=np.ones(7), acceleration=np.ones(7),
+                         modal=np.ones((7, 3)))
+    metadata, arrays = loadresult(path)
+    assert arrays["modal"].shape == (10, 3)
+    assert metadata["columns"] == {"force": 1, "acceleration": 1, "modal": 3}
+    # A result is never overwritten
+    with pytest.raises(FileExistsError):
+        ResultWriter(path, beam, 10)
+
+
+def test_newresultdir_unique(tmp_path):
+    paths = [newresultdir(str(tmp_path)) for _ in range(3)]
+    assert len(set(paths)) == 3
+    assert all(os.path.isdir(path) and not os.listdir(path) for path in paths)
@@ -0,0 +1,131 @@
+import numpy as np
+from CantileverBeam import CantileverBeam
+from playback import Playback
+from sessionLog import (SessionLog, replay, PULSE, HARMONIC, NORMAL,
+                        SLOWMOTION)
+
+CONFIG = dict(npoints=30, width=0.05, thickness=0.00575, length=0.58,
+              density=7900, elasticmod=2e11, Tsampling=0.004, nmodes=None,
+              damp=[0.002, 0.002, 0.001, 0.001, 0.001], forcescaler=1,
+              noisestd=0)
+
+
+class Page:
+    """
+    Real Time page without the GUI: steps the beam as the normal time
+    mode and logs the events as MainWindow does.
+    """
+
+    def __init__(self):
+        self.beam = CantileverBeam(**CONFIG)
+        self.log = SessionLog()
+        self.steps = 0
+        self.bars = {"force": 10.0, "freq": 12.0, "mode": PULSE}
+        self.pos = (0, 0)
+        self.playback = None
+        self.shown = []       # (kind, acceleration) of each run
+        self.current = []
+        self.log.recordbeam(0, **dict(CONFIG, Tsampling=self.beam.Ts))
+        self.loggedTs = self.beam.Ts
+        for key, value in self.bars.items():
+            self.record(key, value)
+
+    def record(self, event, value=0.0):
+        self.log.record(event, self.steps, value)
+
+    def set(self, key, value):
+        self.bars[key] = value
+        self.record(key, value)
+
+    def start(self, apos, rpos, slow=False):
+        self.pos = (apos, rpos)
+        self.record("apos", apos)
+        self.record("rpos", rpos)
+        self.record("start", SLOWMOTION if slow else NORMAL)
+        if slow:
+            Ts, force, freq = self.beam.Ts, self.bars["force"], \
+                self.bars["freq"]
+            if self.bars["mode"] == PULSE:
+                function = lambda t: np.where(np.asarray(t) < Ts / 2, force,
+                                              0.0)
+            else:
+                function = lambda t: np.sin(2 * np.pi * freq * np.asarray(t))
+            self.playback = Playback(self.beam, apos, rpos, function)
+
+    def run(self, nsteps):
+        apos, rpos = self.pos
+        for _ in range(nsteps):
+            t = self.steps * self.beam.Ts
+            if self.bars["mode"] == PULSE:
+                force = self.bars["force"] if t < self.beam.Ts / 2 else 0.0
+            else:
+                force = np.sin(2 * np.pi * self.bars["freq"] * t)
+            self.beam.setforce(apos, force)
+            self.current.append(self.beam.getaccelms2(rpos))
+            self.beam.update()
+            self.steps += 1
+
+    def head(self):
+        if self.playback is not None:
+            head = int(self.playback.time / self.beam.Ts)
+            self.record("head", head)
+            self.shown.append(("slowmotion", self.playback.a[:head + 1]))
+            self.playback = None
+
+    def stop(self):
+        self.head()
+        self.record("stop")
+
+    def reset(self, Tsampling=None):
+        self.head()
+        self.record("reset")
+        self.beam.reset()
+        if self.current:
+            self.shown.append(("normal", np.array(self.current)))
+        self.current = []
+        self.steps = 0
+        if Tsampling is not None:
+            self.beam.setsampling(Tsampling)
+        if self.beam.Ts != self.loggedTs:
+            self.record("sampling", self.beam.Ts)
+            self.loggedTs = self.beam.Ts
+
+    def end(self):
+        self.reset()
+        self.record("end")
+
+
+def test_replay_matches_page(tmp_path):
+    page = Page()
+    page.start(29, 15)
+    page.run(120)
+    page.set("force", 25.0)       # only the first step is a pulse
+    page.run(30)
+    page.stop()
+    page.set("mode", HARMONIC)
+    page.start(20, 29)            # the old actuator keeps its force
+    page.run(200)
+    page.set("freq", 7.0)
+    page.run(150)
+    page.reset()
+    page.start(10, 29, slow=True)
+    page.playback.advance(3.0)
+    page.stop()
+    page.reset(Tsampling=0.002)   # the next runs use the new period
+    page.start(29, 29)
+    page.run(400)
+    page.end()
+
+    path = tmp_path / "session.npz"
+    page.log.save(path)
+    log = SessionLog.load(path)
+    assert list(log.events()) == list(page.log.events())
+    assert log.beams[0]["Tsampling"] == CONFIG["Tsampling"]
+
+    runs = replay(log)
+    assert [run["kind"] for run in runs] == [kind for kind, _ in page.shown]
+    for run, (_, shown) in zip(runs, page.shown):
+        assert len(run["acceleration"]) == len(shown)
+        np.testing.assert_allclose(run["acceleration"], shown,
+                                   atol=1e-12 * np.max(np.abs(shown)))
+    assert np.isclose(runs[-1]["t"][1], 0.002)
@@ -0,0 +1,58 @@
+import time
+import numpy as np
+from simProcess import RingBuffer, SimulatorProcess, CHANNELS
+from sessionLog import HARMONIC
+
+
+def samples(first, n):
+    return np.tile(np.arange(first, first + n, dtype=float), (len(CHANNELS), 1))
+
+
+def test_ring_overwrite():
+    writer = RingBuffer(8)
+    reader = RingBuffer(8, writer.name, writer.lock)
+    try:
+        writer.write(samples(0, 5))
+        np.testing.assert_array_equal(reader.read(), samples(0, 5))
+        # The reader is too slow: only the last 'capacity' samples remain
+        writer.write(samples(5, 6))
+        writer.write(samples(11, 20))
+        np.testing.assert_array_equal(reader.read(), samples(23, 8))
+        assert reader.read().shape == (len(CHANNELS), 0)
+
+        # A write of 3 samples begun but not published: the 3 oldest
+        # samples may be overwritten during the copy and are discarded
+        writer.write(samples(31, 8))
+        count = writer.written()
+        writer.header[0] = count + 3
+        writer.data[:, (count + np.arange(3)) % 8] = -1.0
+        np.testing.assert_array_equal(reader.read(), samples(34, 5))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_child_steps():
+    config = dict(npoints=30, width=0.05, thickness=0.00575, length=0.58,
+                  density=7900, elasticmod=2e11, Tsampling=0.004,
+                  nmodes=None, damp=[0.002, 0.002, 0.001, 0.001, 0.001],
+                  forcescaler=1, noisestd=0)
+    process = SimulatorProcess(config)
+    try:
+        assert process.set("mode", HARMONIC) == 0
+        assert process.set("freq", 15.0) == 0
+        assert process.start(29, 15) == 0
+        time.sleep(0.5)
+        stop = process.stop()
+        assert stop > 0
+        assert process.step() == stop
+        # The samples read are those of the steps before the stop
+        t, force, acceleration = process.read()
+        assert len(t) == stop
+        np.testing.assert_allclose(t, np.arange(stop) * config["Tsampling"])
+        np.testing.assert_allclose(force, np.sin(2 * np.pi * 15 * t),
+                                   atol=1e-12)
+        assert process.reset() == stop
+        assert process.step() == 0
+    finally:
+        process.close()
@@ -0,0 +1,52 @@
+import asyncio
+import numpy as np
+import pytest
+from simulationService import SimulationService
+
+
+def forces(n):
+    rng = np.random.default_rng(0)
+    return [rng.standard_normal(500 + 100 * i) for i in range(n)]
+
+
+def test_coalescing(beam):
+    async def main():
+        service = SimulationService(window=0.05)
+        positions = [(30, 59), (10, [20, 59]), (0.29, 0.575), (59, 0.58)]
+        results = await asyncio.gather(*[
+            service.simulate({}, force, apos, rpos)
+            for force, (apos, rpos) in zip(forces(4), positions)])
+        return service.stats, positions, results
+
+    stats, positions, results = asyncio.run(main())
+    assert stats == {"requests": 4, "batches": 1, "models": 1}
+    for force, (apos, rpos), result in zip(forces(4), positions, results):
+        np.testing.assert_allclose(result, beam.simulate(force, apos, rpos),
+                                   atol=1e-12)
+
+
+def test_cancelled_request_does_not_break_batch(beam):
+    async def main():
+        service = SimulationService(window=0.05)
+        tasks = [asyncio.ensure_future(service.simulate({}, force, 30, 59))
+                 for force in forces(3)]
+        await asyncio.sleep(0.01)   # queued, the batch is not flushed yet
+        tasks[1].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert isinstance(results[1], asyncio.CancelledError)
+    for i in (0, 2):
+        np.testing.assert_allclose(results[i],
+                                   beam.simulate(forces(3)[i], 30, 59),
+                                   atol=1e-12)
+
+
+@pytest.mark.parametrize("apos, rpos", [(60, 59), (-1, 59), (0.59, 59),
+                                        (30, [59, 1.2]), (True, 59)])
+def test_positions_out_of_the_beam(apos, rpos):
+    async def main():
+        return await SimulationService().simulate({}, [1.0], apos, rpos)
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
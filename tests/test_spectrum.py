@@ -0,0 +1,41 @@
+import numpy as np
+from scipy import signal
+from spectrum import spectrum, welchsegments, StreamingSTFT
+
+
+def test_welchsegments_matches_welch():
+    x = np.random.default_rng(0).standard_normal(5000)
+    for nperseg in (256, 257, 8192):
+        freqs, psd = signal.welch(x, fs=250, nperseg=min(nperseg, len(x)))
+        f, p = welchsegments(x, 0.004, nperseg, maxsegments=1000)
+        np.testing.assert_allclose(f, freqs)
+        np.testing.assert_allclose(p, psd, rtol=1e-10)
+    # Bounded number of segments: level of unit white noise (2 Ts)
+    f, p = welchsegments(np.tile(x, 40), 0.004, 256, maxsegments=16)
+    assert abs(np.mean(p[1:-1]) / (2 * 0.004) - 1) < 0.1
+
+
+def test_spectrum_peaks_at_modes(beam):
+    force = np.zeros(20000)
+    force[0] = 1   # impulse response: the spectrum is the FRF
+    acceleration = beam.simulate(force, 30, 59)
+    for method, nperseg in (("welch", 4096), ("rfft", None)):
+        freqs, values = spectrum(acceleration, beam.Ts, method,
+                                 nperseg=nperseg or 1024)
+        resolution = freqs[1]
+        for f in beam.freqsHz:
+            band = np.abs(freqs - f) < 0.1 * f
+            peak = freqs[band][np.argmax(values[band])]
+            assert abs(peak - f) <= 2 * resolution
+
+
+def test_spectrogram_peak_at_mode(beam):
+    f = beam.freqsHz[1]
+    acceleration = beam.simulate(np.sin(2 * np.pi * f * np.arange(4000)
+                                        * beam.Ts), 30, 59)
+    stft = StreamingSTFT(beam.Ts, nfft=256, hop=32, nframes=50)
+    for block in np.array_split(acceleration, 37):
+        stft.push(block)
+    assert stft.count == len(acceleration) // 32
+    newest = stft.image()[-1]
+    assert abs(stft.freqs[np.argmax(newest)] - f) <= stft.freqs[1]
@@ -0,0 +1,51 @@
+import numpy as np
+from scipy import signal
+from streamStats import StreamingStats
+
+
+def test_matches_whole_trace(beam):
+    rng = np.random.default_rng(0)
+    force = rng.standard_normal(50000)
+    acceleration = beam.simulate(force, 30, 59)
+    band = (10, 20)
+    stats = StreamingStats(beam.Ts, bands=[band], window=10, tau=1.0)
+    blocks = np.array_split(force, 37)
+    streamed = np.concatenate(list(beam.stream(iter(blocks), 30, 59, 1000,
+                                               stats=stats)))
+    np.testing.assert_allclose(streamed, acceleration, atol=1e-12)
+
+    summary = stats.summary()
+    peak = np.max(np.abs(acceleration))
+    assert summary["samples"] == len(acceleration)
+    assert np.isclose(summary["mean"], np.mean(acceleration))
+    assert np.isclose(summary["std"], np.std(acceleration))
+    assert np.isclose(summary["rms"], np.sqrt(np.mean(acceleration**2)))
+    assert summary["peak"] == peak
+    assert summary["peak_time"] == np.argmax(np.abs(acceleration)) * beam.Ts
+    outside = np.flatnonzero(np.abs(acceleration) > 0.05 * peak)
+    assert summary["settling_time"] == (outside[-1] + 1) * beam.Ts
+
+    sos = signal.butter(4, band, btype="bandpass", fs=1 / beam.Ts,
+                        output="sos")
+    filtered = signal.sosfilt(sos, acceleration)
+    assert np.isclose(summary["band_energy"]["10-20Hz"],
+                      filtered @ filtered * beam.Ts)
+
+    last = acceleration[-int(round(10 / beam.Ts)):]
+    assert np.isclose(summary["window"]["rms"], np.sqrt(np.mean(last**2)))
+    assert summary["window"]["peak"] == np.max(np.abs(last))
+
+    alpha = 1 - np.exp(-beam.Ts / 1.0)
+    ewma = signal.lfilter([alpha], [1, alpha - 1], acceleration**2)[-1]
+    assert np.isclose(summary["ewma_rms"], np.sqrt(ewma))
+
+
+def test_single_samples_and_threshold():
+    stats = StreamingStats(0.01, threshold=0.5)
+    values = [0.1, -2.0, 0.7, 0.2, 0.1]
+    for value in values:
+        stats.push(value)
+    summary = stats.summary()
+    assert summary["peak"] == 2.0 and summary["peak_time"] == 0.01
+    assert np.isclose(summary["settling_time"], 0.03)
+    assert np.isclose(summary["rms"], np.sqrt(np.mean(np.square(values))))
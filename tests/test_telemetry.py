@@ -0,0 +1,40 @@
+import numpy as np
+from telemetry import Telemetry
+from CantileverBeam import CantileverBeam
+
+
+def test_setup_kept_and_batch_throughput():
+    telemetry = Telemetry(trackmemory=False)
+    beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002], 1, 0, telemetry)
+    assert telemetry.setup["modal analysis"]["calls"] == 1
+
+    telemetry.start()
+    force = np.zeros(20000)
+    force[0] = 1
+    with telemetry.section("simulation"):
+        beam.simulatemodal(force, 30)
+    telemetry.addsamples(len(force))
+    telemetry.stop()
+    stats = telemetry.stats()
+    assert "modal analysis" in stats["setup"]
+    assert "modal analysis" not in stats["sections"]
+    assert stats["steps"] == 0
+    assert stats["samples"] == len(force)
+    simulation = stats["sections"]["simulation"]["total"]
+    assert np.isclose(stats["samples_per_second"], len(force) / simulation)
+    assert "misses" not in telemetry.summary()
+
+
+def test_stepping_counts_steps_and_misses():
+    telemetry = Telemetry(trackmemory=False)
+    beam = CantileverBeam(60, 0.05, 0.00575, 0.58, 7900, 2e11, 0.004, None,
+                          [0.002], 1, 0, telemetry)
+    telemetry.start()
+    for _ in range(100):
+        beam.update()
+    telemetry.stop()
+    stats = telemetry.stats()
+    assert stats["steps"] == 100 and stats["samples"] == 100
+    assert "misses: 0" in telemetry.summary()
+    assert telemetry.setup["modal analysis"]["calls"] == 1
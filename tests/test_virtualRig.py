@@ -0,0 +1,57 @@
+import select
+import numpy as np
+from virtualRig import TimeStats, VirtualRig, RigClient
+
+
+def test_timestats_matches_arrays():
+    values = np.random.default_rng(0).lognormal(np.log(2e-4), 0.8, 100000)
+    stats = TimeStats()
+    for value in values:
+        stats.add(value)
+    summary = stats.summary()
+    assert len(stats) == len(values)
+    assert np.isclose(summary["mean"], np.mean(values))
+    assert np.isclose(summary["std"], np.std(values))
+    assert summary["max"] == np.max(values)
+    p99 = np.percentile(values, 99)
+    assert p99 <= summary["p99"] <= p99 * 10 ** (2 / TimeStats.BINS)
+
+
+def test_timestats_memory_is_constant():
+    stats = TimeStats()
+    size = stats.histogram.nbytes
+    for value in (0.0, 1e-9, 5e-3, 100.0):
+        stats.add(value)
+    assert stats.histogram.nbytes == size and stats.histogram.sum() == 4
+
+
+def test_loopback_force_and_sample(beam):
+    expected = beam.simulate([2.0, 2.0], 30, 59)
+    beam.reset()
+    rig = VirtualRig(beam, 30, 59, address=("127.0.0.1", 0),
+                     client=("127.0.0.1", 0))
+    client = RigClient(address=("127.0.0.1", 0), rig=rig.address)
+    rig.client = client.socket.getsockname()
+    try:
+        client.sendforce(2.0)
+        assert select.select([rig.socket], [], [], 1.0)[0]
+        rig.tick()
+        seq, simtime, values = client.receive()
+        assert seq == 1 and np.isclose(simtime, beam.Ts)
+        np.testing.assert_allclose(values, expected[:1], rtol=1e-6)
+        # No new packet: the force is held for the next tick
+        rig.tick()
+        seq, simtime, values = client.receive()
+        assert seq == 2 and np.isclose(simtime, 2 * beam.Ts)
+        np.testing.assert_allclose(values, expected[1:], rtol=1e-6)
+
+        stats = rig.stats()
+        assert stats["ticks"] == 2
+        assert stats["received"] == 1 and stats["dropped"] == 0
+        assert len(rig.latency) == 1
+        assert 0 <= stats["latency"]["max"] < 1.0
+        assert len(client.roundtrip) == 2 and client.lost == 0
+        assert 0 < client.roundtrip.summary()["max"] < 1.0
+    finally:
+        client.close()
+        rig.close()